@@ -1 +1,5 @@
 """AutoRSA Command-Line Python Package."""
+
+from src.startup import STARTUP_START
+
+__all__ = ["STARTUP_START"]
@@ -4,19 +4,28 @@
 
 # Import libraries
 import asyncio
-import importlib.util
+import contextlib
 import os
 import sys
 import traceback
 import warnings
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
 from importlib.metadata import version
 from pathlib import Path
+from threading import Event, Lock
+from time import monotonic, perf_counter
 from typing import TYPE_CHECKING, Any
 
 from src.helper_api import is_up_to_date
+from src.startup import STARTUP_START
 
 if TYPE_CHECKING:
-    from src.helper_api import Brokerage
+    from collections.abc import Callable
+
+    from discord.ext import commands
+
+    from src.helper_api import Brokerage, BrokerProgress, HoldingsSnapshot
 
 
 # Filter out old playwright warning: temporary
@@ -31,15 +40,6 @@ warnings.filterwarnings(
     category=SyntaxWarning,
 )
 
-# Point "robin_stocks" to the actual inner folder. Workaround until package update
-vendor_root = Path(__file__).resolve().parent / "vendors" / "robin_stocks" / "robin_stocks"
-spec = importlib.util.spec_from_file_location("robin_stocks", vendor_root / "__init__.py")
-if spec is not None:
-    robin_stocks = importlib.util.module_from_spec(spec)
-    sys.modules["robin_stocks"] = robin_stocks
-    if spec.loader is not None:
-        spec.loader.exec_module(robin_stocks)
-
 # Print Startup Info
 print(f"Python version: {sys.version}")
 print(f"Platform: {sys.platform}")
@@ -51,29 +51,37 @@ print(f"RSA Version: {CURRENT_RSA_VERSION}")
 print()
 
 try:
-    import discord as discord_module
-    from discord.ext import commands
+    # Broker modules and their libraries are imported on demand, see BrokerInfo.entry_point
     from dotenv import load_dotenv
 
-    # Custom API libraries (These are inferred from the namespace in fun_run, so the import is needed)
-    from src.brokerages.bbae_api import bbae_holdings, bbae_init, bbae_transaction
-    from src.brokerages.chase_api import chase_run
-    from src.brokerages.dspac_api import dspac_holdings, dspac_init, dspac_transaction
-    from src.brokerages.fennel_api import fennel_holdings, fennel_init, fennel_transaction
-    from src.brokerages.fidelity_api import fidelity_run
-    from src.brokerages.firstrade_api import firstrade_holdings, firstrade_init, firstrade_transaction
-    from src.brokerages.public_api import public_holdings, public_init, public_transaction
-    from src.brokerages.robinhood_api import robinhood_holdings, robinhood_init, robinhood_transaction
-    from src.brokerages.schwab_api import schwab_holdings, schwab_init, schwab_transaction
-    from src.brokerages.sofi_api import sofi_run
-    from src.brokerages.tasty_api import tastytrade_holdings, tastytrade_init, tastytrade_transaction
-    from src.brokerages.tornado_api import tornado_holdings, tornado_init, tornado_transaction
-    from src.brokerages.tradier_api import tradier_holdings, tradier_init, tradier_transaction
-    from src.brokerages.vanguard_api import vanguard_run
-    from src.brokerages.webull_api import webull_holdings, webull_init, webull_transaction
-    from src.brokerages.wellsfargo_api import wellsfargo_holdings, wellsfargo_init, wellsfargo_transaction
-    from src.brokers import AllBrokersInfo, BrokerName
-    from src.helper_api import StockOrder, ThreadHandler, print_and_discord
+    from src.brokers import AllBrokersInfo, BrokerInfo
+    from src.helper_api import (
+        DISCORD_DIGEST,
+        BrokerCancelled,
+        BrokerSlots,
+        JobScheduler,
+        SessionPool,
+        StockOrder,
+        ThreadHandler,
+        broker_deadline,
+        check_cancelled,
+        discord_sender,
+        drain_discord,
+        holdings_report,
+        holdings_snapshots,
+        http_transport,
+        input_router,
+        job_cancel,
+        kill_all_selenium_drivers,
+        position_ledger,
+        print_all_holdings,
+        print_and_discord,
+        print_holdings_diff,
+        print_holdings_digest,
+        print_order_summary,
+        print_ticker_positions,
+        time_left,
+    )
 except Exception as e:
     print(f"Error importing libraries: {e}")
     print(traceback.format_exc())
@@ -82,179 +90,325 @@ except Exception as e:
 # Initialize .env file
 load_dotenv()
 DANGER_MODE = os.getenv("DANGER_MODE", "").lower() == "true"
+# Number of brokers to run at the same time
+MAX_BROKER_WORKERS = max(1, int(os.getenv("MAX_BROKER_WORKERS", "1")))
+# Time budgets in seconds (0 means no limit)
+RUN_DEADLINE = float(os.getenv("RUN_DEADLINE", "0"))
+BROKER_TIMEOUT = float(os.getenv("BROKER_TIMEOUT", "0"))
 
 
-def fun_run(  # noqa: C901, PLR0912, PLR0915
-    order_obj: StockOrder,
-    bot_obj: commands.Bot | None = None,
-    loop: asyncio.AbstractEventLoop | None = None,
-    *,
-    docker_mode: bool = False,
-) -> None:
-    """Run the specified function for each broker in the list.
-
-    Functions are determined as: [broker_name] + <function_name>.
-    So for example, fennel init -> fennel_init()
-    """
-    total_value = 0
-    for broker_info in order_obj.get_brokers():
-        if broker_info in order_obj.get_notbrokers():
+def parse_broker_timeouts(value: str) -> dict[str, float]:
+    """Parse BROKER_TIMEOUTS ("broker:seconds,..."), warning about and skipping bad entries."""
+    timeouts: dict[str, float] = {}
+    for item in value.split(","):
+        name, _, seconds = item.partition(":")
+        if not name.strip():
             continue
-        broker = broker_info.name.lower()
         try:
-            success: Brokerage | None = None
-            th: ThreadHandler | None = None
-            # Initialize broker
-            match broker_info.name:
-                case BrokerName.BBAE:
-                    success = bbae_init(bot_obj=bot_obj, loop=loop)
-                case BrokerName.CHASE:
-                    th = ThreadHandler(
-                        chase_run,
-                        order_obj=order_obj,
-                        bot_obj=bot_obj,
-                        loop=loop,
-                    )
-                case BrokerName.DSPAC:
-                    success = dspac_init(bot_obj=bot_obj, loop=loop)
-                case BrokerName.FENNEL:
-                    success = fennel_init(loop=loop)
-                case BrokerName.FIDELITY:
-                    th = ThreadHandler(
-                        fidelity_run,
-                        order_obj=order_obj,
-                        bot_obj=bot_obj,
-                        loop=loop,
-                    )
-                case BrokerName.FIRSTRADE:
-                    success = firstrade_init(bot_obj=bot_obj, loop=loop)
-                case BrokerName.PUBLIC:
-                    success = public_init(loop=loop)
-                case BrokerName.ROBINHOOD:
-                    success = robinhood_init(loop=loop)
-                case BrokerName.SCHWAB:
-                    success = schwab_init()
-                case BrokerName.SOFI:
-                    th = ThreadHandler(
-                        sofi_run,
-                        order_obj=order_obj,
-                        bot_obj=bot_obj,
-                        loop=loop,
-                    )
-                case BrokerName.TASTYTRADE:
-                    success = tastytrade_init()
-                case BrokerName.TORNADO:
-                    success = tornado_init(docker_mode=docker_mode, loop=loop)
-                case BrokerName.TRADIER:
-                    success = tradier_init()
-                case BrokerName.VANGUARD:
-                    th = ThreadHandler(
-                        vanguard_run,
-                        order_obj=order_obj,
-                        bot_obj=bot_obj,
-                        loop=loop,
-                    )
-                case BrokerName.WEBULL:
-                    success = webull_init()
-                case BrokerName.WELLS_FARGO:
-                    success = wellsfargo_init(
-                        bot_obj=bot_obj,
-                        docker_mode=docker_mode,
-                        loop=loop,
-                    )
-            if th is not None:
-                # Start single run thread
-                th.start()
-                th.join()
-                _, err = th.get_result()
-                if err is not None:
-                    msg = f"Error in {broker}: Function did not complete successfully: {err}"
-                    raise Exception(msg)
-                continue
-            if success is None:
-                msg = f"Error in {broker}: Function did not complete successfully"
-                raise Exception(msg)
-            # Success
-            order_obj.set_logged_in(success, broker)
-            print()
-            # Verify broker is logged in
-            order_obj.order_validate(pre_login=False)
-            logged_in_broker = order_obj.get_logged_in(broker)
-            if logged_in_broker is None:
-                print(f"Error: {broker} not logged in, skipping...")
-                continue
-            if order_obj.get_holdings():
-                match broker_info.name:
-                    case BrokerName.BBAE:
-                        bbae_holdings(logged_in_broker, loop)
-                    case BrokerName.DSPAC:
-                        dspac_holdings(logged_in_broker, loop)
-                    case BrokerName.FENNEL:
-                        fennel_holdings(logged_in_broker, loop)
-                    case BrokerName.FIRSTRADE:
-                        firstrade_holdings(logged_in_broker, loop)
-                    case BrokerName.PUBLIC:
-                        public_holdings(logged_in_broker, loop)
-                    case BrokerName.ROBINHOOD:
-                        robinhood_holdings(logged_in_broker, loop)
-                    case BrokerName.SCHWAB:
-                        schwab_holdings(logged_in_broker, loop)
-                    case BrokerName.TASTYTRADE:
-                        tastytrade_holdings(logged_in_broker, loop)
-                    case BrokerName.TORNADO:
-                        tornado_holdings(logged_in_broker, loop)
-                    case BrokerName.TRADIER:
-                        tradier_holdings(logged_in_broker, loop)
-                    case BrokerName.WEBULL:
-                        webull_holdings(logged_in_broker, loop)
-                    case BrokerName.WELLS_FARGO:
-                        wellsfargo_holdings(logged_in_broker, loop)
-                # Track per-broker total so we can show accurate totals and still accumulate overall
-                broker_total = sum(account["total"] for account in order_obj.get_logged_in(broker).get_account_totals().values())
-                print_and_discord(f"Total Value of {broker.title()} Accounts: ${format(broker_total, '0.2f')}", loop)
-                # Add to overall total sum
-                total_value += broker_total
-            else:
-                # Run transaction
-                match broker_info.name:
-                    case BrokerName.BBAE:
-                        bbae_transaction(logged_in_broker, order_obj, loop)
-                    case BrokerName.DSPAC:
-                        dspac_transaction(logged_in_broker, order_obj, loop)
-                    case BrokerName.FENNEL:
-                        fennel_transaction(logged_in_broker, order_obj, loop)
-                    case BrokerName.FIRSTRADE:
-                        firstrade_transaction(logged_in_broker, order_obj, loop)
-                    case BrokerName.PUBLIC:
-                        public_transaction(logged_in_broker, order_obj, loop)
-                    case BrokerName.ROBINHOOD:
-                        robinhood_transaction(logged_in_broker, order_obj, loop)
-                    case BrokerName.SCHWAB:
-                        schwab_transaction(logged_in_broker, order_obj, loop)
-                    case BrokerName.TASTYTRADE:
-                        tastytrade_transaction(logged_in_broker, order_obj, loop)
-                    case BrokerName.TORNADO:
-                        tornado_transaction(logged_in_broker, order_obj, loop)
-                    case BrokerName.TRADIER:
-                        tradier_transaction(logged_in_broker, order_obj, loop)
-                    case BrokerName.WEBULL:
-                        webull_transaction(logged_in_broker, order_obj, loop)
-                    case BrokerName.WELLS_FARGO:
-                        wellsfargo_transaction(logged_in_broker, order_obj, loop)
-                print_and_discord(
-                    f"All {broker.capitalize()} transactions complete",
-                    loop,
-                )
-        except Exception as ex:
-            print(traceback.format_exc())
-            print(f"Error with {broker}: {ex}")
-            print(order_obj)
+            timeouts[name.strip().lower()] = float(seconds)
+        except ValueError:
+            print(f"Warning: Ignoring BROKER_TIMEOUTS entry {item.strip()!r}, expected broker:seconds")
+    return timeouts
+
+
+BROKER_TIMEOUTS = parse_broker_timeouts(os.getenv("BROKER_TIMEOUTS", ""))
+RUN_DEADLINE_GRACE = 30  # Seconds to let brokers wind down after the run deadline
+# Startup timing, printed once when the first broker is called
+startup_marks: list[tuple[str, float]] = []
+startup_lock = Lock()
+startup_reported = False
+
+
+def mark_startup(label: str) -> None:
+    """Record how long after startup a step finished."""
+    startup_marks.append((label, perf_counter() - STARTUP_START))
+
+
+def _report_startup(broker: str, import_seconds: float) -> None:
+    """Print the startup timing report the first time a broker is called."""
+    global startup_reported  # noqa: PLW0603
+    with startup_lock:
+        if startup_reported:
+            return
+        startup_reported = True
+        mark_startup(f"{broker} imported (+{import_seconds:.2f}s)")
+        mark_startup("first broker call")
+        print("Startup timing: " + ", ".join(f"{label} {elapsed:.2f}s" for label, elapsed in startup_marks))
+
+
+mark_startup("imports")
+
+
+def _cached_holdings(broker: str, order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None = None) -> float | None:
+    """Show a broker's last saved holdings without logging in."""
+    snapshot = holdings_snapshots.latest(broker)
+    if snapshot is None:
+        print_and_discord(f"{broker.capitalize()}: No saved holdings yet, run holdings without cached first", loop)
+        return None
+    broker_obj = snapshot.to_brokerage()
+    order_obj.set_logged_in(broker_obj, broker)
+    # The ledger keeps the snapshot's own time, so nothing trusts it as fresher than it is
+    position_ledger.report(broker_obj, taken=snapshot.taken)
+    print_all_holdings(broker_obj, loop, taken=snapshot.taken)
+    broker_total = sum(account["total"] for account in broker_obj.get_account_totals().values())
+    print_and_discord(f"Total Value of {broker.title()} Accounts: ${format(broker_total, '0.2f')}", None if DISCORD_DIGEST else loop)
+    return broker_total
+
+
+def _save_holdings(broker: str, order_obj: StockOrder, previous: "HoldingsSnapshot | None", loop: asyncio.AbstractEventLoop | None = None) -> None:
+    """Save the holdings just fetched to the position ledger and as a snapshot, and show what changed in diff mode."""
+    try:
+        broker_obj = order_obj.get_logged_in(broker)
+    except KeyError:
+        print(f"Warning: {broker.capitalize()} didn't register its logins, so its holdings weren't saved")
+        return
+    position_ledger.report(broker_obj)
+    holdings_snapshots.save(broker_obj)
+    if order_obj.get_holdings_mode() == "diff":
+        print_holdings_diff(previous, broker_obj, loop)
+
+
+@dataclass(frozen=True, slots=True)
+class RunContext:
+    """Where a run's brokers send their output and how they log in."""
+
+    bot_obj: "commands.Bot | None" = None
+    loop: asyncio.AbstractEventLoop | None = None
+    docker_mode: bool = False
+    session_pool: SessionPool | None = None  # Reuse logins from and return them to this pool
+    cancel: Event | None = None  # Setting it stops every broker at its next check
+
+
+def _run_in_thread(broker_info: BrokerInfo, run: "Callable[..., Any]", order_obj: StockOrder, context: RunContext, previous: "HoldingsSnapshot | None") -> None:
+    """Run a broker that does everything in a single run thread."""
+    broker = broker_info.name.lower()
+    th = ThreadHandler(
+        run,
+        order_obj=order_obj,
+        bot_obj=context.bot_obj,
+        loop=context.loop,
+    )
+    th.start()
+    if not th.join(time_left()):
+        # It checks the same deadline between accounts, so give it a while to stop there
+        print(f"{broker.capitalize()}: Out of time, stopping at its next check...")
+        if not th.join(RUN_DEADLINE_GRACE):
+            # Stuck (in a browser, most likely), so leave the thread behind and close what it has open
+            msg = f"Did not stop within {RUN_DEADLINE_GRACE} seconds, leaving it behind"
+            raise BrokerCancelled(msg)
+    results, err = th.get_result()
+    if results:
+        order_obj.add_results(results)
+    if err is not None:
+        msg = f"Error in {broker}: Function did not complete successfully: {err}"
+        raise Exception(msg)
+    if order_obj.get_holdings():
+        _save_holdings(broker, order_obj, previous, context.loop)
+
+
+def _login(broker_info: BrokerInfo, init: "Callable[..., Any] | None", context: RunContext) -> "Brokerage":
+    """Reuse a warm session from the pool if there is one, otherwise log in."""
+    broker = broker_info.name.lower()
+    success: Brokerage | None = None
+    if context.session_pool is not None and broker_info.alive is not None:
+        success = context.session_pool.checkout(broker)
+    if success is None:
+        if init is None:
+            msg = f"Error in {broker}: No init or run entry point"
+            raise Exception(msg)
+        init_kwargs = {"bot_obj": context.bot_obj, "loop": context.loop, "docker_mode": context.docker_mode}
+        success = init(**{arg: init_kwargs[arg] for arg in broker_info.init_args})
+    if success is None:
+        msg = f"Error in {broker}: Function did not complete successfully"
+        raise Exception(msg)
+    return success
+
+
+def _broker_holdings(broker_info: BrokerInfo, broker_obj: "Brokerage", order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None, previous: "HoldingsSnapshot | None") -> float:
+    """Get a logged in broker's holdings and return the total value of its accounts."""
+    broker = broker_info.name.lower()
+    holdings = broker_info.entry_point("holdings")
+    if holdings is not None:
+        holdings(broker_obj, loop)
+        _save_holdings(broker, order_obj, previous, loop)
+    # Track per-broker total so we can show accurate totals and still accumulate overall
+    broker_total = sum(account["total"] for account in broker_obj.get_account_totals().values())
+    print_and_discord(f"Total Value of {broker.title()} Accounts: ${format(broker_total, '0.2f')}", None if DISCORD_DIGEST else loop)
+    return broker_total
+
+
+def _broker_transaction(broker_info: BrokerInfo, broker_obj: "Brokerage", order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None) -> None:
+    """Place the order in every account of a logged in broker."""
+    transaction = broker_info.entry_point("transaction")
+    if transaction is not None:
+        order_obj.add_results(transaction(broker_obj, order_obj, loop) or [])
+    print(f"All {broker_info.name.capitalize()} transactions complete")
+
+
+def _run_logged_in(broker_info: BrokerInfo, order_obj: StockOrder, context: RunContext, progress: "BrokerProgress | None", previous: "HoldingsSnapshot | None") -> float | None:
+    """Log in to a broker, then get its holdings or place the order in it."""
+    broker = broker_info.name.lower()
+    # Import the broker's module
+    import_start = perf_counter()
+    run = broker_info.entry_point("run")
+    init = broker_info.entry_point("init")
+    _report_startup(broker, perf_counter() - import_start)
+    if run is not None:
+        _run_in_thread(broker_info, run, order_obj, context, previous)
+        return None
+    # Success
+    order_obj.set_logged_in(_login(broker_info, init, context), broker)
+    print()
+    # Verify broker is logged in
+    order_obj.order_validate(pre_login=False)
+    logged_in_broker = order_obj.get_logged_in(broker)
+    if logged_in_broker is None:
+        print(f"Error: {broker} not logged in, skipping...")
+        return None
+    if progress is not None:
+        progress.start({key: logged_in_broker.get_account_numbers(key) for key in logged_in_broker.get_account_numbers()})
+    broker_total = None
+    if order_obj.get_holdings():
+        broker_total = _broker_holdings(broker_info, logged_in_broker, order_obj, context.loop, previous)
+    else:
+        _broker_transaction(broker_info, logged_in_broker, order_obj, context.loop)
+    # Keep the session for the next command
+    check = broker_info.entry_point("alive") if context.session_pool is not None else None
+    if context.session_pool is not None and check is not None:
+        context.session_pool.checkin(broker, logged_in_broker, check)
+    return broker_total
+
+
+def _run_broker(broker_info: BrokerInfo, order_obj: StockOrder, context: RunContext) -> float | None:
+    """Run the init -> holdings/transaction pipeline for a single broker.
+
+    Returns the total value of the broker's accounts when getting holdings, otherwise None.
+    """
+    broker = broker_info.name.lower()
+    loop = context.loop
+    # Orders from Discord get one message per broker that is edited as accounts finish
+    progress = order_obj.track_progress(broker, loop) if loop is not None and not order_obj.get_holdings() and not DISCORD_DIGEST else None
+    if order_obj.get_holdings() and order_obj.get_holdings_mode() == "cached":
+        return _cached_holdings(broker, order_obj, loop)
+    # Read the snapshot to compare with before this run saves a new one, and hold back the full holdings
+    previous = holdings_snapshots.latest(broker) if order_obj.get_holdings() and order_obj.get_holdings_mode() == "diff" else None
+    report_token = holdings_report.set(order_obj.get_holdings_mode() != "diff")
+    broker_total = None
+    try:
+        check_cancelled()
+        broker_total = _run_logged_in(broker_info, order_obj, context, progress, previous)
+    except BrokerCancelled as ex:
+        print_and_discord(f"{broker.capitalize()}: Cancelled, {str(ex).lower()}", loop)
+        # Close any browsers the broker left open
+        with contextlib.suppress(KeyError):
+            kill_all_selenium_drivers(order_obj.get_logged_in(broker))
+    except Exception as ex:
+        print(traceback.format_exc())
+        print(f"Error with {broker}: {ex}")
+        print(order_obj)
+    finally:
+        holdings_report.reset(report_token)
+        if progress is not None:
+            progress.finish()
         print()
+    return broker_total
+
+
+def _wait_for_brokers(futures: list[Future[float | None]], started: dict[int, float | None], run_deadline: float | None) -> set[Future[float | None]]:
+    """Wait for every broker to finish, or for all the ones still working to run out of time.
+
+    started holds each broker's deadline once it starts, by ticket. Gives up once every broker
+    still working is past its deadline (or the run's) and RUN_DEADLINE_GRACE, and returns those.
+    """
+    pending = set(futures)
+    while pending:
+        deadlines = [started[ticket] for ticket, future in enumerate(futures) if future in pending and ticket in started]
+        known = [deadline for deadline in deadlines if deadline is not None]
+        if deadlines and len(known) == len(deadlines):
+            limit: float | None = max(known) + RUN_DEADLINE_GRACE
+        else:
+            limit = None if run_deadline is None else run_deadline + RUN_DEADLINE_GRACE
+        if limit is not None and monotonic() >= limit:
+            break
+        # Check again every second, a broker starting can change when to give up
+        _, pending = wait(pending, timeout=1 if limit is None else min(1, limit - monotonic()), return_when=FIRST_COMPLETED)
+    return pending
+
+
+def fun_run(order_obj: StockOrder, context: RunContext | None = None) -> dict[str, Future[float | None]]:
+    """Run the specified function for each broker in the list.
+
+    At most MAX_BROKER_WORKERS brokers work at once, started in broker order.
+    A broker waiting on an OTP code or captcha gives up its slot until the
+    answer arrives. Each broker gets BROKER_TIMEOUT seconds (or its own entry
+    in BROKER_TIMEOUTS) once it starts, and the whole run gets RUN_DEADLINE.
+    Brokers out of time are cancelled between accounts. Results are merged in
+    broker order once every broker has finished, or every one still working
+    is RUN_DEADLINE_GRACE seconds past its time. If the context has a session
+    pool, logins are reused from it and returned to it afterwards. Setting the
+    context's cancel event stops every broker at its next check, like running
+    out of time.
 
-    # Print final total value and closing message once after all brokers
+    Returns the brokers still running when the run gave up waiting on them, with
+    the futures that finish once they really stop.
+    """
+    context = context or RunContext()
+    loop = context.loop
+    # Every broker thread reads the same order, so settle its lists before any of them start
+    order_obj.freeze()
+    brokers = [broker_info for broker_info in order_obj.get_brokers() if broker_info not in order_obj.get_notbrokers()]
+    slots = BrokerSlots(MAX_BROKER_WORKERS)
+    run_deadline = monotonic() + RUN_DEADLINE if RUN_DEADLINE > 0 else None
+    started: dict[int, float | None] = {}  # Deadline of each broker once it starts, by ticket
+
+    def run_in_slot(ticket: int, broker_info: BrokerInfo) -> float | None:
+        with slots.held(ticket):
+            budget = BROKER_TIMEOUTS.get(broker_info.name, BROKER_TIMEOUT)
+            deadlines = [deadline for deadline in (run_deadline, monotonic() + budget if budget > 0 else None) if deadline is not None]
+            started[ticket] = min(deadlines) if deadlines else None
+            token = broker_deadline.set(started[ticket])
+            cancel_token = job_cancel.set(context.cancel)
+            try:
+                return _run_broker(broker_info, order_obj, context)
+            finally:
+                job_cancel.reset(cancel_token)
+                broker_deadline.reset(token)
+
+    # One thread per broker so parked brokers don't hold up the rest
+    executor = ThreadPoolExecutor(max_workers=max(1, len(brokers)), thread_name_prefix="broker")
+    futures = [executor.submit(run_in_slot, ticket, broker_info) for ticket, broker_info in enumerate(brokers)]
+    pending = _wait_for_brokers(futures, started, run_deadline)
+    broker_totals: list[float | None] = []
+    still_running: dict[str, Future[float | None]] = {}
+    for broker_info, future in zip(brokers, futures, strict=True):
+        if future not in pending:
+            broker_totals.append(future.result())
+        else:
+            print_and_discord(f"{broker_info.name.capitalize()}: Still running after its time ran out, it will stop at its next check", loop)
+            still_running[broker_info.name] = future
+            broker_totals.append(None)
+    # Don't wait on brokers that are stuck, the caller gets their futures instead
+    executor.shutdown(wait=False)
+
+    # Print final total value (or how every order went) and closing message once after all brokers
     if order_obj.get_holdings():
-        print_and_discord(f"Combined Total Value Across Brokers: ${format(total_value, '0.2f')}", loop)
-    print_and_discord("All commands complete in all brokers", loop)
+        total_value = sum(broker_total for broker_total in broker_totals if broker_total is not None)
+        if DISCORD_DIGEST:
+            print(f"Combined Total Value Across Brokers: ${format(total_value, '0.2f')}")
+            logged_in: list[Brokerage] = []
+            for broker_info in brokers:
+                with contextlib.suppress(KeyError):
+                    logged_in.append(order_obj.get_logged_in(broker_info.name.lower()))
+            print_holdings_digest(logged_in, loop)
+        else:
+            print_and_discord(f"Combined Total Value Across Brokers: ${format(total_value, '0.2f')}", loop)
+    else:
+        print_order_summary(order_obj.get_results(), loop)
+    if still_running:
+        print_and_discord(f"All commands complete except in {', '.join(name.capitalize() for name in still_running)}, still running", loop, flush=True)
+    else:
+        print_and_discord("All commands complete in all brokers", loop, flush=True)
+    return still_running
 
 
 def arg_parser(args: list[str]) -> StockOrder:  # noqa: C901, PLR0912
@@ -286,6 +440,9 @@ def arg_parser(args: list[str]) -> StockOrder:  # noqa: C901, PLR0912
                 broker_enum = all_brokers.parse_input(broker)
                 if broker_enum:
                     stock_order.set_notbrokers(broker_enum)
+        # Last argument can ask for the saved holdings or only what changed
+        if args[-1] in {"cached", "diff"}:
+            stock_order.set_holdings_mode(args[-1])
         return stock_order
     # Otherwise: action, amount, stock, broker, (optional) not broker, (optional) dry
     if args[0] == "buy":
@@ -324,7 +481,7 @@ def arg_parser(args: list[str]) -> StockOrder:  # noqa: C901, PLR0912
     return stock_order
 
 
-def main(args: list[str]) -> None:  # noqa: C901, PLR0912, PLR0915
+def main(args: list[str]) -> None:  # noqa: C901, PLR0915
     """Entrypoint for the CLI."""
     # Determine if ran from command line
     docker_mode = discord_bot = False
@@ -350,6 +507,7 @@ def main(args: list[str]) -> None:  # noqa: C901, PLR0912, PLR0915
         is_up_to_date()
         print()
         cli_order_obj = arg_parser(args)
+        mark_startup("order parsed")
         if not cli_order_obj.get_holdings():
             print(f"Action: {cli_order_obj.get_action()}")
             print(f"Amount: {cli_order_obj.get_amount()}")
@@ -372,14 +530,19 @@ def main(args: list[str]) -> None:  # noqa: C901, PLR0912, PLR0915
         # Validate order object
         cli_order_obj.order_validate(pre_login=True)
         # Get holdings or complete transaction
-        if cli_order_obj.get_holdings():
-            fun_run(cli_order_obj, docker_mode=docker_mode)
-        else:
-            fun_run(cli_order_obj, docker_mode=docker_mode)
+        fun_run(cli_order_obj, RunContext(docker_mode=docker_mode))
+        for line in http_transport.summary():
+            print(line)
         sys.exit(0)
 
     # If discord bot, run discord bot
     if discord_bot:
+        # Startup timing only means something for a single CLI run
+        global startup_reported  # noqa: PLW0603
+        startup_reported = True
+        import discord as discord_module  # noqa: PLC0415
+        from discord.ext import commands  # noqa: PLC0415
+
         # Get discord token and channel from .env file
         discord_token = os.getenv("DISCORD_TOKEN")
         if not discord_token:
@@ -398,6 +561,10 @@ def main(args: list[str]) -> None:  # noqa: C901, PLR0912, PLR0915
         # Discord bot command prefix
         bot = commands.Bot(command_prefix=custom_prefix, intents=intents)
         bot.remove_command("help")
+        # Logged in sessions kept between commands
+        session_pool = SessionPool()
+        # Commands from Discord take turns instead of sharing brokers
+        scheduler = JobScheduler()
         print()
         print("Discord bot is started...")
         print()
@@ -418,6 +585,9 @@ def main(args: list[str]) -> None:  # noqa: C901, PLR0912, PLR0915
         async def on_message(message: discord_module.Message) -> None:
             """Process the message only if it's from the allowed channel."""
             if message.channel.id == discord_channel and message.author != bot.user:
+                # Replies to a waiting login aren't commands
+                if input_router.route(message.content, message.reference.message_id if message.reference else None):
+                    return
                 ctx = await bot.get_context(message)
                 await bot.invoke(ctx)
 
@@ -431,7 +601,10 @@ def main(args: list[str]) -> None:  # noqa: C901, PLR0912, PLR0915
         async def help(ctx: commands.Context[Any]) -> None:  # noqa: A001
             """Return a list of available commands."""
             await ctx.send(
-                "Available RSA commands:\n!ping\n!help\n!rsa holdings [all|<broker1>,<broker2>,...] [not broker1,broker2,...]\n!rsa [buy|sell] [amount] [stock1|stock1,stock2] [all|<broker1>,<broker2>,...] [not broker1,broker2,...] [DRY: true|false]\n!restart",
+                "Available RSA commands:\n!ping\n!help\n"
+                "!rsa holdings [all|<broker1>,<broker2>,...] [not broker1,broker2,...] [cached|diff]\n"
+                "!rsa [buy|sell] [amount] [stock1|stock1,stock2] [all|<broker1>,<broker2>,...] [not broker1,broker2,...] [DRY: true|false]\n"
+                "!positions [stock]\n!status\n!cancel [job number|all]\n!restart",
             )
 
         @bot.command(name="version")
@@ -449,34 +622,51 @@ def main(args: list[str]) -> None:  # noqa: C901, PLR0912, PLR0915
             try:
                 # Validate order object
                 discord_order_obj.order_validate(pre_login=True)
-                # Get holdings or complete transaction
-                if discord_order_obj.get_holdings():
-                    # Run Holdings
-                    await bot.loop.run_in_executor(
-                        None,
-                        lambda: fun_run(
-                            discord_order_obj,
-                            bot,
-                            event_loop,
-                            docker_mode=docker_mode,
-                        ),
-                    )
-                else:
-                    # Run Transaction
-                    await bot.loop.run_in_executor(
-                        None,
-                        lambda: fun_run(
-                            discord_order_obj,
-                            bot,
-                            event_loop,
-                            docker_mode=docker_mode,
-                        ),
-                    )
+                brokers = [broker_info.name for broker_info in discord_order_obj.get_brokers() if broker_info not in discord_order_obj.get_notbrokers()]
+                # Get holdings or complete transaction, orders go ahead of holdings
+                job = scheduler.submit(
+                    " ".join(parsed_args),
+                    brokers,
+                    lambda cancel: fun_run(
+                        discord_order_obj,
+                        RunContext(bot, event_loop, docker_mode=docker_mode, session_pool=session_pool, cancel=cancel),
+                    ),
+                    priority=1 if discord_order_obj.get_holdings() else 0,
+                )
+                if job.state == "queued":
+                    await ctx.send(f"Job #{job.id} queued, it will start once the brokers it needs are free (see !status)")
+                await asyncio.wrap_future(job.future)
             except Exception as err:
                 print(traceback.format_exc())
                 print(f"Error placing order: {err}")
                 if ctx:
                     await ctx.send(f"Error placing order: {err}")
+            print(discord_sender.throughput())
+            for line in http_transport.summary():
+                print(line)
+
+        @bot.command(name="positions")
+        async def positions(ctx: commands.Context[Any], ticker: str) -> None:  # noqa: ARG001
+            """Show which accounts hold a ticker across all brokers."""
+            await asyncio.to_thread(print_ticker_positions, ticker, asyncio.get_running_loop())
+
+        @bot.command(name="status")
+        async def status(ctx: commands.Context[Any]) -> None:
+            """List running and queued jobs."""
+            lines = scheduler.status()
+            await ctx.send("\n".join(lines) if lines else "No jobs running")
+
+        @bot.command(name="cancel")
+        async def cancel(ctx: commands.Context[Any], job_id: str = "all") -> None:
+            """Cancel one job by number, or all of them."""
+            if job_id != "all" and not job_id.lstrip("#").isdigit():
+                await ctx.send("Usage: !cancel [job number|all]")
+                return
+            cancelled = scheduler.cancel(None if job_id == "all" else int(job_id.lstrip("#")))
+            if not cancelled:
+                await ctx.send("No matching jobs")
+                return
+            await ctx.send("\n".join(f"Cancelling #{job.id}: {job.description}" for job in cancelled))
 
         @bot.command(name="restart")
         async def restart(ctx: commands.Context[Any]) -> None:
@@ -484,6 +674,12 @@ def main(args: list[str]) -> None:  # noqa: C901, PLR0912, PLR0915
             print("Restarting...")
             print()
             await ctx.send("Restarting...")
+            scheduler.shutdown()
+            session_pool.close()
+            http_transport.close()
+            # Don't lose whatever brokers were still reporting
+            await drain_discord()
+            await discord_sender.close()
             await bot.close()
             if docker_mode:
                 os._exit(0)  # Special exit code to restart docker container
@@ -5,6 +5,8 @@ import asyncio
 import os
 import pprint
 import traceback
+from functools import partial
+from time import perf_counter
 from typing import cast
 
 from chase import account as ch_account
@@ -12,23 +14,25 @@ from chase import order, session, symbols
 from discord.ext.commands import Bot
 from dotenv import load_dotenv
 
-from src.helper_api import Brokerage, StockOrder, get_otp_from_discord, print_all_holdings, print_and_discord
+from src.helper_api import Brokerage, OrderResult, StockOrder, check_cancelled, close_on_cancel, get_otp_from_discord, order_result, print_all_holdings, print_and_discord, quote_cache, wait_for_discord
 
 
-def chase_run(order_obj: StockOrder, bot_obj: Bot | None = None, loop: asyncio.AbstractEventLoop | None = None) -> None:
-    """Run all of the Chase API commands in a single function."""
+def chase_run(order_obj: StockOrder, bot_obj: Bot | None = None, loop: asyncio.AbstractEventLoop | None = None) -> list[OrderResult]:
+    """Run all of the Chase API commands in a single function, returning the outcome of any orders."""
     # Initialize .env file
     load_dotenv()
     # Import Chase account
     if not os.getenv("CHASE"):
         print("Chase not found, skipping...")
-        return
+        return []
     accounts = os.environ["CHASE"].strip().split(",")
     # Get headless flag
     headless = os.getenv("HEADLESS", "true").lower() == "true"
 
+    results: list[OrderResult] = []
     # For each set of login info, i.e. seperate chase accounts
     for account in accounts:
+        check_cancelled()
         # Start at index 1 and go to how many logins we have
         index = accounts.index(account) + 1
         # Receive the chase broker class object and the AllAccount object related to it
@@ -41,17 +45,20 @@ def chase_run(order_obj: StockOrder, bot_obj: Bot | None = None, loop: asyncio.A
         )
         if chase_details is not None:
             order_obj.set_logged_in(chase_details[0], "chase")
-            if order_obj.get_holdings():
-                chase_holdings(chase_details[0], chase_details[1], loop=loop)
-            # Only other option is _transaction
-            else:
-                chase_transaction(
-                    chase_details[0],
-                    chase_details[1],
-                    order_obj,
-                    loop=loop,
-                )
-    return
+            with close_on_cancel(chase_details[0], lambda ch_session: ch_session.close_browser()):
+                if order_obj.get_holdings():
+                    chase_holdings(chase_details[0], chase_details[1], loop=loop)
+                # Only other option is _transaction
+                else:
+                    results.extend(
+                        chase_transaction(
+                            chase_details[0],
+                            chase_details[1],
+                            order_obj,
+                            loop=loop,
+                        ),
+                    )
+    return results
 
 
 def get_account_id(account_connectors: dict[str, str] | None, value: str) -> str | None:
@@ -91,10 +98,10 @@ def chase_init(account: str, index: int, *, headless: bool = True, bot_obj: Bot
             if bot_obj is None and loop is None:
                 ch_session.login_two(input("Enter code: "))
             elif bot_obj is not None and loop is not None:
-                sms_code = asyncio.run_coroutine_threadsafe(
+                sms_code = wait_for_discord(
                     get_otp_from_discord(bot_obj, name, code_len=8, loop=loop),
                     loop,
-                ).result()
+                )
                 if sms_code is None:
                     msg = f"Chase {index} code not received in time..."
                     raise Exception(msg, loop)
@@ -153,6 +160,7 @@ def _process_account_holdings(chase_o: Brokerage, all_accounts: ch_account.AllAc
         if data.get_holdings():
             for position in data.positions:
                 _process_position(position, chase_o, key, account)
+            chase_o.set_holdings_loaded(key, account)
 
 
 def chase_holdings(chase_o: Brokerage, all_accounts: ch_account.AllAccount, loop: asyncio.AbstractEventLoop | None = None) -> None:
@@ -166,6 +174,7 @@ def chase_holdings(chase_o: Brokerage, all_accounts: ch_account.AllAccount, loop
             ch_session = cast("session.ChaseSession", chase_o.get_logged_in_objects(key))
             # Retrieve account masks and iterate through them
             for _, account in enumerate(chase_o.get_account_numbers(key)):
+                check_cancelled()
                 _process_account_holdings(chase_o, all_accounts, key, account)
         except Exception as e:
             if ch_session:
@@ -175,10 +184,15 @@ def chase_holdings(chase_o: Brokerage, all_accounts: ch_account.AllAccount, loop
             continue
         print_all_holdings(chase_o, loop)
     if ch_session:
-        print_and_discord("Closing Chase browser...", loop)
+        print("Closing Chase browser...")
         ch_session.close_browser()
 
 
+def _get_quote(ch_session: session.ChaseSession, account_id: str, symbol: str) -> symbols.SymbolQuote:
+    """Get a quote for symbol using one of the login's accounts."""
+    return symbols.SymbolQuote(account_id=account_id, session=ch_session, symbol=symbol)
+
+
 def _calculate_limit_price(symbol_quote: symbols.SymbolQuote, action: str) -> tuple[order.PriceType, float]:
     """Calculate limit price for buy orders."""
     current_price = symbol_quote.ask_price
@@ -195,46 +209,36 @@ def _calculate_limit_price(symbol_quote: symbols.SymbolQuote, action: str) -> tu
     return order.PriceType.LIMIT, limit_price
 
 
-def _process_order_messages(messages: dict, order_obj: StockOrder, key: str, account: str, loop: asyncio.AbstractEventLoop | None) -> None:
-    """Process and print order messages."""
+def _process_order_messages(messages: dict, order_obj: StockOrder, key: str, account: str) -> str | None:
+    """Process and print order messages, returning an error if the order didn't go through."""
     if order_obj.get_dry():
         pprint.pprint(messages["ORDER VALIDATION"])  # noqa: T203
-        print_and_discord(
-            (f"{key} account {account}: The order verification was " + ("successful" if messages["ORDER VALIDATION"] else "unsuccessful")),
-            loop,
-        )
+        print(f"{key} account {account}: The order verification was " + ("successful" if messages["ORDER VALIDATION"] else "unsuccessful"))
         if messages["ORDER INVALID"]:
-            print_and_discord(
-                f"{key} account {account}: The order verification produced the following messages: {messages['ORDER INVALID']}",
-                loop,
-            )
-    else:
-        pprint.pprint(messages["ORDER CONFIRMATION"])  # noqa: T203
-
-        # Check if ORDER CONFIRMATION is a dict or string
-        order_confirmation = messages["ORDER CONFIRMATION"]
-        is_successful = bool(order_confirmation.get("orderIdentifier")) if isinstance(order_confirmation, dict) else isinstance(order_confirmation, str) and len(order_confirmation) > 0
-        print_and_discord(
-            (f"{key} account {account}: The order was " + ("successful" if is_successful else "unsuccessful")),
-            loop,
-        )
+            print(f"{key} account {account}: The order verification produced the following messages: {messages['ORDER INVALID']}")
+        return None if messages["ORDER VALIDATION"] else f"Order verification failed: {messages['ORDER INVALID']}"
+    pprint.pprint(messages["ORDER CONFIRMATION"])  # noqa: T203
 
-        if messages["ORDER INVALID"]:
-            print_and_discord(
-                f"{key} account {account}: The order produced the following messages: {messages['ORDER INVALID']}",
-                loop,
-            )
+    # Check if ORDER CONFIRMATION is a dict or string
+    order_confirmation = messages["ORDER CONFIRMATION"]
+    is_successful = bool(order_confirmation.get("orderIdentifier")) if isinstance(order_confirmation, dict) else isinstance(order_confirmation, str) and len(order_confirmation) > 0
+    print(f"{key} account {account}: The order was " + ("successful" if is_successful else "unsuccessful"))
 
+    if messages["ORDER INVALID"]:
+        print(f"{key} account {account}: The order produced the following messages: {messages['ORDER INVALID']}")
+    return None if is_successful else f"Order failed: {messages['ORDER INVALID']}"
 
-def _execute_single_order(ch_session: session.ChaseSession, all_accounts: ch_account.AllAccount, order_obj: StockOrder, ticker: str, account: str, price_type: order.PriceType, limit_price: float, key: str, loop: asyncio.AbstractEventLoop | None) -> None:  # noqa: PLR0917
+
+def _execute_single_order(chase_obj: Brokerage, ch_session: session.ChaseSession, all_accounts: ch_account.AllAccount, order_obj: StockOrder, ticker: str, account: str, price_type: order.PriceType, limit_price: float, key: str) -> OrderResult:  # noqa: PLR0917
     """Execute a single order for one account."""
+    started = perf_counter()
     target_account_id = get_account_id(all_accounts.account_connectors, account)
     if not target_account_id:
-        print_and_discord(f"{key} {account}: Unable to find account ID, skipping order.", loop)
-        return
+        print(f"{key} {account}: Unable to find account ID, skipping order.")
+        return order_result(chase_obj, order_obj, key, account, ticker, started, error="Unable to find account ID")
 
     if order_obj.get_dry():
-        print_and_discord("Running in DRY mode. No transactions will be made.", loop)
+        print("Running in DRY mode. No transactions will be made.")
 
     if order_obj.get_action().capitalize() == "Buy":
         order_type = order.OrderSide.BUY
@@ -256,12 +260,14 @@ def _execute_single_order(ch_session: session.ChaseSession, all_accounts: ch_acc
     )
 
     print("The order verification produced the following messages: ")
-    _process_order_messages(messages, order_obj, key, account, loop)
+    error = _process_order_messages(messages, order_obj, key, account)
+    return order_result(chase_obj, order_obj, key, account, ticker, started, error=error)
 
 
-def _process_ticker_orders(chase_obj: Brokerage, all_accounts: ch_account.AllAccount, order_obj: StockOrder, ticker: str, loop: asyncio.AbstractEventLoop | None) -> session.ChaseSession | None:
+def _process_ticker_orders(chase_obj: Brokerage, all_accounts: ch_account.AllAccount, order_obj: StockOrder, ticker: str) -> tuple[session.ChaseSession | None, list[OrderResult]]:
     """Process orders for a single ticker across all accounts."""
     ch_session = None
+    results: list[OrderResult] = []
 
     for key in chase_obj.get_account_numbers():
         price_type = order.PriceType.MARKET
@@ -272,31 +278,27 @@ def _process_ticker_orders(chase_obj: Brokerage, all_accounts: ch_account.AllAcc
         # Determine limit or market for buy orders
         if order_obj.get_action().capitalize() == "Buy":
             account_ids = list([] if all_accounts.account_connectors is None else all_accounts.account_connectors.keys())
-            symbol_quote = symbols.SymbolQuote(
-                account_id=account_ids[0],
-                session=ch_session,
-                symbol=ticker,
-            )
+            symbol_quote = quote_cache.get("chase", ticker, partial(_get_quote, ch_session, account_ids[0]))
             price_type, limit_price = _calculate_limit_price(symbol_quote, order_obj.get_action())
 
-        print_and_discord(
-            f"{key} {order_obj.get_action()}ing {order_obj.get_amount()} {ticker} @ {price_type.value}",
-            loop,
-        )
+        print(f"{key} {order_obj.get_action()}ing {order_obj.get_amount()} {ticker} @ {price_type.value}")
 
         try:
             print(chase_obj.get_account_numbers())
             for account in chase_obj.get_account_numbers(key):
-                _execute_single_order(ch_session, all_accounts, order_obj, ticker, account, price_type, limit_price, key, loop)
+                check_cancelled()
+                started = perf_counter()
+                results.append(_execute_single_order(chase_obj, ch_session, all_accounts, order_obj, ticker, account, price_type, limit_price, key))
         except Exception as e:
-            print_and_discord(f"{key} {account}: Error submitting order: {e}", loop)
+            print(f"{key} {account}: Error submitting order: {e}")
             print(traceback.format_exc())
+            results.append(order_result(chase_obj, order_obj, key, account, ticker, started, error=e))
             continue
 
-    return ch_session
+    return ch_session, results
 
 
-def chase_transaction(chase_obj: Brokerage, all_accounts: ch_account.AllAccount, order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None = None) -> None:
+def chase_transaction(chase_obj: Brokerage, all_accounts: ch_account.AllAccount, order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: ARG001
     """Handle Chase API transactions."""
     print()
     print("==============================")
@@ -305,12 +307,15 @@ def chase_transaction(chase_obj: Brokerage, all_accounts: ch_account.AllAccount,
     print()
 
     ch_session: session.ChaseSession | None = None
+    results: list[OrderResult] = []
 
     for ticker in order_obj.get_stocks():
-        ch_session = _process_ticker_orders(chase_obj, all_accounts, order_obj, ticker, loop)
+        ch_session, ticker_results = _process_ticker_orders(chase_obj, all_accounts, order_obj, ticker)
+        results.extend(ticker_results)
 
     if ch_session:
-        print_and_discord("Closing Chase browser...", loop)
+        print("Closing Chase browser...")
         ch_session.close_browser()
 
-    print_and_discord("All Chase transactions complete", loop)
+    print("All Chase transactions complete")
+    return results
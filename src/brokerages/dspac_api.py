@@ -2,13 +2,14 @@ import asyncio
 import os
 import traceback
 from io import BytesIO
+from time import perf_counter
 from typing import cast
 
 from discord.ext.commands import Bot
 from dotenv import load_dotenv
 from dspac_invest_api import DSPACAPI
 
-from src.helper_api import Brokerage, StockOrder, get_input_from_discord, get_otp_from_discord, mask_string, print_all_holdings, print_and_discord, send_captcha_to_discord
+from src.helper_api import Brokerage, OrderJob, OrderResult, StockOrder, get_input_from_discord, get_otp_from_discord, mask_string, order_result, print_all_holdings, print_and_discord, send_captcha_to_discord, wait_for_discord
 
 
 def dspac_init(bot_obj: Bot | None = None, loop: asyncio.AbstractEventLoop | None = None) -> Brokerage | None:
@@ -73,10 +74,10 @@ def login(ds: DSPACAPI, bot_obj: Bot | None, name: str, loop: asyncio.AbstractEv
                 raise Exception(msg)
             # Get the OTP code from the user
             if bot_obj is not None and loop is not None:  # noqa: SIM108
-                otp_code = asyncio.run_coroutine_threadsafe(
+                otp_code = wait_for_discord(
                     get_otp_from_discord(bot_obj, name, timeout=300, loop=loop),
                     loop,
-                ).result()
+                )
             else:
                 otp_code = input("Enter security code: ")
             if otp_code is None:
@@ -149,19 +150,17 @@ def solve_captcha(ds: DSPACAPI, bot_obj: Bot | None, name: str, loop: asyncio.Ab
         file.seek(0)
         # Retrieve input
         if bot_obj is not None and loop is not None:
-            asyncio.run_coroutine_threadsafe(
-                send_captcha_to_discord(file),
-                loop,
-            ).result()
-            captcha_input = asyncio.run_coroutine_threadsafe(
+            send_captcha_to_discord(file, name, loop)
+            captcha_input = wait_for_discord(
                 get_input_from_discord(
                     bot_obj,
                     f"{name} requires CAPTCHA input",
                     timeout=300,
                     loop=loop,
+                    name=name,
                 ),
                 loop,
-            ).result()
+            )
         else:
             captcha_image.save("./captcha.png", format="PNG")
             captcha_input = input(
@@ -207,6 +206,7 @@ def dspac_holdings(ds: Brokerage, loop: asyncio.AbstractEventLoop | None = None)
                         sym = holding["displaySymbol"]
                         cp = holding["Last"]
                         ds.set_holdings(key, account, sym, qty, cp)
+                ds.set_holdings_loaded(key, account)
             except Exception as e:
                 print_and_discord(f"Error getting DSPAC holdings: {e}")
                 print(traceback.format_exc())
@@ -214,104 +214,108 @@ def dspac_holdings(ds: Brokerage, loop: asyncio.AbstractEventLoop | None = None)
     print_all_holdings(ds, loop, mask_account_number=False)
 
 
-def dspac_transaction(ds: Brokerage, order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None = None) -> None:  # noqa: C901, PLR0912
+def _dspac_order(ds: Brokerage, obj: DSPACAPI, order_obj: StockOrder, job: OrderJob) -> OrderResult:
+    """Place a single DSPAC order for one account."""
+    key, account, s = job.login, job.account, job.ticker
+    action = order_obj.get_action().lower()
+    started = perf_counter()
+    try:
+        quantity = order_obj.get_amount()
+        is_dry_run = order_obj.get_dry()
+        # Buy
+        if action == "buy":
+            # Validate the buy transaction
+            validation_response = obj.validate_buy(
+                symbol=s,
+                amount=quantity,
+                order_side=1,
+                account_number=account,
+            )
+            if validation_response["Outcome"] != "Success":
+                print(
+                    f"{key} {account}: Validation failed for buying {quantity} of {s}: {validation_response['Message']}",
+                )
+                return order_result(ds, order_obj, key, account, s, started, error=f"Validation failed: {validation_response['Message']}")
+            # Proceed to execute the buy if not in dry run mode
+            if not is_dry_run:
+                buy_response = obj.execute_buy(
+                    symbol=s,
+                    amount=quantity,
+                    account_number=account,
+                    dry_run=is_dry_run,
+                )
+                message = buy_response["Message"]
+            else:
+                message = "Dry Run Success"
+        # Sell
+        elif action == "sell":
+            # Check stock holdings before attempting to sell
+            holdings_response = obj.check_stock_holdings(
+                symbol=s,
+                account_number=account,
+            )
+            if holdings_response["Outcome"] != "Success":
+                print(
+                    f"{key} {account}: Error checking holdings: {holdings_response['Message']}",
+                )
+                return order_result(ds, order_obj, key, account, s, started, error=f"Error checking holdings: {holdings_response['Message']}")
+            available_amount = float(
+                holdings_response["Data"]["enableAmount"],
+            )
+            # If trying to sell more than available, skip to the next
+            if quantity > available_amount:
+                print(
+                    f"{key} {account}: Not enough shares to sell {quantity} of {s}. Available: {available_amount}",
+                )
+                return order_result(ds, order_obj, key, account, s, started, error=f"Not enough shares to sell. Available: {available_amount}")
+            # Validate the sell transaction
+            validation_response = obj.validate_sell(
+                symbol=s,
+                amount=quantity,
+                account_number=account,
+            )
+            if validation_response["Outcome"] != "Success":
+                print(
+                    f"{key} {account}: Validation failed for selling {quantity} of {s}: {validation_response['Message']}",
+                )
+                return order_result(ds, order_obj, key, account, s, started, error=f"Validation failed: {validation_response['Message']}")
+            # Proceed to execute the sell if not in dry run mode
+            if not is_dry_run:
+                entrust_price = validation_response["Data"]["entrustPrice"]
+                sell_response = obj.execute_sell(
+                    symbol=s,
+                    amount=quantity,
+                    account_number=account,
+                    entrust_price=entrust_price,
+                    dry_run=is_dry_run,
+                )
+                message = sell_response["Message"]
+            else:
+                message = "Dry Run Success"
+        print(
+            f"{key}: {order_obj.get_action().capitalize()} {quantity} of {s} in {account}: {message}",
+        )
+        return order_result(ds, order_obj, key, account, s, started)
+    except Exception as e:
+        print(f"{key} {account}: Error placing order: {e}")
+        print(traceback.format_exc())
+        return order_result(ds, order_obj, key, account, s, started, error=e)
+
+
+def dspac_transaction(ds: Brokerage, order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: ARG001
     """Handle Fennel DSPAC transactions."""
     print()
     print("==============================")
     print("DSPAC")
     print("==============================")
     print()
+    results: list[OrderResult] = []
     for s in order_obj.get_stocks():
         for key in ds.get_account_numbers():
             action = order_obj.get_action().lower()
-            print_and_discord(
+            print(
                 f"{key}: {action}ing {order_obj.get_amount()} of {s}",
-                loop,
             )
-            for account in ds.get_account_numbers(key):
-                obj = cast("DSPACAPI", ds.get_logged_in_objects(key, "ds"))
-                try:
-                    quantity = order_obj.get_amount()
-                    is_dry_run = order_obj.get_dry()
-                    # Buy
-                    if action == "buy":
-                        # Validate the buy transaction
-                        validation_response = obj.validate_buy(
-                            symbol=s,
-                            amount=quantity,
-                            order_side=1,
-                            account_number=account,
-                        )
-                        if validation_response["Outcome"] != "Success":
-                            print_and_discord(
-                                f"{key} {account}: Validation failed for buying {quantity} of {s}: {validation_response['Message']}",
-                                loop,
-                            )
-                            continue
-                        # Proceed to execute the buy if not in dry run mode
-                        if not is_dry_run:
-                            buy_response = obj.execute_buy(
-                                symbol=s,
-                                amount=quantity,
-                                account_number=account,
-                                dry_run=is_dry_run,
-                            )
-                            message = buy_response["Message"]
-                        else:
-                            message = "Dry Run Success"
-                    # Sell
-                    elif action == "sell":
-                        # Check stock holdings before attempting to sell
-                        holdings_response = obj.check_stock_holdings(
-                            symbol=s,
-                            account_number=account,
-                        )
-                        if holdings_response["Outcome"] != "Success":
-                            print_and_discord(
-                                f"{key} {account}: Error checking holdings: {holdings_response['Message']}",
-                                loop,
-                            )
-                            continue
-                        available_amount = float(
-                            holdings_response["Data"]["enableAmount"],
-                        )
-                        # If trying to sell more than available, skip to the next
-                        if quantity > available_amount:
-                            print_and_discord(
-                                f"{key} {account}: Not enough shares to sell {quantity} of {s}. Available: {available_amount}",
-                                loop,
-                            )
-                            continue
-                        # Validate the sell transaction
-                        validation_response = obj.validate_sell(
-                            symbol=s,
-                            amount=quantity,
-                            account_number=account,
-                        )
-                        if validation_response["Outcome"] != "Success":
-                            print_and_discord(
-                                f"{key} {account}: Validation failed for selling {quantity} of {s}: {validation_response['Message']}",
-                                loop,
-                            )
-                            continue
-                        # Proceed to execute the sell if not in dry run mode
-                        if not is_dry_run:
-                            entrust_price = validation_response["Data"]["entrustPrice"]
-                            sell_response = obj.execute_sell(
-                                symbol=s,
-                                amount=quantity,
-                                account_number=account,
-                                entrust_price=entrust_price,
-                                dry_run=is_dry_run,
-                            )
-                            message = sell_response["Message"]
-                        else:
-                            message = "Dry Run Success"
-                    print_and_discord(
-                        f"{key}: {order_obj.get_action().capitalize()} {quantity} of {s} in {account}: {message}",
-                        loop,
-                    )
-                except Exception as e:
-                    print_and_discord(f"{key} {account}: Error placing order: {e}", loop)
-                    print(traceback.format_exc())
-                    continue
+            obj = cast("DSPACAPI", ds.get_logged_in_objects(key, "ds"))
+            results.extend(_dspac_order(ds, obj, order_obj, OrderJob(s, key, account)) for account in ds.get_account_numbers(key))
+    return results
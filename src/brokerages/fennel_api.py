@@ -1,17 +1,21 @@
 import os
 import traceback
 from asyncio import AbstractEventLoop
+from time import perf_counter
 from typing import TYPE_CHECKING, cast
 
 from dotenv import load_dotenv
 from email_validator import EmailNotValidError, validate_email
 from fennel_invest_api import Fennel
 
-from src.helper_api import Brokerage, StockOrder, print_all_holdings, print_and_discord
+from src.brokers import FennelInfo
+from src.helper_api import Brokerage, OrderJob, OrderResult, StockOrder, build_order_jobs, dispatch_orders, order_result, print_all_holdings, print_and_discord
 
 if TYPE_CHECKING:
     from fennel_invest_api.models.accounts_pb2 import Account
 
+FENNEL_ORDER_WORKERS = FennelInfo().max_concurrency  # Number of orders to place at once
+
 
 def fennel_init(loop: AbstractEventLoop | None = None) -> Brokerage | None:
     """Initialize Fennel API."""
@@ -76,6 +80,7 @@ def fennel_holdings(fbo: Brokerage, loop: AbstractEventLoop | None = None) -> No
                             continue
                         price = holding.value if holding.value is not None else "N/A"
                         fbo.set_holdings(key, account, holding.symbol, holding.shares, price)
+                fbo.set_holdings_loaded(key, account)
             except Exception as e:
                 print_and_discord(f"Error getting Fennel holdings: {e}")
                 print(traceback.format_exc())
@@ -83,7 +88,37 @@ def fennel_holdings(fbo: Brokerage, loop: AbstractEventLoop | None = None) -> No
     print_all_holdings(fbo, loop, mask_account_number=False)
 
 
-def fennel_transaction(fbo: Brokerage, order_obj: StockOrder, loop: AbstractEventLoop | None = None) -> None:
+def _fennel_order(fbo: Brokerage, order_obj: StockOrder, job: OrderJob) -> OrderResult:
+    """Place a single Fennel order for one account."""
+    started = perf_counter()
+    s = job.ticker
+    key = job.login
+    account = job.account
+    obj = cast("Fennel", fbo.get_logged_in_objects(key, "fb"))
+    account_info = cast("Account", fbo.get_logged_in_objects(key, account))
+    try:
+        error = None
+        if not order_obj.get_dry():
+            order = obj.place_order(
+                account_id=account_info.id,
+                symbol=s,
+                shares=order_obj.get_amount(),
+                side="BUY" if order_obj.get_action().lower() == "buy" else "SELL",
+            )
+            message = f"Success: {order.success}, Status: {order.status}, ID: {order.id}"
+            if not order.success:
+                error = f"Status: {order.status}"
+        else:
+            message = "Dry Run Success"
+        print(f"{key}: {order_obj.get_action()} {order_obj.get_amount()} of {s} in {account}: {message}")
+        return order_result(fbo, order_obj, key, account, s, started, error=error)
+    except Exception as e:
+        print(f"{key} {account}: Error placing order: {e}")
+        print(traceback.format_exc())
+        return order_result(fbo, order_obj, key, account, s, started, error=e)
+
+
+def fennel_transaction(fbo: Brokerage, order_obj: StockOrder, loop: AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: ARG001
     """Handle Fennel API transactions."""
     print()
     print("==============================")
@@ -92,29 +127,13 @@ def fennel_transaction(fbo: Brokerage, order_obj: StockOrder, loop: AbstractEven
     print()
     for s in order_obj.get_stocks():
         for key in fbo.get_account_numbers():
-            print_and_discord(
-                f"{key}: {order_obj.get_action()}ing {order_obj.get_amount()} of {s}",
-                loop,
-            )
-            for account in fbo.get_account_numbers(key):
-                obj = cast("Fennel", fbo.get_logged_in_objects(key, "fb"))
-                account_info = cast("Account", fbo.get_logged_in_objects(key, account))
-                try:
-                    if not order_obj.get_dry():
-                        order = obj.place_order(
-                            account_id=account_info.id,
-                            symbol=s,
-                            shares=order_obj.get_amount(),
-                            side="BUY" if order_obj.get_action().lower() == "buy" else "SELL",
-                        )
-                        message = f"Success: {order.success}, Status: {order.status}, ID: {order.id}"
-                    else:
-                        message = "Dry Run Success"
-                    print_and_discord(
-                        f"{key}: {order_obj.get_action()} {order_obj.get_amount()} of {s} in {account}: {message}",
-                        loop,
-                    )
-                except Exception as e:
-                    print_and_discord(f"{key} {account}: Error placing order: {e}", loop)
-                    print(traceback.format_exc())
-                    continue
+            print(f"{key}: {order_obj.get_action()}ing {order_obj.get_amount()} of {s}")
+    jobs, skipped = build_order_jobs(fbo, order_obj)
+    results = dispatch_orders(
+        fbo,
+        order_obj,
+        jobs,
+        lambda job: _fennel_order(fbo, order_obj, job),
+        max_workers=FENNEL_ORDER_WORKERS,
+    )
+    return skipped + results
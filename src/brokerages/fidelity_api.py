@@ -7,33 +7,36 @@
 import asyncio
 import os
 import traceback
+from time import perf_counter
 from typing import cast
 
 from discord.ext.commands import Bot
 from dotenv import load_dotenv
 from fidelity import fidelity
 
-from src.helper_api import Brokerage, StockOrder, get_otp_from_discord, mask_string, print_all_holdings, print_and_discord
+from src.helper_api import Brokerage, OrderResult, StockOrder, check_cancelled, close_on_cancel, get_otp_from_discord, mask_string, order_result, print_all_holdings, wait_for_discord
 
 
 def fidelity_run(
     order_obj: StockOrder,
     bot_obj: Bot | None = None,
     loop: asyncio.AbstractEventLoop | None = None,
-) -> None:
+) -> list[OrderResult]:
     """Entry point from main function. Gathers credentials and go through commands for each set of credentials found in the FIDELITY env variable."""
     # Initialize .env file
     load_dotenv()
     # Import Chase account
     if not os.getenv("FIDELITY"):
         print("Fidelity not found, skipping...")
-        return
+        return []
     accounts = os.environ["FIDELITY"].strip().split(",")
     # Get headless flag
     headless = os.getenv("HEADLESS", "true").lower() == "true"
 
+    results: list[OrderResult] = []
     # For each set of login info, i.e. separate chase accounts
     for account in accounts:
+        check_cancelled()
         # Start at index 1 and go to how many logins we have
         index = accounts.index(account) + 1
         name = f"Fidelity {index}"
@@ -48,12 +51,13 @@ def fidelity_run(
         if fidelityobj is not None:
             # Store the Brokerage object for fidelity under 'fidelity' in the orderObj
             order_obj.set_logged_in(fidelityobj, "fidelity")
-            if order_obj.get_holdings():
-                fidelity_holdings(fidelityobj, name, loop=loop)
-            # Only other option is _transaction
-            else:
-                fidelity_transaction(fidelityobj, name, order_obj, loop=loop)
-    return
+            with close_on_cancel(fidelityobj, lambda fidelity_browser: fidelity_browser.close_browser()):
+                if order_obj.get_holdings():
+                    fidelity_holdings(fidelityobj, name, loop=loop)
+                # Only other option is _transaction
+                else:
+                    results.extend(fidelity_transaction(fidelityobj, name, order_obj, loop=loop))
+    return results
 
 
 def fidelity_init(account: str, name: str, *, headless: bool = True, bot_obj: Bot | None = None, loop: asyncio.AbstractEventLoop | None = None) -> Brokerage | None:
@@ -90,10 +94,10 @@ def fidelity_init(account: str, name: str, *, headless: bool = True, bot_obj: Bo
                 fidelity_browser.login_2FA(input("Enter code: "))
             elif bot_obj is not None and loop is not None:
                 # Should wait for 60 seconds before timeout
-                sms_code = asyncio.run_coroutine_threadsafe(
+                sms_code = wait_for_discord(
                     get_otp_from_discord(bot_obj, name, code_len=6, loop=loop),
                     loop,
-                ).result()
+                )
                 if sms_code is None:
                     msg = f"{name}: No SMS code found"
                     raise Exception(msg, loop)
@@ -135,6 +139,7 @@ def fidelity_holdings(fidelity_o: Brokerage, name: str, loop: asyncio.AbstractEv
     fidelity_browser = cast("fidelity.FidelityAutomation", fidelity_o.get_logged_in_objects(name))
     account_dict = fidelity_browser.account_dict
     for account_number in account_dict:
+        fidelity_o.set_holdings_loaded(name, account_number)
         for d in account_dict[account_number]["stocks"]:
             # Append the ticker to the appropriate account
             fidelity_o.set_holdings(
@@ -156,26 +161,31 @@ def fidelity_transaction(
     fidelity_o: Brokerage,
     name: str,
     order_obj: StockOrder,
-    loop: asyncio.AbstractEventLoop | None = None,
-) -> None:
+    loop: asyncio.AbstractEventLoop | None = None,  # noqa: ARG001
+) -> list[OrderResult]:
     """Call FidelityAutomation.transaction() and process its return."""
     # Get the driver
     fidelity_browser = cast("fidelity.FidelityAutomation", fidelity_o.get_logged_in_objects(name))
     # Get full list of accounts in case some had no holdings
     fidelity_browser.get_list_of_accounts()
-    # Go trade
+    results: list[OrderResult] = []
+    # Say what we are doing
     for stock in order_obj.get_stocks():
-        # Say what we are doing
-        print_and_discord(
+        print(
             f"{name}: {order_obj.get_action()}ing {order_obj.get_amount()} of {stock}",
-            loop,
         )
-        # Reload the page incase we were trading before
-        fidelity_browser.page.reload()
-        for account_number in fidelity_browser.account_dict:
+    # Reload the page once incase we were trading before
+    fidelity_browser.page.reload()
+    # Go account first, so every ticker is placed before moving to the next account
+    for account_number in fidelity_browser.account_dict:
+        held = fidelity_browser.get_stocks_in_account(account_number) if order_obj.get_action().lower() == "sell" else []
+        for stock in order_obj.get_stocks():
+            check_cancelled()
+            started = perf_counter()
             # If we are selling, check to see if the account has the stock to sell
-            if order_obj.get_action().lower() == "sell" and stock not in fidelity_browser.get_stocks_in_account(account_number):
+            if order_obj.get_action().lower() == "sell" and stock not in held:
                 # Doesn't have it, skip account
+                results.append(order_result(fidelity_o, order_obj, name, account_number, stock, started, skipped=True))
                 continue
 
             # Go trade for all accounts for that stock
@@ -190,24 +200,23 @@ def fidelity_transaction(
                 ),
             )
             print_account = mask_string(account_number)
+            results.append(order_result(fidelity_o, order_obj, name, account_number, stock, started, error=None if success else error_message or "Unknown error"))
             # Report error if occurred
             if not success:
-                print_and_discord(
+                print(
                     f"{name} account {print_account}: Error: {error_message}",
-                    loop,
                 )
             # Print test run confirmation if test run
             elif success and order_obj.get_dry():
-                print_and_discord(
+                print(
                     f"DRY: {name} account {print_account}: {order_obj.get_action()} {order_obj.get_amount()} shares of {stock}",
-                    loop,
                 )
             # Print real run confirmation if real run
             elif success and not order_obj.get_dry():
-                print_and_discord(
+                print(
                     f"{name} account {print_account}: {order_obj.get_action()} {order_obj.get_amount()} shares of {stock}",
-                    loop,
                 )
 
     # Close browser
     fidelity_browser.close_browser()
+    return results
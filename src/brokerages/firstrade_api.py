@@ -5,7 +5,8 @@ import asyncio
 import os
 import pprint
 import traceback
-from time import sleep
+from functools import partial
+from time import perf_counter, sleep
 from typing import cast
 
 from discord.ext.commands import Bot
@@ -14,7 +15,7 @@ from firstrade import account as ft_account
 from firstrade import order, symbols
 from firstrade.exceptions import QuoteRequestError
 
-from src.helper_api import Brokerage, StockOrder, get_otp_from_discord, mask_string, print_all_holdings, print_and_discord
+from src.helper_api import Brokerage, OrderResult, StockOrder, get_otp_from_discord, mask_string, order_result, print_all_holdings, print_and_discord, quote_cache, wait_for_discord
 
 
 def firstrade_init(bot_obj: Bot | None = None, loop: asyncio.AbstractEventLoop | None = None) -> Brokerage | None:
@@ -47,10 +48,10 @@ def firstrade_init(bot_obj: Bot | None = None, loop: asyncio.AbstractEventLoop |
                 if bot_obj is None and loop is None:
                     firstrade.login_two(input("Enter code: "))
                 elif bot_obj is not None and loop is not None:
-                    sms_code = asyncio.run_coroutine_threadsafe(
+                    sms_code = wait_for_discord(
                         get_otp_from_discord(bot_obj, name, timeout=300, loop=loop),
                         loop,
-                    ).result()
+                    )
                     if sms_code is None:
                         msg = f"Firstrade {index} code not received in time..."
                         raise Exception(msg, loop)
@@ -70,22 +71,40 @@ def firstrade_init(bot_obj: Bot | None = None, loop: asyncio.AbstractEventLoop |
     return firstrade_obj
 
 
+def firstrade_alive(firstrade_o: Brokerage) -> bool:
+    """Check that every Firstrade login can still see its accounts."""
+    for key in firstrade_o.get_account_numbers():
+        obj = cast("ft_account.FTSession", firstrade_o.get_logged_in_objects(key))
+        if not ft_account.FTAccountData(obj.session).account_numbers:
+            return False
+    return True
+
+
 def firstrade_holdings(firstrade_o: Brokerage, loop: asyncio.AbstractEventLoop | None = None) -> None:
     """Retrieve and display all Firstrade account holdings."""
     # Get holdings on each account
     for key in firstrade_o.get_account_numbers():
+        obj = cast("ft_account.FTSession", firstrade_o.get_logged_in_objects(key))
+        try:
+            account_info = ft_account.FTAccountData(obj.session)
+        except Exception as e:
+            print_and_discord(f"{key}: Error getting account data: {e}", loop)
+            print(traceback.format_exc())
+            continue
         for account in firstrade_o.get_account_numbers(key):
-            obj = cast("ft_account.FTSession", firstrade_o.get_logged_in_objects(key))
             try:
-                data = ft_account.FTAccountData(obj.session).get_positions(account=account)
+                # Refresh the total too, a reused session still has the one from when it logged in
+                firstrade_o.set_account_totals(key, account, str(account_info.account_balances[account]))
+                data = account_info.get_positions(account=account)
                 for item in data["items"]:  # ty:ignore[not-iterable]
                     symbol = item["symbol"]
                     try:
-                        quote = symbols.SymbolQuote(obj, account, symbol)
+                        quote = quote_cache.get("firstrade", symbol, partial(symbols.SymbolQuote, obj, account))
                         price = quote.last
                     except QuoteRequestError:
                         price = 0
                     firstrade_o.set_holdings(key, account, symbol, item["quantity"], price)
+                firstrade_o.set_holdings_loaded(key, account)
             except Exception as e:
                 print_and_discord(f"{key} {account}: Error getting holdings: {e}", loop)
                 print(traceback.format_exc())
@@ -93,61 +112,59 @@ def firstrade_holdings(firstrade_o: Brokerage, loop: asyncio.AbstractEventLoop |
     print_all_holdings(firstrade_o, loop)
 
 
-def firstrade_transaction(firstrade_o: Brokerage, order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None = None) -> None:  # noqa: C901, PLR0912, PLR0914, PLR0915
+def firstrade_transaction(firstrade_o: Brokerage, order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: ARG001, C901, PLR0912, PLR0914, PLR0915
     """Handle Firstrade API transactions."""
     print()
     print("==============================")
     print("Firstrade")
     print("==============================")
     print()
+    results: list[OrderResult] = []
     # Buy on each account
     for s in order_obj.get_stocks():
         for key in firstrade_o.get_account_numbers():
             for account in firstrade_o.get_account_numbers(key):
                 obj = cast("ft_account.FTSession", firstrade_o.get_logged_in_objects(key))
                 print_account = mask_string(account)
+                started = perf_counter()
                 # If DRY is True, don't actually make the transaction
                 if order_obj.get_dry():
-                    print_and_discord(
+                    print(
                         "Running in DRY mode. No transactions will be made.",
-                        loop,
                     )
-                old_amount = order_obj.get_amount()
-                original_action = order_obj.get_action()
+                error = None
                 try:
                     should_dance = False
-                    symbol_data = symbols.SymbolQuote(obj, account, s)
+                    amount = order_obj.get_amount()
+                    symbol_data = quote_cache.get("firstrade", s, partial(symbols.SymbolQuote, obj, account))
                     if float(symbol_data.last) < 1.00:
                         under_one_buy_amount = 100
-                        if int(order_obj.get_amount()) < under_one_buy_amount:
+                        if int(amount) < under_one_buy_amount:
                             should_dance = True
                         price_type = order.PriceType.LIMIT
-                        order_obj.set_price("limit")
+                        price_label = "limit"
                         price = float(symbol_data.last) + 0.01 if order_obj.get_action().capitalize() == "Buy" else float(symbol_data.last) - 0.01
                     else:
                         price_type = order.PriceType.MARKET
-                        order_obj.set_price("market")
+                        price_label = "market"
                         price = 0.00
                     order_type = order.OrderType.BUY if order_obj.get_action().capitalize() == "Buy" else order.OrderType.SELL
-                    print_and_discord(
-                        f"{key} {order_obj.get_action()}ing {order_obj.get_amount()} {s} @ {order_obj.get_price()}",
-                        loop,
+                    print(
+                        f"{key} {order_obj.get_action()}ing {amount} {s} @ {price_label}",
                     )
                     if should_dance and order_obj.get_action() == "buy":
                         # Do the dance
                         quantity = 100
-                        print_and_discord(
-                            f"Buying {quantity} then selling {quantity - order_obj.get_amount()} of {s}",
-                            loop,
+                        print(
+                            f"Buying {quantity} then selling {quantity - amount} of {s}",
                         )
-                        order_obj.set_amount(quantity)
                         ft_order = order.Order(obj)
                         order_conf = ft_order.place_order(
                             account=account,
                             symbol=s,
                             price_type=price_type,
                             order_type=order_type,
-                            quantity=int(order_obj.get_amount()),
+                            quantity=quantity,
                             duration=order.Duration.DAY,
                             price=price,
                             dry_run=order_obj.get_dry(),
@@ -157,18 +174,15 @@ def firstrade_transaction(firstrade_o: Brokerage, order_obj: StockOrder, loop: a
                         )
                         pprint.pprint(order_conf)  # noqa: T203
                         buy_success = not order_conf["error"]
-                        print_and_discord(
+                        print(
                             (f"{key} account {print_account}: The buy order verification was successful" if buy_success else f"{key} account {print_account}: The sell order verification was unsuccessful"),
-                            loop,
                         )
                         if not buy_success:
-                            print_and_discord(
+                            print(
                                 f"{key} account {print_account}: The order verification produced the following messages: {order_conf}",
-                                loop,
                             )
                             msg = f"Error buying {quantity} of {s}"
                             raise Exception(msg)
-                        order_obj.set_amount(quantity - old_amount)
                         # Rest before selling
                         sleep(1)
                         symbol_data = symbols.SymbolQuote(obj, account, s)
@@ -179,7 +193,7 @@ def firstrade_transaction(firstrade_o: Brokerage, order_obj: StockOrder, loop: a
                             symbol=s,
                             price_type=price_type,
                             order_type=order.OrderType.SELL,
-                            quantity=int(order_obj.get_amount()),
+                            quantity=int(quantity - amount),
                             duration=order.Duration.DAY,
                             price=price,
                             dry_run=order_obj.get_dry(),
@@ -189,16 +203,14 @@ def firstrade_transaction(firstrade_o: Brokerage, order_obj: StockOrder, loop: a
                         )
                         pprint.pprint(order_conf)  # noqa: T203
                         sell_success = not order_conf["error"]
-                        print_and_discord(
+                        print(
                             (f"{key} account {print_account}: The sell order verification was successful" if sell_success else f"{key} account {print_account}: The sell order verification was unsuccessful"),
-                            loop,
                         )
                         if not sell_success:
-                            print_and_discord(
+                            print(
                                 f"{key} account {print_account}: The order verification produced the following messages: {order_conf}",
-                                loop,
                             )
-                            msg = f"Error selling {quantity - old_amount} of {s}"
+                            msg = f"Error selling {quantity - amount} of {s}"
                             raise Exception(msg)
                     else:
                         # Normal buy/sell
@@ -208,7 +220,7 @@ def firstrade_transaction(firstrade_o: Brokerage, order_obj: StockOrder, loop: a
                             symbol=s,
                             price_type=price_type,
                             order_type=order_type,
-                            quantity=int(order_obj.get_amount()),
+                            quantity=int(amount),
                             duration=order.Duration.DAY,
                             price=price,
                             dry_run=order_obj.get_dry(),
@@ -218,26 +230,22 @@ def firstrade_transaction(firstrade_o: Brokerage, order_obj: StockOrder, loop: a
                         )
                         pprint.pprint(order_conf)  # noqa: T203
                         order_success = not order_conf["error"]
-                        print_and_discord(
+                        print(
                             (f"{key} account {print_account}: The order verification was successful" if order_success else f"{key} account {print_account}: The sell order verification was unsuccessful"),
-                            loop,
                         )
                         if not order_success:
-                            print_and_discord(
+                            print(
                                 f"{key} account {print_account}: The order verification produced the following messages: {order_conf}",
-                                loop,
                             )
+                            error = f"Order verification failed: {order_conf['error']}"
                 except Exception as e:
-                    print_and_discord(
+                    print(
                         f"{key} {print_account}: Error submitting order: {e}",
-                        loop,
                     )
                     print(traceback.format_exc())
+                    results.append(order_result(firstrade_o, order_obj, key, account, s, started, error=e))
                     continue
-
-                finally:
-                    # Restore orderObj
-                    order_obj.set_amount(old_amount)
-                    order_obj.set_action("buy" if original_action.lower() == "buy" else "sell")
+                results.append(order_result(firstrade_o, order_obj, key, account, s, started, error=error))
                 sleep(1)
                 print()
+    return results
@@ -3,6 +3,7 @@ import traceback
 import uuid
 from asyncio import AbstractEventLoop
 from decimal import Decimal
+from time import perf_counter
 from typing import cast
 
 from dotenv import load_dotenv
@@ -10,13 +11,15 @@ from email_validator import EmailNotValidError, validate_email
 from public_api_sdk import AccountType, InstrumentType, OrderExpirationRequest, OrderInstrument, OrderRequest, OrderSide, OrderType, PreflightRequest, PublicApiClient, TimeInForce
 from public_api_sdk.auth_config import ApiKeyAuthConfig
 
-from src.helper_api import Brokerage, StockOrder, mask_string, print_all_holdings, print_and_discord
+from src.brokers import PublicInfo
+from src.helper_api import Brokerage, OrderJob, OrderResult, StockOrder, build_order_jobs, dispatch_orders, mask_string, order_result, print_all_holdings, print_and_discord
 
 TRADABLE_ACCOUNT_TYPES = [
     AccountType.BROKERAGE,
     AccountType.ROTH_IRA,
     AccountType.TRADITIONAL_IRA,
 ]
+PUBLIC_ORDER_WORKERS = PublicInfo().max_concurrency  # Number of orders to place at once
 
 
 def public_init(loop: AbstractEventLoop | None = None) -> Brokerage | None:
@@ -75,6 +78,7 @@ def public_holdings(pbo: Brokerage, loop: AbstractEventLoop | None = None) -> No
                         # Get symbol, quantity, and total value
                         current_price = float(holding.last_price.last_price) if holding.last_price is not None and holding.last_price.last_price is not None else "N/A"
                         pbo.set_holdings(key, account, holding.instrument.symbol, float(holding.quantity), current_price)
+                pbo.set_holdings_loaded(key, account)
             except Exception as e:
                 print_and_discord(f"{key}: Error getting account holdings: {e}", loop)
                 print(traceback.format_exc())
@@ -82,7 +86,63 @@ def public_holdings(pbo: Brokerage, loop: AbstractEventLoop | None = None) -> No
     print_all_holdings(pbo, loop)
 
 
-def public_transaction(pbo: Brokerage, order_obj: StockOrder, loop: AbstractEventLoop | None = None) -> None:
+def _public_order(pbo: Brokerage, order_obj: StockOrder, job: OrderJob) -> OrderResult:
+    """Place a single Public order for one account."""
+    started = perf_counter()
+    s = job.ticker
+    account = job.account
+    # Check to only trade on brokerage accounts not HYSA
+    account_type = pbo.get_account_types(job.login, account)
+    if account_type not in TRADABLE_ACCOUNT_TYPES:
+        print(f"{mask_string(account)}: Skipping non-tradable account type: {account_type}")
+        return order_result(pbo, order_obj, job.login, account, s, started, skipped=True)
+    # Get Public API object
+    obj = cast("PublicApiClient", pbo.get_logged_in_objects(job.login, "pb"))
+    print_account = mask_string(account)
+    # Dry run
+    if order_obj.get_dry():
+        try:
+            preflight_request = PreflightRequest(
+                instrument=OrderInstrument(symbol=s, type=InstrumentType.EQUITY),
+                order_side=OrderSide(order_obj.get_action().upper()),
+                order_type=OrderType.MARKET,
+                expiration=OrderExpirationRequest(time_in_force=TimeInForce.DAY, expiration_time=None),
+                quantity=Decimal(order_obj.get_amount()),
+                amount=None,
+                limit_price=None,
+                stop_price=None,
+                open_close_indicator=None,
+            )
+            obj.perform_preflight_calculation(preflight_request, account_id=account)
+            print(f"DRY RUN: {order_obj.get_action()} {order_obj.get_amount()} of {s} in {print_account}: Preflight check successful")
+        except Exception as e:
+            print(f"DRY RUN: {print_account}: Preflight check failed: {e}")
+            traceback.print_exc()
+            return order_result(pbo, order_obj, job.login, account, s, started, error=e)
+    else:
+        try:
+            order_request = OrderRequest(
+                order_id=str(uuid.uuid4()),
+                instrument=OrderInstrument(symbol=s, type=InstrumentType.EQUITY),
+                order_side=OrderSide(order_obj.get_action().upper()),
+                order_type=OrderType.MARKET,
+                expiration=OrderExpirationRequest(time_in_force=TimeInForce.DAY, expiration_time=None),
+                quantity=Decimal(order_obj.get_amount()),
+                amount=None,
+                limit_price=None,
+                stop_price=None,
+                open_close_indicator=None,
+            )
+            obj.place_order(order_request, account_id=account)
+            print(f"{order_obj.get_action()} {order_obj.get_amount()} of {s} in {print_account}: Success")
+        except Exception as e:
+            print(f"{print_account}: Error placing order: {e}")
+            traceback.print_exc()
+            return order_result(pbo, order_obj, job.login, account, s, started, error=e)
+    return order_result(pbo, order_obj, job.login, account, s, started)
+
+
+def public_transaction(pbo: Brokerage, order_obj: StockOrder, loop: AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: ARG001
     """Handle Public API transactions."""
     print()
     print("==============================")
@@ -91,61 +151,13 @@ def public_transaction(pbo: Brokerage, order_obj: StockOrder, loop: AbstractEven
     print()
     for s in order_obj.get_stocks():
         for key in pbo.get_account_numbers():
-            print_and_discord(
-                f"{key}: {order_obj.get_action()}ing {order_obj.get_amount()} of {s}",
-                loop,
-            )
-            for account in pbo.get_account_numbers(key):
-                # Check to only trade on brokerage accounts not HYSA
-                account_type = pbo.get_account_types(key, account)
-                if account_type not in TRADABLE_ACCOUNT_TYPES:
-                    print_and_discord(f"{mask_string(account)}: Skipping non-tradable account type: {account_type}")
-                    continue
-                # Get Public API object
-                obj = cast("PublicApiClient", pbo.get_logged_in_objects(key, "pb"))
-                print_account = mask_string(account)
-                # Dry run
-                if order_obj.get_dry():
-                    try:
-                        preflight_request = PreflightRequest(
-                            instrument=OrderInstrument(symbol=s, type=InstrumentType.EQUITY),
-                            order_side=OrderSide(order_obj.get_action().upper()),
-                            order_type=OrderType.MARKET,
-                            expiration=OrderExpirationRequest(time_in_force=TimeInForce.DAY, expiration_time=None),
-                            quantity=Decimal(order_obj.get_amount()),
-                            amount=None,
-                            limit_price=None,
-                            stop_price=None,
-                            open_close_indicator=None,
-                        )
-                        obj.perform_preflight_calculation(preflight_request, account_id=account)
-                        print_and_discord(
-                            f"DRY RUN: {order_obj.get_action()} {order_obj.get_amount()} of {s} in {print_account}: Preflight check successful",
-                            loop,
-                        )
-                    except Exception as e:
-                        print_and_discord(f"DRY RUN: {print_account}: Preflight check failed: {e}", loop)
-                        traceback.print_exc()
-                else:
-                    try:
-                        order_request = OrderRequest(
-                            order_id=str(uuid.uuid4()),
-                            instrument=OrderInstrument(symbol=s, type=InstrumentType.EQUITY),
-                            order_side=OrderSide(order_obj.get_action().upper()),
-                            order_type=OrderType.MARKET,
-                            expiration=OrderExpirationRequest(time_in_force=TimeInForce.DAY, expiration_time=None),
-                            quantity=Decimal(order_obj.get_amount()),
-                            amount=None,
-                            limit_price=None,
-                            stop_price=None,
-                            open_close_indicator=None,
-                        )
-                        obj.place_order(order_request, account_id=account)
-                        print_and_discord(
-                            f"{order_obj.get_action()} {order_obj.get_amount()} of {s} in {print_account}: Success",
-                            loop,
-                        )
-                    except Exception as e:
-                        print_and_discord(f"{print_account}: Error placing order: {e}", loop)
-                        traceback.print_exc()
-                        continue
+            print(f"{key}: {order_obj.get_action()}ing {order_obj.get_amount()} of {s}")
+    jobs, skipped = build_order_jobs(pbo, order_obj)
+    results = dispatch_orders(
+        pbo,
+        order_obj,
+        jobs,
+        lambda job: _public_order(pbo, order_obj, job),
+        max_workers=PUBLIC_ORDER_WORKERS,
+    )
+    return skipped + results
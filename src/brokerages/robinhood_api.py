@@ -2,15 +2,108 @@
 # Robinhood API
 
 import contextlib
+import importlib.util
+import json
 import os
+import sys
 import traceback
 from asyncio import AbstractEventLoop
+from pathlib import Path
+from threading import Lock
+from time import perf_counter, time
 from typing import Any, cast
 
 from dotenv import load_dotenv
 
-from src.helper_api import Brokerage, StockOrder, mask_string, print_all_holdings, print_and_discord
-from src.vendors.robin_stocks.robin_stocks import robinhood as rh
+from src.helper_api import Brokerage, OrderJob, OrderResult, StockOrder, mask_string, order_result, print_all_holdings, print_and_discord, quote_cache, skip_sell
+
+# Point "robin_stocks" to the actual inner folder. Workaround until package update
+vendor_root = Path(__file__).resolve().parent.parent / "vendors" / "robin_stocks" / "robin_stocks"
+spec = importlib.util.spec_from_file_location("robin_stocks", vendor_root / "__init__.py")
+if spec is not None and "robin_stocks" not in sys.modules:
+    robin_stocks = importlib.util.module_from_spec(spec)
+    sys.modules["robin_stocks"] = robin_stocks
+    if spec.loader is not None:
+        spec.loader.exec_module(robin_stocks)
+
+from src.vendors.robin_stocks.robin_stocks import robinhood as rh  # noqa: E402
+
+INSTRUMENT_CACHE_FILE = Path("./creds/robinhood_instruments.jsonl")
+INSTRUMENT_CACHE_TTL = 7 * 24 * 60 * 60  # Seconds before checking an instrument's symbol again, in case the ticker changed
+INSTRUMENT_CACHE_COMPACT = 0.5  # Rewrite the file on load once more than this fraction of its lines are expired or replaced
+
+
+class InstrumentCache:
+    """Robinhood instrument URL to symbol lookups, kept on disk between runs.
+
+    The file is read on first use and each new lookup is appended to it as a JSON line,
+    so a warm run resolves holdings without asking Robinhood. Later lines win. Expired
+    entries are dropped on load, and the file is rewritten with only the live ones once
+    they make up less than INSTRUMENT_CACHE_COMPACT of it.
+    """
+
+    def __init__(self, path: Path = INSTRUMENT_CACHE_FILE, ttl: float = INSTRUMENT_CACHE_TTL, compact: float = INSTRUMENT_CACHE_COMPACT) -> None:
+        """Initialize the cache. Nothing is read until the first lookup."""
+        self.__path = path
+        self.__ttl = ttl
+        self.__compact = compact
+        self.__symbols: dict[str, tuple[str, float]] | None = None  # URL -> (symbol, time checked)
+        self.__lock = Lock()
+        self.__cut_off = False  # Whether the file ends partway through a line
+
+    def _load(self) -> dict[str, tuple[str, float]]:
+        if self.__symbols is None:
+            self.__symbols = {}
+            lines = 0
+            with contextlib.suppress(OSError), self.__path.open(encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    self.__cut_off = not line.endswith("\n")
+                    # Skip anything cut off by a crash mid-write
+                    with contextlib.suppress(ValueError, KeyError, TypeError):
+                        entry = json.loads(line)
+                        self.__symbols[entry["url"]] = (str(entry["symbol"]), float(entry["checked"]))
+            now = time()
+            self.__symbols = {url: cached for url, cached in self.__symbols.items() if now - cached[1] < self.__ttl}
+            if lines and (lines - len(self.__symbols)) / lines > self.__compact:
+                self._rewrite()
+        return self.__symbols
+
+    def _rewrite(self) -> None:
+        """Replace the file with just the entries still in memory."""
+        temp_path = self.__path.with_suffix(".tmp")
+        try:
+            with temp_path.open("w", encoding="utf-8") as f:
+                f.writelines(json.dumps({"url": url, "symbol": symbol, "checked": checked}) + "\n" for url, (symbol, checked) in (self.__symbols or {}).items())
+            temp_path.replace(self.__path)
+            self.__cut_off = False
+        except OSError as e:
+            print(f"Error compacting Robinhood instrument cache: {e}")
+
+    def symbol(self, url: str) -> str:
+        """Get the symbol for an instrument URL, asking Robinhood only if it isn't cached."""
+        with self.__lock:
+            cached = self._load().get(url)
+        if cached is not None and time() - cached[1] < self.__ttl:
+            return cached[0]
+        symbol = cast("str | None", rh.get_symbol_by_url(url))
+        if not symbol:
+            msg = f"No symbol found for {url}"
+            raise ValueError(msg)
+        checked = time()
+        with self.__lock:
+            self._load()[url] = (symbol, checked)
+            try:
+                self.__path.parent.mkdir(exist_ok=True)
+                with self.__path.open("a", encoding="utf-8") as f:
+                    f.write(("\n" if self.__cut_off else "") + json.dumps({"url": url, "symbol": symbol, "checked": checked}) + "\n")
+                self.__cut_off = False
+            except OSError as e:
+                print(f"Error saving Robinhood instrument cache: {e}")
+        return symbol
+
+
+instrument_cache = InstrumentCache()
 
 
 def login_with_cache(pickle_path: str, pickle_name: str) -> None:
@@ -77,9 +170,32 @@ def robinhood_init(loop: AbstractEventLoop | None = None) -> Brokerage | None:
     return rh_obj
 
 
+def robinhood_alive(rho: Brokerage) -> bool:
+    """Check that every Robinhood login still has a valid session."""
+    for key in rho.get_account_numbers():
+        login_with_cache(pickle_path="./creds/", pickle_name=key)
+        if not rh.account.load_account_profile(dataType="results"):
+            return False
+    return True
+
+
+def _refresh_totals(rho: Brokerage, key: str) -> None:
+    """Update a login's account totals, which a reused session would otherwise keep from when it logged in."""
+    login_with_cache(pickle_path="./creds/", pickle_name=key)
+    accounts = rho.get_account_numbers(key)
+    for a in cast("list[dict[str, Any]]", rh.account.load_account_profile(dataType="results")):
+        if a["account_number"] in accounts:
+            rho.set_account_totals(key, a["account_number"], a["portfolio_cash"])
+
+
 def robinhood_holdings(rho: Brokerage, loop: AbstractEventLoop | None = None) -> None:
     """Retrieve and display all Robinhood account holdings."""
     for key in rho.get_account_numbers():
+        try:
+            _refresh_totals(rho, key)
+        except Exception as e:
+            print_and_discord(f"{key}: Error getting account totals: {e}", loop)
+            print(traceback.format_exc())
         for account in rho.get_account_numbers(key):
             login_with_cache(pickle_path="./creds/", pickle_name=key)
             try:
@@ -88,12 +204,13 @@ def robinhood_holdings(rho: Brokerage, loop: AbstractEventLoop | None = None) ->
                 if positions:
                     for item in positions:
                         # Get symbol, quantity, price, and total value
-                        sym = item["symbol"] = cast("str", rh.get_symbol_by_url(item["instrument"]))
+                        sym = item["symbol"] = instrument_cache.symbol(item["instrument"])
                         qty = float(item["quantity"])
                         current_price: float | str = "N/A"
                         with contextlib.suppress(Exception):
-                            current_price = round(float(rh.stocks.get_latest_price(sym)[0]), 2)
+                            current_price = round(float(quote_cache.get("robinhood", sym, lambda symbol: rh.stocks.get_latest_price(symbol)[0])), 2)
                         rho.set_holdings(key, account, sym, qty, current_price)
+                rho.set_holdings_loaded(key, account)
             except Exception as e:
                 print_and_discord(f"{key}: Error getting account holdings: {e}", loop)
                 print(traceback.format_exc())
@@ -101,91 +218,95 @@ def robinhood_holdings(rho: Brokerage, loop: AbstractEventLoop | None = None) ->
     print_all_holdings(rho, loop)
 
 
-def robinhood_transaction(rho: Brokerage, order_obj: StockOrder, loop: AbstractEventLoop | None = None) -> None:  # noqa: C901, PLR0912
+def _robinhood_order(rho: Brokerage, order_obj: StockOrder, job: OrderJob) -> OrderResult:  # noqa: PLR0911
+    """Place a single Robinhood order for one account."""
+    key, account, s = job.login, job.account, job.ticker
+    login_with_cache(pickle_path="./creds/", pickle_name=key)
+    print_account = mask_string(account)
+    started = perf_counter()
+    if skip_sell(rho, order_obj, key, account, s):
+        return order_result(rho, order_obj, key, account, s, started, skipped=True)
+    if order_obj.get_dry():
+        print(
+            f"{key} {print_account} Running in DRY mode. Transaction would've been: {order_obj.get_action()} {order_obj.get_amount()} of {s}",
+        )
+        return order_result(rho, order_obj, key, account, s, started)
+    try:
+        # Market order
+        market_order = rh.order(
+            symbol=s,
+            quantity=order_obj.get_amount(),
+            side=order_obj.get_action(),
+            account_number=account,
+            timeInForce="gfd",
+        )
+        if market_order is not None:
+            message = "Success"
+            market_order = cast("dict[str, str]", market_order)
+            if market_order.get("non_field_errors") is not None:
+                message = market_order["non_field_errors"]
+            print(
+                f"{key}: {order_obj.get_action()} {order_obj.get_amount()} of {s} in {print_account}: {message}",
+            )
+            return order_result(rho, order_obj, key, account, s, started, error=None if message == "Success" else message)
+        # Limit order fallback
+        print(
+            f"{key}: Error {order_obj.get_action()}ing {order_obj.get_amount()} of {s} in {print_account}, trying Limit Order",
+        )
+        ask = quote_cache.get("robinhood ask", s, lambda symbol: rh.get_latest_price(symbol, priceType="ask_price")[0])
+        bid = quote_cache.get("robinhood bid", s, lambda symbol: rh.get_latest_price(symbol, priceType="bid_price")[0])
+        if ask is None or bid is None:
+            print(
+                f"{key}: Error getting price for {s}",
+            )
+            return order_result(rho, order_obj, key, account, s, started, error="Error getting price")
+        print(f"Ask: {ask}, Bid: {bid}")
+        # Add or subtract 1 cent to ask or bid
+        if order_obj.get_action() == "buy":
+            price = max(float(bid), float(ask))
+            price = round(price + 0.01, 2)
+        else:
+            price = min(float(bid), float(ask))
+            price = round(price - 0.01, 2)
+        limit_order = rh.order(
+            symbol=s,
+            quantity=order_obj.get_amount(),
+            side=order_obj.get_action(),
+            limitPrice=price,
+            account_number=account,
+            timeInForce="gfd",
+        )
+        if limit_order is None:
+            print(
+                f"{key}: Error {order_obj.get_action()}ing {order_obj.get_amount()} of {s} in {print_account}",
+            )
+            return order_result(rho, order_obj, key, account, s, started, error="Market and limit orders failed")
+        message = "Success"
+        limit_order = cast("dict[str, str]", limit_order)
+        if limit_order.get("non_field_errors") is not None:
+            message = limit_order["non_field_errors"]
+        print(
+            f"{key}: {order_obj.get_action()} {order_obj.get_amount()} of {s} in {print_account} @ {price}: {message}",
+        )
+        return order_result(rho, order_obj, key, account, s, started, error=None if message == "Success" else message)
+    except Exception as e:
+        print(f"{key} Error submitting order: {e}")
+        print(traceback.format_exc())
+        return order_result(rho, order_obj, key, account, s, started, error=e)
+
+
+def robinhood_transaction(rho: Brokerage, order_obj: StockOrder, loop: AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: ARG001
     """Handle Robinhood API transactions."""
     print()
     print("==============================")
     print("Robinhood")
     print("==============================")
     print()
+    results: list[OrderResult] = []
     for s in order_obj.get_stocks():
         for key in rho.get_account_numbers():
-            print_and_discord(
+            print(
                 f"{key}: {order_obj.get_action()}ing {order_obj.get_amount()} of {s}",
-                loop,
             )
-            for account in rho.get_account_numbers(key):
-                login_with_cache(pickle_path="./creds/", pickle_name=key)
-                print_account = mask_string(account)
-                if not order_obj.get_dry():
-                    try:
-                        # Market order
-                        market_order = rh.order(
-                            symbol=s,
-                            quantity=order_obj.get_amount(),
-                            side=order_obj.get_action(),
-                            account_number=account,
-                            timeInForce="gfd",
-                        )
-                        # Limit order fallback
-                        if market_order is None:
-                            print_and_discord(
-                                f"{key}: Error {order_obj.get_action()}ing {order_obj.get_amount()} of {s} in {print_account}, trying Limit Order",
-                                loop,
-                            )
-                            ask = rh.get_latest_price(s, priceType="ask_price")[0]
-                            bid = rh.get_latest_price(s, priceType="bid_price")[0]
-                            if ask is not None and bid is not None:
-                                print(f"Ask: {ask}, Bid: {bid}")
-                                # Add or subtract 1 cent to ask or bid
-                                if order_obj.get_action() == "buy":
-                                    price = max(float(bid), float(ask))
-                                    price = round(price + 0.01, 2)
-                                else:
-                                    price = min(float(bid), float(ask))
-                                    price = round(price - 0.01, 2)
-                            else:
-                                print_and_discord(
-                                    f"{key}: Error getting price for {s}",
-                                    loop,
-                                )
-                                continue
-                            limit_order = rh.order(
-                                symbol=s,
-                                quantity=order_obj.get_amount(),
-                                side=order_obj.get_action(),
-                                limitPrice=price,
-                                account_number=account,
-                                timeInForce="gfd",
-                            )
-                            if limit_order is None:
-                                print_and_discord(
-                                    f"{key}: Error {order_obj.get_action()}ing {order_obj.get_amount()} of {s} in {print_account}",
-                                    loop,
-                                )
-                                continue
-                            message = "Success"
-                            limit_order = cast("dict[str, str]", limit_order)
-                            if limit_order.get("non_field_errors") is not None:
-                                message = limit_order["non_field_errors"]
-                            print_and_discord(
-                                f"{key}: {order_obj.get_action()} {order_obj.get_amount()} of {s} in {print_account} @ {price}: {message}",
-                                loop,
-                            )
-                        else:
-                            message = "Success"
-                            market_order = cast("dict[str, str]", market_order)
-                            if market_order.get("non_field_errors") is not None:
-                                message = market_order["non_field_errors"]
-                            print_and_discord(
-                                f"{key}: {order_obj.get_action()} {order_obj.get_amount()} of {s} in {print_account}: {message}",
-                                loop,
-                            )
-                    except Exception as e:
-                        print_and_discord(f"{key} Error submitting order: {e}", loop)
-                        print(traceback.format_exc())
-                else:
-                    print_and_discord(
-                        f"{key} {print_account} Running in DRY mode. Transaction would've been: {order_obj.get_action()} {order_obj.get_amount()} of {s}",
-                        loop,
-                    )
+            results.extend(_robinhood_order(rho, order_obj, OrderJob(s, key, account)) for account in rho.get_account_numbers(key))
+    return results
@@ -4,13 +4,13 @@
 import os
 import traceback
 from asyncio import AbstractEventLoop
-from time import sleep
+from time import perf_counter, sleep
 from typing import cast
 
 from dotenv import load_dotenv
 from schwab_api.schwab import Schwab
 
-from src.helper_api import Brokerage, StockOrder, mask_string, print_all_holdings, print_and_discord
+from src.helper_api import Brokerage, OrderResult, StockOrder, mask_string, order_result, print_all_holdings, print_and_discord, skip_sell
 
 # Define known transaction errors
 TRANSACTION_ERRORS = {
@@ -73,6 +73,7 @@ def schwab_init() -> Brokerage | None:
                     qty = float(item["quantity"])
                     current_price = 0 if qty == 0 else round(mv / qty, 2)
                     schwab_obj.set_holdings(name, acc_id, sym, qty, current_price)
+                schwab_obj.set_holdings_loaded(name, acc_id)
 
         except Exception as e:
             print(f"Error logging in to Schwab: {e}")
@@ -86,7 +87,7 @@ def schwab_holdings(schwab_o: Brokerage, loop: AbstractEventLoop | None = None)
     print_all_holdings(schwab_o, loop)
 
 
-def schwab_transaction(schwab_o: Brokerage, order_obj: StockOrder, loop: AbstractEventLoop | None = None) -> None:  # noqa: C901
+def schwab_transaction(schwab_o: Brokerage, order_obj: StockOrder, loop: AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: ARG001, C901
     """Handle Schwab API transactions."""
     print()
     print("==============================")
@@ -95,21 +96,26 @@ def schwab_transaction(schwab_o: Brokerage, order_obj: StockOrder, loop: Abstrac
     print()
     # Use each account (unless specified in .env)
     purchase_accounts = os.getenv("SCHWAB_ACCOUNT_NUMBERS", "").strip().split(":")
+    results: list[OrderResult] = []
     for s in order_obj.get_stocks():
         for key in schwab_o.get_account_numbers():
-            print_and_discord(
+            print(
                 f"{key} {order_obj.get_action()}ing {order_obj.get_amount()} {s} @ {order_obj.get_price()}",
-                loop,
             )
             obj = cast("Schwab", schwab_o.get_logged_in_objects(key))
             for account in schwab_o.get_account_numbers(key):
                 print_account = mask_string(account)
+                started = perf_counter()
                 if purchase_accounts != [""] and order_obj.get_action().lower() != "sell" and str(account) not in purchase_accounts:
                     print(f"Skipping account {print_account}, not in SCHWAB_ACCOUNT_NUMBERS")
+                    results.append(order_result(schwab_o, order_obj, key, account, s, started, skipped=True))
+                    continue
+                if skip_sell(schwab_o, order_obj, key, account, s):
+                    results.append(order_result(schwab_o, order_obj, key, account, s, started, skipped=True))
                     continue
                 # If DRY is True, don't actually make the transaction
                 if order_obj.get_dry():
-                    print_and_discord("Running in DRY mode. No transactions will be made.", loop)
+                    print("Running in DRY mode. No transactions will be made.")
                 try:
                     messages, success = obj.trade_v2(
                         ticker=s,
@@ -119,23 +125,17 @@ def schwab_transaction(schwab_o: Brokerage, order_obj: StockOrder, loop: Abstrac
                         dry_run=order_obj.get_dry(),
                     )
 
-                    handled = False
-                    if not success:
-                        for error, friendly_message in TRANSACTION_ERRORS.items():
-                            if any(error in str(msg) for msg in messages):
-                                print_and_discord(
-                                    f"{key} account {print_account}: {friendly_message}",
-                                    loop,
-                                )
-                                handled = True
-                                break  # Exit the inner loop once an error is handled
-
-                    if handled:
+                    # Known errors get a friendly message and aren't retried
+                    friendly_message = None if success else next((friendly for error, friendly in TRANSACTION_ERRORS.items() if any(error in str(msg) for msg in messages)), None)
+                    if friendly_message is not None:
+                        print(
+                            f"{key} account {print_account}: {friendly_message}",
+                        )
+                        results.append(order_result(schwab_o, order_obj, key, account, s, started, error=friendly_message))
                         continue  # Skip to the next account or stock
 
-                    print_and_discord(
+                    print(
                         (f"{key} account {print_account}: The order verification was successful" if success else "unsuccessful, retrying with legacy API..."),
-                        loop,
                     )
 
                     if not success:
@@ -146,19 +146,19 @@ def schwab_transaction(schwab_o: Brokerage, order_obj: StockOrder, loop: Abstrac
                             account_id=account,
                             dry_run=order_obj.get_dry(),
                         )
-                        print_and_discord(
+                        print(
                             (f"{key} account {print_account}: The order verification was retry successful" if success else "retry unsuccessful"),
-                            loop,
                         )
                         if not success:
-                            print_and_discord(
+                            print(
                                 f"{key} account {print_account}: The order verification produced the following messages: {messages}",
-                                loop,
                             )
+                    results.append(order_result(schwab_o, order_obj, key, account, s, started, error=None if success else f"Order verification failed: {messages}"))
                 except Exception as e:
-                    print_and_discord(
+                    print(
                         f"{key} {print_account}: Error submitting order: {e}",
-                        loop,
                     )
                     print(traceback.format_exc())
+                    results.append(order_result(schwab_o, order_obj, key, account, s, started, error=e))
                 sleep(1)
+    return results
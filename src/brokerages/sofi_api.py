@@ -3,7 +3,7 @@ import datetime
 import os
 import pathlib
 import traceback
-from time import sleep
+from time import perf_counter, sleep
 
 import nodriver as uc
 import pyotp
@@ -12,7 +12,7 @@ from discord.ext.commands import Bot
 from dotenv import load_dotenv
 from nodriver.core.browser import Browser, tab
 
-from src.helper_api import Brokerage, StockOrder, get_local_timezone, get_otp_from_discord, mask_string, print_all_holdings, print_and_discord
+from src.helper_api import Brokerage, OrderResult, StockOrder, check_cancelled, get_local_timezone, get_otp_from_discord, mask_string, order_result, print_all_holdings, print_and_discord, quote_cache, wait_for_discord
 
 load_dotenv()
 
@@ -98,28 +98,28 @@ async def get_current_url(page: tab.Tab, discord_loop: asyncio.AbstractEventLoop
         return str(current_url)
 
 
-def sofi_run(order_obj: StockOrder, command: tuple[str, str], bot_obj: Bot | None = None, loop: asyncio.AbstractEventLoop | None = None) -> None:
-    """Run the SoFi process."""
+def sofi_run(order_obj: StockOrder, bot_obj: Bot | None = None, loop: asyncio.AbstractEventLoop | None = None) -> list[OrderResult]:
+    """Run the SoFi process, returning the outcome of any orders."""
     print("Initializing SoFi process...")
     load_dotenv()
     _create_creds_folder()
     browser = None
+    results: list[OrderResult] = []
 
     if not os.getenv("SOFI"):
-        return
+        return results
 
     accounts = os.environ["SOFI"].strip().split(",")
     sofi_obj = Brokerage("SoFi")
+    order_obj.set_logged_in(sofi_obj, "sofi")
 
     # Get headless flag
     headless = os.getenv("HEADLESS", "true").lower() == "true"
 
-    # Set the functions to be run
-    _, second_command = command
-
     cookie_filename = None
     try:
         for account in accounts:
+            check_cancelled()
             index = accounts.index(account) + 1
             name = f"SoFi {index}"
             cookie_filename = f"{COOKIES_PATH}/{name}.pkl"
@@ -133,13 +133,13 @@ def sofi_run(order_obj: StockOrder, command: tuple[str, str], bot_obj: Bot | Non
             sofi_init(account, name, cookie_filename, bot_obj, browser, loop, sofi_obj)
             sofi_loop.run_until_complete(browser.sleep(5))
             print(f"Logged in to {name}!")
-            if second_command == "_holdings":
+            if order_obj.get_holdings():
                 sofi_holdings(browser, name, sofi_obj, loop)
             else:
-                sofi_transaction(browser, order_obj, loop)
+                results.extend(sofi_transaction(browser, name, sofi_obj, order_obj, loop))
     except Exception as e:
         sofi_loop.run_until_complete(_sofi_error(f"Error during SoFi init process: {e}", discord_loop=loop))
-        return
+        return results
     finally:
         if browser and cookie_filename:
             try:
@@ -149,7 +149,7 @@ def sofi_run(order_obj: StockOrder, command: tuple[str, str], bot_obj: Bot | Non
                 browser.stop()
             except Exception as e:
                 sofi_loop.run_until_complete(_sofi_error(f"Error closing the browser: {e}", discord_loop=loop))
-    return
+    return results
 
 
 def sofi_init(  # noqa: PLR0917
@@ -311,6 +311,7 @@ def sofi_holdings(browser: Browser, name: str, sofi_obj: Brokerage, discord_loop
         raise Exception(msg)
 
     for acct, account_info in account_dict.items():
+        check_cancelled()
         real_account_number = acct
         sofi_obj.set_account_number(name, real_account_number)
         sofi_obj.set_account_totals(name, real_account_number, account_info["balance"])
@@ -329,6 +330,7 @@ def sofi_holdings(browser: Browser, name: str, sofi_obj: Brokerage, discord_loop
             )
             continue
 
+        sofi_obj.set_holdings_loaded(name, real_account_number)
         for holding in holdings:
             company_name = str(holding.get("company_name", "N/A"))
             if company_name == "|CASH|":
@@ -452,10 +454,10 @@ async def _handle_2fa(page: tab.Tab, account: list[str], name: str, bot_obj: Bot
                     raise Exception(msg)
 
                 if bot_obj is not None and discord_loop is not None:
-                    sms_code = asyncio.run_coroutine_threadsafe(
+                    sms_code = wait_for_discord(
                         get_otp_from_discord(bot_obj, name, timeout=300, loop=discord_loop),
                         discord_loop,
-                    ).result()
+                    )
                     if sms_code is None:
                         msg = f"Sofi {name} SMS code not received in time..."
                         raise Exception(msg)
@@ -478,24 +480,28 @@ async def _handle_2fa(page: tab.Tab, account: list[str], name: str, bot_obj: Bot
         )
 
 
-def sofi_transaction(browser: Browser, order_boj: StockOrder, discord_loop: asyncio.AbstractEventLoop | None = None) -> None:
+def sofi_transaction(browser: Browser, name: str, sofi_obj: Brokerage, order_boj: StockOrder, discord_loop: asyncio.AbstractEventLoop | None = None) -> list[OrderResult]:
     """Handle SoFi API transactions."""
-    dry_mode = order_boj.get_dry()
+    results: list[OrderResult] = []
     for stock in order_boj.get_stocks():
         if order_boj.get_action() == "buy":
-            sofi_loop.run_until_complete(_sofi_buy(browser, stock, order_boj.get_amount(), discord_loop, dry_mode=dry_mode))
+            results.extend(sofi_loop.run_until_complete(_sofi_buy(browser, name, sofi_obj, order_boj, stock, discord_loop)))
         elif order_boj.get_action() == "sell":
-            sofi_loop.run_until_complete(_sofi_sell(browser, stock, order_boj.get_amount(), discord_loop, dry_mode=dry_mode))
+            results.extend(sofi_loop.run_until_complete(_sofi_sell(browser, name, sofi_obj, order_boj, stock, discord_loop)))
         else:
             print(f"Unknown action: {order_boj.get_action()}")
+    return results
 
 
-async def _sofi_buy(browser: Browser, symbol: str, quantity: float, discord_loop: asyncio.AbstractEventLoop | None = None, *, dry_mode: bool = False) -> None:  # noqa: C901
+async def _sofi_buy(browser: Browser, name: str, sofi_obj: Brokerage, order_obj: StockOrder, symbol: str, discord_loop: asyncio.AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: PLR0917
+    quantity = order_obj.get_amount()
+    dry_mode = order_obj.get_dry()
+    results: list[OrderResult] = []
+    started = perf_counter()
     page = None
     try:
         # Step 1: Navigate to stock page and get valid cookies
-        stock_url = f"https://www.sofi.com/wealth/app/stock/{symbol}"
-        page = await browser.get(stock_url)
+        page = await browser.get(f"https://www.sofi.com/wealth/app/stock/{symbol}")
         await page.select("body")
 
         cookies = {cookie.name: cookie.value for cookie in await browser.cookies.get_all()}
@@ -524,6 +530,8 @@ async def _sofi_buy(browser: Browser, symbol: str, quantity: float, discord_loop
 
         # Step 4: Loop through all accounts to check buying power and place the limit order
         for account in accounts:
+            check_cancelled()
+            started = perf_counter()
             account_id = account["accountId"]
             buying_power = account["accountBuyingPower"]
             account_name = account.get("accountType")
@@ -532,52 +540,33 @@ async def _sofi_buy(browser: Browser, symbol: str, quantity: float, discord_loop
             if total_price <= buying_power:
                 if dry_mode:
                     # Dry mode: Log what would have been done
-                    print_and_discord(
+                    print(
                         f"[DRY MODE] Would place limit order for {symbol} in account {account_name} with limit price: {limit_price}",
-                        discord_loop,
                     )
+                    results.append(order_result(sofi_obj, order_obj, name, account_id, symbol, started))
                     continue
 
-                if quantity < 1:
-                    result = await _place_fractional_order(
-                        symbol,
-                        quantity,
-                        account_id,
-                        order_type="BUY",
-                        cookies=cookies,
-                        csrf_token=csrf_token,
-                        discord_loop=discord_loop,
-                    )
-                else:
-                    result = await _place_order(
-                        symbol,
-                        quantity,
-                        limit_price,
-                        account_id,
-                        order_type="BUY",
-                        cookies=cookies,
-                        csrf_token=csrf_token,
-                        discord_loop=discord_loop,
-                    )
-                if result and result["header"] == "Your order is placed.":  # Success
-                    print_and_discord(
-                        f"Successfully bought {quantity} of {symbol} in account {mask_string(account_id)}",
-                        discord_loop,
-                    )
+                results.append(order_result(sofi_obj, order_obj, name, account_id, symbol, started, error=await _sofi_order(symbol, quantity, limit_price, account_id, order_type="BUY", cookies=cookies, csrf_token=csrf_token, discord_loop=discord_loop)))
             else:
-                print_and_discord(
+                print(
                     f"Insufficient buying power in {account_name}. Needed: {total_price}, Available: {buying_power}",
-                    discord_loop,
                 )
+                results.append(order_result(sofi_obj, order_obj, name, account_id, symbol, started, error=f"Insufficient buying power. Needed: {total_price}, Available: {buying_power}"))
     except Exception as e:
         await _sofi_error(
             f"Error during buy transaction for {symbol}: {e}",
             page=page,
             discord_loop=discord_loop,
         )
+        results.append(order_result(sofi_obj, order_obj, name, "all", symbol, started, error=e))
+    return results
 
 
-async def _sofi_sell(browser: Browser, symbol: str, quantity: float, discord_loop: asyncio.AbstractEventLoop | None = None, *, dry_mode: bool = False) -> None:  # noqa: C901, PLR0912
+async def _sofi_sell(browser: Browser, name: str, sofi_obj: Brokerage, order_obj: StockOrder, symbol: str, discord_loop: asyncio.AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: C901, PLR0917
+    quantity = order_obj.get_amount()
+    dry_mode = order_obj.get_dry()
+    results: list[OrderResult] = []
+    started = perf_counter()
     try:
         # Step 1: Fetch holdings for the stock symbol
         cookies = {cookie.name: cookie.value for cookie in await browser.cookies.get_all()}
@@ -591,9 +580,8 @@ async def _sofi_sell(browser: Browser, symbol: str, quantity: float, discord_loo
             raise Exception(msg)
 
         # Fetch holdings for the specific symbol
-        holdings_url = f"https://www.sofi.com/wealth/backend/api/v3/customer/holdings/symbol/{symbol}"
         response = requests.get(
-            holdings_url,
+            f"https://www.sofi.com/wealth/backend/api/v3/customer/holdings/symbol/{symbol}",
             impersonate="chrome",
             headers=_build_headers(),
             cookies=cookies,
@@ -625,57 +613,59 @@ async def _sofi_sell(browser: Browser, symbol: str, quantity: float, discord_loo
 
         # Loop through all accounts holding the stock
         for account in account_holding_infos:
+            check_cancelled()
+            started = perf_counter()
             account_id = account["accountId"]
             available_shares = account["salableQuantity"]
 
             # Skip accounts where available shares are less than the quantity to sell
             if available_shares < quantity:
-                print_and_discord(
+                print(
                     f"Not enough shares to sell {quantity} of {symbol} in account {mask_string(account_id)}. Only {available_shares} available.",
-                    discord_loop,
                 )
+                results.append(order_result(sofi_obj, order_obj, name, account_id, symbol, started, skipped=True))
                 continue  # Move to the next account
 
             if dry_mode:
                 # Dry mode: Log what would have been done
-                print_and_discord(
+                print(
                     f"[DRY MODE] Would place sell order for {quantity} shares of {symbol} in account {mask_string(account_id)}",
-                    discord_loop,
                 )
+                results.append(order_result(sofi_obj, order_obj, name, account_id, symbol, started))
                 continue
 
-            if quantity < 1:
-                result = await _place_fractional_order(
-                    symbol,
-                    quantity,
-                    account_id,
-                    order_type="SELL",
-                    cookies=cookies,
-                    csrf_token=csrf_token,
-                    discord_loop=discord_loop,
-                )
-            else:
-                # Place the sell order
-                result = await _place_order(
-                    symbol,
-                    quantity,
-                    limit_price,
-                    account_id,
-                    order_type="SELL",
-                    cookies=cookies,
-                    csrf_token=csrf_token,
-                    discord_loop=discord_loop,
-                )
-            if result and result["header"] == "Your order is placed.":  # Success
-                print_and_discord(
-                    f"Successfully sold {quantity} of {symbol} in account {mask_string(account_id)}",
-                    discord_loop,
-                )
+            # Place the sell order
+            results.append(order_result(sofi_obj, order_obj, name, account_id, symbol, started, error=await _sofi_order(symbol, quantity, limit_price, account_id, order_type="SELL", cookies=cookies, csrf_token=csrf_token, discord_loop=discord_loop)))
     except Exception as e:
         await _sofi_error(
             f"Error during sell transaction for {symbol}: {e}",
             discord_loop=discord_loop,
         )
+        results.append(order_result(sofi_obj, order_obj, name, "all", symbol, started, error=e))
+    return results
+
+
+async def _sofi_order(  # noqa: PLR0917
+    symbol: str,
+    quantity: float,
+    limit_price: float,
+    account_id: str,
+    order_type: str,
+    cookies: dict[str, str],
+    csrf_token: str,
+    discord_loop: asyncio.AbstractEventLoop | None = None,
+) -> str | None:
+    """Place one SoFi order (fractional below one share) and return why it failed, or None if it was placed."""
+    if quantity < 1:
+        result = await _place_fractional_order(symbol, quantity, account_id, order_type=order_type, cookies=cookies, csrf_token=csrf_token, discord_loop=discord_loop)
+    else:
+        result = await _place_order(symbol, quantity, limit_price, account_id, order_type=order_type, cookies=cookies, csrf_token=csrf_token, discord_loop=discord_loop)
+    if not result or result["header"] != "Your order is placed.":
+        return "Order was not placed"
+    print(
+        f"Successfully {'bought' if order_type == 'BUY' else 'sold'} {quantity} of {symbol} in account {mask_string(account_id)}",
+    )
+    return None
 
 
 async def _fetch_funded_accounts(cookies: dict[str, str]) -> dict | None:
@@ -695,19 +685,24 @@ async def _fetch_funded_accounts(cookies: dict[str, str]) -> dict | None:
     return None
 
 
+def _request_stock_price(symbol: str) -> float | None:
+    url = f"https://www.sofi.com/wealth/backend/api/v1/tearsheet/quote?symbol={symbol}&productSubtype=BROKERAGE"
+    response = requests.get(url, impersonate="chrome", headers=_build_headers())
+    if response.ok:
+        data = response.json()
+        price = data.get("price")
+        if price:
+            # Round the price to the nearest second decimal place
+            return round(float(price), 2)
+    print(
+        f"Failed to fetch stock price for {symbol}. Status code: {response.status_code}",
+    )
+    return None
+
+
 async def _fetch_stock_price(symbol: str) -> float | None:
     try:
-        url = f"https://www.sofi.com/wealth/backend/api/v1/tearsheet/quote?symbol={symbol}&productSubtype=BROKERAGE"
-        response = requests.get(url, impersonate="chrome", headers=_build_headers())
-        if response.ok:
-            data = response.json()
-            price = data.get("price")
-            if price:
-                # Round the price to the nearest second decimal place
-                return round(float(price), 2)
-        print(
-            f"Failed to fetch stock price for {symbol}. Status code: {response.status_code}",
-        )
+        return quote_cache.get("sofi", symbol, _request_stock_price)
     except Exception as e:
         await _sofi_error(f"Error fetching stock price for {symbol}: {e}")
     return None
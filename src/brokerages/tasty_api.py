@@ -6,6 +6,8 @@ import os
 import traceback
 from datetime import datetime
 from decimal import Decimal
+from functools import partial
+from time import perf_counter
 from typing import cast
 
 from dotenv import load_dotenv
@@ -17,7 +19,7 @@ from tastytrade.order import NewOrder, OrderAction, OrderTimeInForce, OrderType
 from tastytrade.streamer import DXLinkStreamer
 from tastytrade.utils import TastytradeError, now_in_new_york
 
-from src.helper_api import Brokerage, StockOrder, mask_string, print_all_holdings, print_and_discord
+from src.helper_api import Brokerage, OrderResult, StockOrder, mask_string, order_result, print_all_holdings, print_and_discord, quote_cache
 
 
 async def _order_setup(tt: Session, order_type: list[str], stock_price: Decimal, stock: str, amount: float) -> NewOrder:
@@ -37,6 +39,14 @@ async def _order_setup(tt: Session, order_type: list[str], stock_price: Decimal,
     )
 
 
+async def _fetch_limits(tt: Session, stock: str) -> tuple[Profile, Quote]:
+    """Get the price limits and latest quote for a stock from the streamer."""
+    async with DXLinkStreamer(tt) as streamer:
+        await streamer.subscribe(Profile, [stock])
+        await streamer.subscribe(Quote, [stock])
+        return await streamer.get_event(Profile), await streamer.get_event(Quote)
+
+
 async def _tastytrade_async_init() -> Brokerage | None:
     """Initialize the Tastytrade API."""
     # Initialize .env file
@@ -90,6 +100,7 @@ async def _tastytrade_async_holdings(tt_o: Brokerage, loop: asyncio.AbstractEven
                         float(pos.quantity),
                         "N/A" if pos.average_daily_market_close_price is None else float(pos.average_daily_market_close_price),
                     )
+                tt_o.set_holdings_loaded(key, an)
             except Exception as e:
                 print_and_discord(f"{key}: Error getting account holdings: {e}", loop)
                 print(traceback.format_exc())
@@ -97,23 +108,24 @@ async def _tastytrade_async_holdings(tt_o: Brokerage, loop: asyncio.AbstractEven
     print_all_holdings(tt_o, loop=loop)
 
 
-async def _tastytrade_async_execute(tt_o: Brokerage, order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None = None) -> None:  # noqa: C901, PLR0912, PLR0915
+async def _tastytrade_async_execute(tt_o: Brokerage, order_obj: StockOrder) -> list[OrderResult]:  # noqa: C901, PLR0912, PLR0915
     print()
     print("==============================")
     print("Tastytrade")
     print("==============================")
     print()
+    results: list[OrderResult] = []
     for s in order_obj.get_stocks():
         for key in tt_o.get_account_numbers():
             obj = cast("Session", tt_o.get_logged_in_objects(key, "session"))
             accounts = cast("list[Account]", tt_o.get_logged_in_objects(key, "accounts"))
-            print_and_discord(
+            print(
                 f"{key}: {order_obj.get_action()}ing {order_obj.get_amount()} of {s}",
-                loop=loop,
             )
             for i in range(len(tt_o.get_account_numbers(key))):
                 acct: Account = accounts[i]
                 print_account = mask_string(acct.account_number)
+                started = perf_counter()
                 try:
                     # Set order type
                     order_type = ["Market", "Debit", "Buy to Open"] if order_obj.get_action() == "buy" else ["Market", "Credit", "Sell to Close"]
@@ -136,27 +148,22 @@ async def _tastytrade_async_execute(tt_o: Brokerage, order_obj: StockOrder, loop
                         )
                         order_status = placed_order.order.status.value
                     except Exception as e:
-                        print_and_discord(
+                        print(
                             f"{key} {print_account}: Error placing order: {e}",
-                            loop=loop,
                         )
+                        results.append(order_result(tt_o, order_obj, key, acct.account_number, s, started, error=e))
                         continue
                     # Check order status
                     if order_status in {"Received", "Routed"}:
                         message = f"{key} {print_account}: {order_obj.get_action()} {order_obj.get_amount()} of {s} Order: {placed_order.order.id} Status: {order_status}"
                         if order_obj.get_dry():
                             message = f"{key} Running in DRY mode. Transaction would've been: {order_obj.get_action()} {order_obj.get_amount()} of {s}"
-                        print_and_discord(message, loop=loop)
+                        print(message)
                     elif order_status == "Rejected":
                         # Retry with limit order
-                        async with DXLinkStreamer(obj) as streamer:
-                            stock_limit = await streamer.subscribe(Profile, [s])
-                            stock_quote = await streamer.subscribe(Quote, [s])
-                            stock_limit = await streamer.get_event(Profile)
-                            stock_quote = await streamer.get_event(Quote)
-                        print_and_discord(
+                        stock_limit, stock_quote = await quote_cache.aget("tastytrade", s, partial(_fetch_limits, obj))
+                        print(
                             f"{key} {print_account} Error: {order_status} Trying Limit order...",
-                            loop=loop,
                         )
                         # Get limit price
                         if order_obj.get_action() == "buy":
@@ -181,21 +188,24 @@ async def _tastytrade_async_execute(tt_o: Brokerage, order_obj: StockOrder, loop
                             new_order,
                             dry_run=order_obj.get_dry(),
                         )
+                        order_status = placed_order.order.status.value
                         # Check order status
                         if order_status in {"Received", "Routed"}:
                             message = f"{key} {print_account}: {order_obj.get_action()} {order_obj.get_amount()} of {s} Order: {placed_order.order.id} Status: {order_status}"
                             if order_obj.get_dry():
                                 message = f"{key} Running in DRY mode. Transaction would've been: {order_obj.get_action()} {order_obj.get_amount()} of {s}"
-                            print_and_discord(message, loop=loop)
+                            print(message)
                         elif order_status == "Rejected":
                             # Only want this message if it fails both orders.
-                            print_and_discord(
+                            print(
                                 f"{key} Error placing order: {placed_order.order.id} on account {print_account}: {order_status}",
-                                loop=loop,
                             )
+                    results.append(order_result(tt_o, order_obj, key, acct.account_number, s, started, error=None if order_status in {"Received", "Routed"} else f"Order {order_status}"))
                 except (TastytradeError, KeyError) as te:
-                    print_and_discord(f"{key} {print_account}: Error: {te}", loop=loop)
+                    print(f"{key} {print_account}: Error: {te}")
+                    results.append(order_result(tt_o, order_obj, key, acct.account_number, s, started, error=te))
                     continue
+    return results
 
 
 _tasty_loop = asyncio.new_event_loop()
@@ -211,6 +221,6 @@ def tastytrade_holdings(tt_o: Brokerage, loop: asyncio.AbstractEventLoop | None
     _tasty_loop.run_until_complete(_tastytrade_async_holdings(tt_o=tt_o, loop=loop))
 
 
-def tastytrade_transaction(tt: Brokerage, order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None = None) -> None:
+def tastytrade_transaction(tt: Brokerage, order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: ARG001
     """Execute a Tastytrade transaction."""
-    _tasty_loop.run_until_complete(_tastytrade_async_execute(tt_o=tt, order_obj=order_obj, loop=loop))
+    return _tasty_loop.run_until_complete(_tastytrade_async_execute(tt_o=tt, order_obj=order_obj))
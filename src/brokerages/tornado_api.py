@@ -2,7 +2,7 @@ import datetime
 import os
 import traceback
 from asyncio import AbstractEventLoop
-from time import sleep
+from time import perf_counter, sleep
 from typing import cast
 
 from dotenv import load_dotenv
@@ -12,7 +12,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as ec
 from selenium.webdriver.support.wait import WebDriverWait
 
-from src.helper_api import Brokerage, StockOrder, check_if_page_loaded, get_local_timezone, get_selenium_driver, kill_all_selenium_drivers, print_all_holdings, print_and_discord
+from src.helper_api import Brokerage, OrderResult, StockOrder, build_order_jobs, check_cancelled, check_if_page_loaded, get_local_timezone, get_selenium_driver, kill_all_selenium_drivers, order_result, print_all_holdings, print_and_discord, wait_timeout
 
 load_dotenv()
 
@@ -23,6 +23,12 @@ def tornado_error(driver: Chrome, loop: AbstractEventLoop | None = None) -> None
     print_and_discord(f"Tornado Error: {traceback.format_exc()}", loop, embed=False)
 
 
+def _order_failed(msg: str) -> str:
+    """Print why a Tornado order failed and return the message for its result."""
+    print(msg)
+    return msg
+
+
 def tornado_init(*, docker_mode: bool = False, loop: AbstractEventLoop | None = None) -> Brokerage | None:
     """Initialize the Tornado API."""
     load_dotenv()
@@ -42,21 +48,21 @@ def tornado_init(*, docker_mode: bool = False, loop: AbstractEventLoop | None =
                 msg = "Driver not found."
                 raise Exception(msg)
             driver.get("https://tornado.com/app/login")
-            WebDriverWait(driver, 30).until(check_if_page_loaded)
+            WebDriverWait(driver, wait_timeout(30)).until(check_if_page_loaded)
 
             # Log in with email and password
             try:
-                email_field = WebDriverWait(driver, 30).until(
+                email_field = WebDriverWait(driver, wait_timeout(30)).until(
                     ec.element_to_be_clickable((By.ID, "email-field")),
                 )
                 email_field.send_keys(account.split(":")[0])
 
-                password_field = WebDriverWait(driver, 30).until(
+                password_field = WebDriverWait(driver, wait_timeout(30)).until(
                     ec.element_to_be_clickable((By.ID, "password-field")),
                 )
                 password_field.send_keys(account.split(":")[1])
 
-                login_button = WebDriverWait(driver, 30).until(
+                login_button = WebDriverWait(driver, wait_timeout(30)).until(
                     ec.element_to_be_clickable(
                         (
                             By.CSS_SELECTOR,
@@ -67,7 +73,7 @@ def tornado_init(*, docker_mode: bool = False, loop: AbstractEventLoop | None =
                 login_button.click()
 
                 # Check for the element after logging in to ensure the page is fully loaded
-                WebDriverWait(driver, 60).until(
+                WebDriverWait(driver, wait_timeout(60)).until(
                     ec.presence_of_element_located(
                         (
                             By.XPATH,
@@ -158,12 +164,13 @@ def tornado_holdings(tornado_obj: Brokerage, loop: AbstractEventLoop | None = No
         # Ensure we are using the correct account name
         account_names = tornado_obj.get_account_numbers()
         for account_name in account_names:
+            check_cancelled()
             driver = cast("Chrome", tornado_obj.get_logged_in_objects(account_name))
 
             print(f"Processing holdings for {account_name}")
 
             # Fetch the total account value
-            account_value_element = WebDriverWait(driver, 60).until(
+            account_value_element = WebDriverWait(driver, wait_timeout(60)).until(
                 ec.presence_of_element_located(
                     (
                         By.XPATH,
@@ -205,133 +212,136 @@ def tornado_holdings(tornado_obj: Brokerage, loop: AbstractEventLoop | None = No
     kill_all_selenium_drivers(tornado_obj)  # Close the browser after processing
 
 
-def tornado_transaction(tornado_obj: Brokerage, order_obj: StockOrder, loop: AbstractEventLoop | None = None) -> None:  # noqa: C901, PLR0912, PLR0915
+def tornado_transaction(tornado_obj: Brokerage, order_obj: StockOrder, loop: AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: C901, PLR0915
     """Handle Tornado API transactions."""
     print("\n==============================")
     print("Tornado")
     print("==============================\n")
-    for s in order_obj.get_stocks():
-        for key in tornado_obj.get_account_numbers():
-            driver = cast("Chrome", tornado_obj.get_logged_in_objects(key))
+    jobs, results = build_order_jobs(tornado_obj, order_obj)
+    for job in jobs:
+        check_cancelled()
+        key, s = job.login, job.ticker
+        started = perf_counter()
+        driver = cast("Chrome", tornado_obj.get_logged_in_objects(key))
+
+        # Ensure we are on the Tornado dashboard or navigate to it
+        try:
+            current_url = driver.current_url
+            if "app" not in current_url:
+                driver.get("https://tornado.com/app/")
+                WebDriverWait(driver, wait_timeout(30)).until(check_if_page_loaded)
+        except Exception as e:
+            tornado_error(driver, loop)
+            print(f"Failed to navigate to dashboard for {key}: {e}")
+            results.append(order_result(tornado_obj, order_obj, job.login, job.account, s, started, error=e))
+            continue
 
-            # Ensure we are on the Tornado dashboard or navigate to it
-            try:
-                current_url = driver.current_url
-                if "app" not in current_url:
-                    driver.get("https://tornado.com/app/")
-                    WebDriverWait(driver, 30).until(check_if_page_loaded)
-            except Exception as e:
-                tornado_error(driver, loop)
-                print_and_discord(f"Failed to navigate to dashboard for {key}: {e}", loop)
-                continue
+        try:
+            # Interact with the search bar
+            search_field = WebDriverWait(driver, wait_timeout(20)).until(
+                ec.element_to_be_clickable(
+                    (By.CSS_SELECTOR, "#nav_securities_search"),
+                ),
+            )
+            search_field.click()
+            sleep(1)
+            search_field.send_keys(s)
+        except TimeoutException:
+            tornado_error(driver, loop)
+            print(f"Tornado search field not found for {s}.")
+            results.append(order_result(tornado_obj, order_obj, job.login, job.account, s, started, error="Search field not found"))
+            continue
 
-            try:
-                # Interact with the search bar
-                search_field = WebDriverWait(driver, 20).until(
-                    ec.element_to_be_clickable(
-                        (By.CSS_SELECTOR, "#nav_securities_search"),
+        try:
+            # Wait for and process search results
+            WebDriverWait(driver, wait_timeout(10)).until(
+                ec.presence_of_all_elements_located(
+                    (
+                        By.XPATH,
+                        '//*[@id="nav_securities_search_container"]/div[2]/ul/li',
                     ),
-                )
-                search_field.click()
-                sleep(1)
-                search_field.send_keys(s)
-            except TimeoutException:
-                tornado_error(driver, loop)
-                print_and_discord(f"Tornado search field not found for {s}.", loop)
+                ),
+            )
+            dropdown_items = driver.find_elements(
+                By.XPATH,
+                '//*[@id="nav_securities_search_container"]/div[2]/ul/li',
+            )
+            total_items = len(dropdown_items)
+            sleep(2)
+
+            if total_items == 0:
+                print(f"Tornado doesn't have {s}.")
+                results.append(order_result(tornado_obj, order_obj, job.login, job.account, s, started, error="Ticker not found"))
                 continue
 
-            try:
-                # Wait for and process search results
-                WebDriverWait(driver, 10).until(
-                    ec.presence_of_all_elements_located(
-                        (
-                            By.XPATH,
-                            '//*[@id="nav_securities_search_container"]/div[2]/ul/li',
-                        ),
-                    ),
-                )
-                dropdown_items = driver.find_elements(
-                    By.XPATH,
-                    '//*[@id="nav_securities_search_container"]/div[2]/ul/li',
-                )
-                total_items = len(dropdown_items)
-                sleep(2)
-
-                if total_items == 0:
-                    print_and_discord(f"Tornado doesn't have {s}.", loop)
-                    continue
-
-                found_stock = False
-                for item in dropdown_items:
-                    ticker_name = item.find_element(By.CLASS_NAME, "bold").text.strip()
-                    if ticker_name == s:
-                        found_stock = True
-                        sleep(1)
-                        item.click()
-                        break
-
-                if not found_stock:
-                    print_and_discord(f"Tornado doesn't have {s}.", loop)
-                    continue
-            except TimeoutException:
-                tornado_error(driver, loop)
-                print_and_discord(f"Tornado search results did not appear for {s}.", loop)
+            found_stock = False
+            for item in dropdown_items:
+                ticker_name = item.find_element(By.CLASS_NAME, "bold").text.strip()
+                if ticker_name == s:
+                    found_stock = True
+                    sleep(1)
+                    item.click()
+                    break
+
+            if not found_stock:
+                print(f"Tornado doesn't have {s}.")
+                results.append(order_result(tornado_obj, order_obj, job.login, job.account, s, started, error="Ticker not found"))
                 continue
+        except TimeoutException:
+            tornado_error(driver, loop)
+            print(f"Tornado search results did not appear for {s}.")
+            results.append(order_result(tornado_obj, order_obj, job.login, job.account, s, started, error="Search results did not appear"))
+            continue
 
-            # Proceed with the transaction based on the action (buy/sell)
-            if order_obj.get_action() == "buy":
-                handle_buy(driver, s, order_obj, loop)
-            elif order_obj.get_action() == "sell":
-                handle_sell(driver, s, order_obj, loop)
+        # Proceed with the transaction based on the action (buy/sell)
+        error = handle_buy(driver, s, order_obj, loop) if order_obj.get_action() == "buy" else handle_sell(driver, s, order_obj, loop)
+        results.append(order_result(tornado_obj, order_obj, job.login, job.account, s, started, error=error))
 
-            # Ensure to return to the dashboard after every transaction
-            try:
-                dashboard_link = WebDriverWait(driver, 30).until(
-                    ec.element_to_be_clickable(
-                        (
-                            By.XPATH,
-                            '//*[@id="root"]/div/div/div[4]/div/div[1]/div/div/div[2]/div[1]/div[2]/span[1]/a/span',
-                        ),
+        # Ensure to return to the dashboard after every transaction
+        try:
+            dashboard_link = WebDriverWait(driver, wait_timeout(30)).until(
+                ec.element_to_be_clickable(
+                    (
+                        By.XPATH,
+                        '//*[@id="root"]/div/div/div[4]/div/div[1]/div/div/div[2]/div[1]/div[2]/span[1]/a/span',
                     ),
-                )
-                dashboard_link.click()
-                WebDriverWait(driver, 60).until(
-                    ec.presence_of_element_located(
-                        (
-                            By.XPATH,
-                            '//*[@id="main-router"]/div/div/div/div[1]/div/div/div/div[1]/div[1]/div/span',
-                        ),
+                ),
+            )
+            dashboard_link.click()
+            WebDriverWait(driver, wait_timeout(60)).until(
+                ec.presence_of_element_located(
+                    (
+                        By.XPATH,
+                        '//*[@id="main-router"]/div/div/div/div[1]/div/div/div/div[1]/div[1]/div/span',
                     ),
-                )
-            except TimeoutException:
-                tornado_error(driver, loop)
-                print_and_discord(
-                    f"Tornado failed to return to dashboard after processing {s}.",
-                    loop,
-                )
+                ),
+            )
+        except TimeoutException:
+            tornado_error(driver, loop)
+            print(f"Tornado failed to return to dashboard after processing {s}.")
 
     print("Completed all transactions, Exiting...")
     kill_all_selenium_drivers(tornado_obj)
+    return results
 
 
-def handle_buy(driver: Chrome, stock: str, order_obj: StockOrder, loop: AbstractEventLoop | None) -> None:  # noqa: C901, PLR0911, PLR0914, PLR0915
-    """Handle the buy action for a stock order."""
+def handle_buy(driver: Chrome, stock: str, order_obj: StockOrder, loop: AbstractEventLoop | None) -> str | None:  # noqa: C901, PLR0911, PLR0914, PLR0915
+    """Handle the buy action for a stock order, returning an error message if it failed."""
     dry_mode = order_obj.get_dry()
     quantity = order_obj.get_amount()
     print("DRY MODE:", dry_mode)
 
     try:
-        buy_button = WebDriverWait(driver, 20).until(
+        buy_button = WebDriverWait(driver, wait_timeout(20)).until(
             ec.element_to_be_clickable((By.XPATH, '//*[@id="buy-button"]')),
         )
         driver.execute_script("arguments[0].click();", buy_button)
     except TimeoutException:
         tornado_error(driver, loop)
-        print_and_discord(f"Tornado buy button not found for {stock}.", loop)
-        return
+        return _order_failed(f"Tornado buy button not found for {stock}.")
 
     try:
-        quant = WebDriverWait(driver, 20).until(
+        quant = WebDriverWait(driver, wait_timeout(20)).until(
             ec.element_to_be_clickable(
                 (By.XPATH, '//*[@id="main-router"]/div[1]/div/div[3]/input'),
             ),
@@ -340,8 +350,7 @@ def handle_buy(driver: Chrome, stock: str, order_obj: StockOrder, loop: Abstract
         quant.send_keys(str(quantity))
     except TimeoutException:
         tornado_error(driver, loop)
-        print_and_discord(f"Tornado failed to enter quantity for {stock}.", loop)
-        return
+        return _order_failed(f"Tornado failed to enter quantity for {stock}.")
 
     try:
         current_shares_element = driver.find_element(
@@ -357,14 +366,13 @@ def handle_buy(driver: Chrome, stock: str, order_obj: StockOrder, loop: Abstract
     buy_power_xpath = '//*[@id="main-router"]/div[1]/div/div[8]/div[contains(text(), "$")]' if has_current_shares else '//*[@id="main-router"]/div[1]/div/div[7]/div[contains(text(), "$")]'
 
     try:
-        market_order_option = WebDriverWait(driver, 20).until(
+        market_order_option = WebDriverWait(driver, wait_timeout(20)).until(
             ec.presence_of_element_located((By.XPATH, market_order_xpath)),
         )
         market_order_option.click()
     except TimeoutException:
         tornado_error(driver, loop)
-        print_and_discord(f"Tornado failed to select market order for {stock}.", loop)
-        return
+        return _order_failed(f"Tornado failed to select market order for {stock}.")
 
     try:
         sleep(3)
@@ -379,38 +387,22 @@ def handle_buy(driver: Chrome, stock: str, order_obj: StockOrder, loop: Abstract
             try:
                 cost_float = float(cost.replace("$", "").replace(",", ""))
             except ValueError:
-                print_and_discord(
-                    f"Tornado: Invalid price format for {stock}: {cost}",
-                    loop,
-                )
-                return
+                return _order_failed(f"Tornado: Invalid price format for {stock}: {cost}")
         else:
-            print_and_discord(
-                f"Tornado: Price not available or in an unexpected format for {stock}: {cost}",
-                loop,
-            )
-            return
+            return _order_failed(f"Tornado: Price not available or in an unexpected format for {stock}: {cost}")
 
         # Check if the available buying power is enough
         if buy_power_float < cost_float:
             tornado_error(driver, loop)
-            print_and_discord(
-                f"Tornado insufficient funds to buy {stock}. Required: ${cost_float}, Available: ${buy_power_float}",
-                loop,
-            )
-            return
+            return _order_failed(f"Tornado insufficient funds to buy {stock}. Required: ${cost_float}, Available: ${buy_power_float}")
 
     except TimeoutException:
         tornado_error(driver, loop)
-        print_and_discord(
-            f"Tornado failed to fetch buying power or cost for {stock}.",
-            loop,
-        )
-        return
+        return _order_failed(f"Tornado failed to fetch buying power or cost for {stock}.")
 
     if not dry_mode:
         try:
-            submit_button = WebDriverWait(driver, 20).until(
+            submit_button = WebDriverWait(driver, wait_timeout(20)).until(
                 ec.element_to_be_clickable(
                     (
                         By.XPATH,
@@ -419,13 +411,12 @@ def handle_buy(driver: Chrome, stock: str, order_obj: StockOrder, loop: Abstract
                 ),
             )
             submit_button.click()
-            print_and_discord(
+            print(
                 f"Tornado account: buy {quantity} shares of {stock} at {cost}",
-                loop,
             )
 
             # Click the "Continue" button after placing the order
-            continue_button = WebDriverWait(driver, 20).until(
+            continue_button = WebDriverWait(driver, wait_timeout(20)).until(
                 ec.element_to_be_clickable(
                     (By.XPATH, '//*[@id="main-router"]/div[1]/div/div[2]/div/button'),
                 ),
@@ -433,32 +424,28 @@ def handle_buy(driver: Chrome, stock: str, order_obj: StockOrder, loop: Abstract
             continue_button.click()
         except TimeoutException:
             tornado_error(driver, loop)
-            print_and_discord(
-                f"Tornado failed to submit buy order for {stock} or click Continue.",
-                loop,
-            )
+            return _order_failed(f"Tornado failed to submit buy order for {stock} or click Continue.")
     else:
         sleep(5)
-        print_and_discord(
+        print(
             f"DRY MODE: Simulated order BUY for {quantity} shares of {stock} at {cost}",
-            loop,
         )
+    return None
 
 
-def handle_sell(driver: Chrome, stock: str, order_obj: StockOrder, loop: AbstractEventLoop | None) -> None:
-    """Handle the sell action for a stock order."""
+def handle_sell(driver: Chrome, stock: str, order_obj: StockOrder, loop: AbstractEventLoop | None) -> str | None:  # noqa: PLR0911
+    """Handle the sell action for a stock order, returning an error message if it failed."""
     dry_mode = order_obj.get_dry()
     quantity = order_obj.get_amount()
 
     try:
-        sell_button = WebDriverWait(driver, 20).until(
+        sell_button = WebDriverWait(driver, wait_timeout(20)).until(
             ec.element_to_be_clickable((By.XPATH, '//*[@id="sell-button"]')),
         )
         driver.execute_script("arguments[0].click();", sell_button)
     except TimeoutException:
         tornado_error(driver, loop)
-        print_and_discord(f"Tornado sell button not found for {stock}.", loop)
-        return
+        return _order_failed(f"Tornado sell button not found for {stock}.")
 
     try:
         current_shares_element = driver.find_element(
@@ -467,18 +454,13 @@ def handle_sell(driver: Chrome, stock: str, order_obj: StockOrder, loop: Abstrac
         )
         current_shares = float(current_shares_element.text.strip().replace(" sh", ""))
     except NoSuchElementException:
-        print_and_discord(f"Tornado no current shares to sell for {stock}.", loop)
-        return
+        return _order_failed(f"Tornado no current shares to sell for {stock}.")
 
     if current_shares < quantity:
-        print_and_discord(
-            f"Tornado not enough shares to sell {stock}. Available: {current_shares}",
-            loop,
-        )
-        return
+        return _order_failed(f"Tornado not enough shares to sell {stock}. Available: {current_shares}")
 
     try:
-        quant = WebDriverWait(driver, 20).until(
+        quant = WebDriverWait(driver, wait_timeout(20)).until(
             ec.element_to_be_clickable(
                 (By.XPATH, '//*[@id="main-router"]/div[1]/div/div[3]/input'),
             ),
@@ -487,11 +469,10 @@ def handle_sell(driver: Chrome, stock: str, order_obj: StockOrder, loop: Abstrac
         quant.send_keys(str(quantity))
     except TimeoutException:
         tornado_error(driver, loop)
-        print_and_discord(f"Tornado failed to enter quantity for {stock}.", loop)
-        return
+        return _order_failed(f"Tornado failed to enter quantity for {stock}.")
 
     try:
-        market_order_option = WebDriverWait(driver, 20).until(
+        market_order_option = WebDriverWait(driver, wait_timeout(20)).until(
             ec.presence_of_element_located(
                 (By.XPATH, '//*[@id="main-router"]/div[1]/div/div[6]/select/option[1]'),
             ),
@@ -499,8 +480,7 @@ def handle_sell(driver: Chrome, stock: str, order_obj: StockOrder, loop: Abstrac
         market_order_option.click()
     except TimeoutException:
         tornado_error(driver, loop)
-        print_and_discord(f"Tornado failed to select market order for {stock}.", loop)
-        return
+        return _order_failed(f"Tornado failed to select market order for {stock}.")
 
     try:
         sell_price = driver.find_element(
@@ -509,24 +489,22 @@ def handle_sell(driver: Chrome, stock: str, order_obj: StockOrder, loop: Abstrac
         ).text.strip()
     except TimeoutException:
         tornado_error(driver, loop)
-        print_and_discord(f"Tornado failed to fetch sell price for {stock}.", loop)
-        return
+        return _order_failed(f"Tornado failed to fetch sell price for {stock}.")
 
     if not dry_mode:
         try:
-            submit_button = WebDriverWait(driver, 20).until(
+            submit_button = WebDriverWait(driver, wait_timeout(20)).until(
                 ec.element_to_be_clickable(
                     (By.XPATH, '//*[@id="main-router"]/div[1]/div/div[11]/div/button'),
                 ),
             )
             submit_button.click()
-            print_and_discord(
+            print(
                 f"Tornado account: sell {quantity} shares of {stock} at {sell_price}",
-                loop,
             )
 
             # Click the "Continue" button after placing the order
-            continue_button = WebDriverWait(driver, 20).until(
+            continue_button = WebDriverWait(driver, wait_timeout(20)).until(
                 ec.element_to_be_clickable(
                     (By.XPATH, '//*[@id="main-router"]/div[1]/div/div[2]/div/button'),
                 ),
@@ -534,12 +512,9 @@ def handle_sell(driver: Chrome, stock: str, order_obj: StockOrder, loop: Abstrac
             continue_button.click()
         except TimeoutException:
             tornado_error(driver, loop)
-            print_and_discord(
-                f"Tornado failed to submit sell order for {stock} or click Continue.",
-                loop,
-            )
+            return _order_failed(f"Tornado failed to submit sell order for {stock} or click Continue.")
     else:
-        print_and_discord(
+        print(
             f"DRY MODE: Simulated order SELL for {quantity} shares of {stock} at {sell_price}",
-            loop,
         )
+    return None
@@ -5,58 +5,47 @@ import json
 import os
 import traceback
 from asyncio import AbstractEventLoop
-from time import sleep
+from time import perf_counter
 from typing import cast
 
-import requests
 from dotenv import load_dotenv
 
-from src.helper_api import Brokerage, StockOrder, mask_string, print_all_holdings, print_and_discord
+from src.brokers import TradierInfo
+from src.helper_api import Brokerage, OrderJob, OrderResult, StockOrder, build_order_jobs, dispatch_orders, http_transport, mask_string, order_result, print_all_holdings, print_and_discord
 
 TRADIER_ENDPOINT = "https://api.tradier.com/v1"
+TRADIER_ORDER_WORKERS = TradierInfo().max_concurrency  # Number of orders to place at once
+TRADIER_QUOTE_BATCH = 100  # Symbols per quotes request
 
 
 def make_request(endpoint: str, bearer_token: str, data: dict[str, str] | None = None, params: dict[str, str] | None = None, method: str = "GET") -> dict | None:
     """Build Tradier API requests."""
-    timeout = 10
+    response = None
     try:
-        if method == "GET":
-            response = requests.get(
-                f"{TRADIER_ENDPOINT}{endpoint}",
-                data=data,
-                params=params,
-                headers={
-                    "Authorization": f"Bearer {bearer_token}",
-                    "Accept": "application/json",
-                },
-                timeout=timeout,
-            )
-        elif method == "POST":
-            response = requests.post(
-                f"{TRADIER_ENDPOINT}{endpoint}",
-                data=data,
-                params=params,
-                headers={
-                    "Authorization": f"Bearer {bearer_token}",
-                    "Accept": "application/json",
-                },
-                timeout=timeout,
-            )
-        else:
+        if method not in {"GET", "POST"}:
             msg = f"Invalid method: {method}"
             raise Exception(msg)
+        response = http_transport.request(
+            method,
+            f"{TRADIER_ENDPOINT}{endpoint}",
+            broker="Tradier",
+            data=data,
+            params=params,
+            headers={
+                "Authorization": f"Bearer {bearer_token}",
+                "Accept": "application/json",
+            },
+        )
         if not response.ok:
             msg = f"Error making request to Tradier API {endpoint}: {response.text}"
             raise Exception(msg)
         json_response = response.json()
         if json_response.get("fault") and json_response["fault"].get("faultstring"):
             raise Exception(json_response["fault"]["faultstring"])
-        sleep(0.1)
     except Exception as e:
         print(f"Error making request to Tradier API {endpoint}: {e}")
         print(f"Response: {response}")
         print(traceback.format_exc())
-        sleep(1)
         return None
     else:
         return json_response
@@ -98,29 +87,53 @@ def tradier_init() -> Brokerage | None:
             print(mask_string(an))
             tradier_obj.set_account_number(name, an)
             tradier_obj.set_account_type(name, an, at)
-            # Get balances
-            json_balances = make_request(f"/accounts/{an}/balances", account)
-            if json_balances is None:
-                tradier_obj.set_account_totals(name, an, 0)
-                continue
-            tradier_obj.set_account_totals(
-                name,
-                an,
-                json_balances["balances"]["total_equity"],
-            )
-        # Get balances
         tradier_obj.set_logged_in_object(name, account)
     print("Logged in to Tradier!")
     return tradier_obj
 
 
-def tradier_holdings(tradier_o: Brokerage, loop: AbstractEventLoop | None = None) -> None:  # noqa: C901
+def tradier_alive(tradier_o: Brokerage) -> bool:
+    """Check that every Tradier token still works."""
+    return all(make_request("/user/profile", cast("str", tradier_o.get_logged_in_objects(key))) is not None for key in tradier_o.get_account_numbers())
+
+
+def _get_quotes(symbols: list[str], tokens: list[str]) -> dict[str, float]:
+    """Get the last price of every symbol in as few requests as possible, trying each token until one works."""
+    prices: dict[str, float] = {}
+    for i in range(0, len(symbols), TRADIER_QUOTE_BATCH):
+        chunk = symbols[i : i + TRADIER_QUOTE_BATCH]
+        for token in tokens:
+            price_response = make_request(
+                "/markets/quotes",
+                token,
+                params={"symbols": ",".join(chunk), "greeks": "false"},
+            )
+            if price_response is None:
+                continue
+            quotes = price_response["quotes"].get("quote") or []
+            # A single quote isn't wrapped in a list
+            for quote in [quotes] if isinstance(quotes, dict) else quotes:
+                if quote.get("last") is not None:
+                    prices[quote["symbol"]] = quote["last"]
+            break
+    return prices
+
+
+def _set_account_total(tradier_o: Brokerage, key: str, account_number: str, token: str) -> None:
+    """Get an account's current balance. Done with holdings, so a reused login doesn't show old totals."""
+    json_balances = make_request(f"/accounts/{account_number}/balances", token)
+    tradier_o.set_account_totals(key, account_number, 0 if json_balances is None else json_balances["balances"]["total_equity"])
+
+
+def tradier_holdings(tradier_o: Brokerage, loop: AbstractEventLoop | None = None) -> None:
     """Retrieve and display all Tradier account holdings."""
-    # Loop through accounts
+    # Get positions in every account first, so all the prices can be fetched together
+    positions: dict[tuple[str, str], list[tuple[str, float]]] = {}
     for key in tradier_o.get_account_numbers():
         obj = cast("str", tradier_o.get_logged_in_objects(key))
         for account_number in tradier_o.get_account_numbers(key):
             try:
+                _set_account_total(tradier_o, key, account_number, obj)
                 # Get holdings from API
                 json_response = make_request(
                     f"/accounts/{account_number}/positions",
@@ -128,116 +141,97 @@ def tradier_holdings(tradier_o: Brokerage, loop: AbstractEventLoop | None = None
                 )
                 if json_response is None:
                     continue
-                stocks: list[str] = []
-                amounts = []
                 # Check if there are no holdings
                 if json_response["positions"] == "null":
+                    tradier_o.set_holdings_loaded(key, account_number)
                     continue
-                # Check if there's only one holding
-                if "symbol" in json_response["positions"]["position"]:
-                    stocks.append(json_response["positions"]["position"]["symbol"])
-                    amounts.append(json_response["positions"]["position"]["quantity"])
-                else:
-                    # Loop through holdings
-                    for stock in json_response["positions"]["position"]:
-                        stocks.append(stock["symbol"])
-                        amounts.append(stock["quantity"])
-                # Get current price of each stock
-                current_price: list[float] = []
-                for sym in stocks:
-                    price_response = make_request(
-                        "/markets/quotes",
-                        obj,
-                        params={"symbols": sym, "greeks": "false"},
-                    )
-                    if price_response is None or price_response["quotes"].get("quote") is None or price_response["quotes"]["quote"].get("last") is None:
-                        current_price.append(0)
-                    else:
-                        current_price.append(price_response["quotes"]["quote"]["last"])
-                # Print and send them
-                for position in stocks:
-                    # Set index for easy use
-                    i = stocks.index(position)
-                    tradier_o.set_holdings(
-                        key,
-                        account_number,
-                        position,
-                        amounts[i],
-                        current_price[i],
-                    )
+                # A single holding comes back on its own instead of in a list
+                position = json_response["positions"]["position"]
+                account_positions = [position] if "symbol" in position else position
+                positions[key, account_number] = [(stock["symbol"], stock["quantity"]) for stock in account_positions]
             except Exception as e:
                 print_and_discord(f"{key}: Error getting holdings: {e}", loop=loop)
                 print(traceback.format_exc())
                 continue
+    # Get current price of each stock across all accounts, a batch at a time
+    symbols = sorted({symbol for account_positions in positions.values() for symbol, _ in account_positions})
+    tokens = [cast("str", tradier_o.get_logged_in_objects(key)) for key in tradier_o.get_account_numbers()]
+    current_price = _get_quotes(symbols, tokens) if symbols else {}
+    for (key, account_number), account_positions in positions.items():
+        for symbol, quantity in account_positions:
+            tradier_o.set_holdings(
+                key,
+                account_number,
+                symbol,
+                quantity,
+                current_price.get(symbol, 0),
+            )
     print_all_holdings(tradier_o, loop=loop)
 
 
-def tradier_transaction(tradier_o: Brokerage, order_obj: StockOrder, loop: AbstractEventLoop | None = None) -> None:
+def _tradier_order(tradier_o: Brokerage, order_obj: StockOrder, job: OrderJob) -> OrderResult:
+    """Place a single Tradier order for one account."""
+    started = perf_counter()
+    s = job.ticker
+    obj = cast("str", tradier_o.get_logged_in_objects(job.login))
+    print_account = mask_string(job.account)
+    # Tradier doesn't support fractional shares
+    if not order_obj.get_amount().is_integer():
+        msg = f"Fractional share {order_obj.get_amount()} not supported"
+        print(f"Tradier account {print_account} Error: {msg}")
+        return order_result(tradier_o, order_obj, job.login, job.account, s, started, error=msg)
+    if order_obj.get_dry():
+        print(f"Tradier account {print_account}: Running in DRY mode. Trasaction would've been: {order_obj.get_action()} {order_obj.get_amount()} of {s}")
+        return order_result(tradier_o, order_obj, job.login, job.account, s, started)
+    json_response = None
+    try:
+        data = {
+            "class": "equity",
+            "symbol": s,
+            "side": order_obj.get_action(),
+            "quantity": str(order_obj.get_amount()),
+            "type": "market",
+            "duration": "day",
+        }
+        json_response = make_request(
+            f"/accounts/{job.account}/orders",
+            obj,
+            data=data,
+            method="POST",
+        )
+        if json_response is None:
+            msg = "JSON response is None"
+            print(f"Tradier account {print_account} Error: {msg}")
+            return order_result(tradier_o, order_obj, job.login, job.account, s, started, error=msg)
+        if json_response.get("order", {}).get("status") is not None:
+            print(f"Tradier account {print_account}: {order_obj.get_action()} {order_obj.get_amount()} of {s}: {json_response['order']['status']}")
+            return order_result(tradier_o, order_obj, job.login, job.account, s, started)
+        print(f"Tradier account {print_account} Error: This order did not route. JSON response: {json.dumps(json_response, indent=2)}")
+        return order_result(tradier_o, order_obj, job.login, job.account, s, started, error="Order did not route")
+    except Exception as e:
+        print(f"Tradier account {print_account} Error: {e}")
+        print(traceback.format_exc())
+        print(f"JSON response: {json.dumps(json_response, indent=2)}")
+        return order_result(tradier_o, order_obj, job.login, job.account, s, started, error=e)
+
+
+def tradier_transaction(tradier_o: Brokerage, order_obj: StockOrder, loop: AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: ARG001
     """Handle Tradier API transactions."""
     print()
     print("==============================")
     print("Tradier")
     print("==============================")
     print()
-    # Loop through accounts
     for s in order_obj.get_stocks():
         for key in tradier_o.get_account_numbers():
-            print_and_discord(
-                f"{key}: {order_obj.get_action()}ing {order_obj.get_amount()} of {s}",
-                loop=loop,
-            )
-            obj = cast("str", tradier_o.get_logged_in_objects(key))
-            for account in tradier_o.get_account_numbers(key):
-                print_account = mask_string(account)
-                # Tradier doesn't support fractional shares
-                if not order_obj.get_amount().is_integer():
-                    print_and_discord(
-                        f"Tradier account {print_account} Error: Fractional share {order_obj.get_amount()} not supported",
-                        loop=loop,
-                    )
-                    continue
-                if not order_obj.get_dry():
-                    try:
-                        data = {
-                            "class": "equity",
-                            "symbol": s,
-                            "side": order_obj.get_action(),
-                            "quantity": str(order_obj.get_amount()),
-                            "type": "market",
-                            "duration": "day",
-                        }
-                        json_response = make_request(
-                            f"/accounts/{account}/orders",
-                            obj,
-                            data=data,
-                            method="POST",
-                        )
-                        if json_response is None:
-                            print_and_discord(
-                                f"Tradier account {print_account} Error: JSON response is None",
-                                loop=loop,
-                            )
-                            continue
-                        if json_response.get("order", {}).get("status") is not None:
-                            print_and_discord(
-                                f"Tradier account {print_account}: {order_obj.get_action()} {order_obj.get_amount()} of {s}: {json_response['order']['status']}",
-                                loop=loop,
-                            )
-                            continue
-                        print_and_discord(
-                            f"Tradier account {print_account} Error: This order did not route. JSON response: {json.dumps(json_response, indent=2)}",
-                            loop=loop,
-                        )
-                    except Exception as e:
-                        print_and_discord(
-                            f"Tradier account {print_account} Error: {e}",
-                            loop=loop,
-                        )
-                        print(traceback.format_exc())
-                        print(f"JSON response: {json.dumps(json_response, indent=2)}")
-                        continue
-                else:
-                    print_and_discord(
-                        f"Tradier account {print_account}: Running in DRY mode. Trasaction would've been: {order_obj.get_action()} {order_obj.get_amount()} of {s}",
-                        loop=loop,
-                    )
+            print(f"{key}: {order_obj.get_action()}ing {order_obj.get_amount()} of {s}")
+    # Each order is an independent API call, so accounts can go at the same time
+    jobs, skipped = build_order_jobs(tradier_o, order_obj)
+    results = dispatch_orders(
+        tradier_o,
+        order_obj,
+        jobs,
+        lambda job: _tradier_order(tradier_o, order_obj, job),
+        max_workers=TRADIER_ORDER_WORKERS,
+    )
+    return skipped + results
@@ -5,6 +5,7 @@ import asyncio
 import os
 import pprint
 import traceback
+from time import perf_counter
 from typing import cast
 
 from discord.ext.commands import Bot
@@ -12,22 +13,24 @@ from dotenv import load_dotenv
 from vanguard import account as vg_account
 from vanguard import order, session
 
-from src.helper_api import Brokerage, StockOrder, get_otp_from_discord, mask_string, print_all_holdings, print_and_discord
+from src.helper_api import Brokerage, OrderResult, StockOrder, check_cancelled, close_on_cancel, get_otp_from_discord, mask_string, order_result, print_all_holdings, print_and_discord, wait_for_discord
 
 
-def vanguard_run(order_obj: StockOrder, bot_obj: Bot | None = None, loop: asyncio.AbstractEventLoop | None = None) -> None:
-    """Run the Vanguard command in a single thread."""
+def vanguard_run(order_obj: StockOrder, bot_obj: Bot | None = None, loop: asyncio.AbstractEventLoop | None = None) -> list[OrderResult]:
+    """Run the Vanguard command in a single thread, returning the outcome of any orders."""
     # Initialize .env file
     load_dotenv()
     # Import Vanguard account
     if not os.getenv("VANGUARD"):
         print("Vanguard not found, skipping...")
-        return
+        return []
     accounts = os.environ["VANGUARD"].strip().split(",")
     # Get headless flag
     headless = os.getenv("HEADLESS", "true").lower() == "true"
 
+    results: list[OrderResult] = []
     for account in accounts:
+        check_cancelled()
         index = accounts.index(account) + 1
         success = vanguard_init(
             van_account=account,
@@ -38,11 +41,12 @@ def vanguard_run(order_obj: StockOrder, bot_obj: Bot | None = None, loop: asynci
         )
         if success is not None:
             order_obj.set_logged_in(success, "vanguard")
-            if order_obj.get_holdings():
-                vanguard_holdings(success, loop=loop)
-            else:
-                vanguard_transaction(success, order_obj, loop=loop)
-    return
+            with close_on_cancel(success, lambda vg_session: vg_session.close_browser()):
+                if order_obj.get_holdings():
+                    vanguard_holdings(success, loop=loop)
+                else:
+                    results.extend(vanguard_transaction(success, order_obj, loop=loop))
+    return results
 
 
 def vanguard_init(van_account: str, index: int, *, headless: bool = True, bot_obj: Bot | None = None, loop: asyncio.AbstractEventLoop | None = None) -> Brokerage | None:
@@ -65,10 +69,10 @@ def vanguard_init(van_account: str, index: int, *, headless: bool = True, bot_ob
             if bot_obj is None and loop is None:
                 vg_session.login_two(input("Enter code: "))
             elif bot_obj is not None and loop is not None:
-                sms_code = asyncio.run_coroutine_threadsafe(
+                sms_code = wait_for_discord(
                     get_otp_from_discord(bot_obj, name, timeout=120, loop=loop),
                     loop,
-                ).result()
+                )
                 if sms_code is None:
                     msg = f"Vanguard {index} code not received in time..."
                     raise Exception(msg, loop)
@@ -111,6 +115,7 @@ def vanguard_holdings(vanguard_o: Brokerage, loop: asyncio.AbstractEventLoop | N
             success = all_accounts.get_holdings()
             if success:
                 for account in all_accounts.accounts_positions:
+                    vanguard_o.set_holdings_loaded(key, account)
                     for account_type in all_accounts.accounts_positions[account]:
                         for stock in all_accounts.accounts_positions[account][account_type]:
                             if float(stock["quantity"]) != 0 and stock["symbol"] != "—":
@@ -133,7 +138,7 @@ def vanguard_holdings(vanguard_o: Brokerage, loop: asyncio.AbstractEventLoop | N
     obj.close_browser()
 
 
-def vanguard_transaction(vanguard_o: Brokerage, order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None = None) -> None:  # noqa: C901, PLR0912, PLR0915
+def vanguard_transaction(vanguard_o: Brokerage, order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: ARG001, C901, PLR0912, PLR0915
     """Handle Vanguard API transactions."""
     print()
     print("==============================")
@@ -142,37 +147,39 @@ def vanguard_transaction(vanguard_o: Brokerage, order_obj: StockOrder, loop: asy
     print()
     # Use each account (unless specified in .env)
     purchase_accounts = os.getenv("VG_ACCOUNT_NUMBERS", "").strip().split(":")
+    results: list[OrderResult] = []
     for s in order_obj.get_stocks():
         for key in vanguard_o.get_account_numbers():
-            print_and_discord(
+            print(
                 f"{key} {order_obj.get_action()}ing {order_obj.get_amount()} {s} @ {order_obj.get_price()}",
-                loop,
             )
             try:
                 for account in vanguard_o.get_account_numbers(key):
+                    check_cancelled()
                     print_account = mask_string(account)
+                    started = perf_counter()
                     if purchase_accounts != [""] and order_obj.get_action().lower() != "sell" and str(account) not in purchase_accounts:
                         print(
                             f"Skipping account {print_account}, not in VG_ACCOUNT_NUMBERS",
                         )
+                        results.append(order_result(vanguard_o, order_obj, key, account, s, started, skipped=True))
                         continue
                     obj = cast("session.VanguardSession", vanguard_o.get_logged_in_objects(key))
                     # If DRY is True, don't actually make the transaction
                     if order_obj.get_dry():
-                        print_and_discord(
+                        print(
                             "Running in DRY mode. No transactions will be made.",
-                            loop,
                         )
                     vg_order = order.Order(obj)
                     price_type = order.PriceType.MARKET
                     order_type = order.OrderSide.BUY if order_obj.get_action().capitalize() == "Buy" else order.OrderSide.SELL
+                    error = None
                     # Check if dance is needed
                     transaction_length = 2 if int(order_obj.get_amount()) == 1 and order_obj.get_action() == "buy" else 1
                     for i in range(transaction_length):
                         if i == 0 and transaction_length == 2:  # noqa: PLR2004
-                            print_and_discord(
+                            print(
                                 f"{key} account {print_account}: Buying 26 then selling 25 of {s}",
-                                loop,
                             )
                             dance_quantity = 26
                         elif i == 0 and transaction_length == 1:
@@ -194,14 +201,14 @@ def vanguard_transaction(vanguard_o: Brokerage, order_obj: StockOrder, loop: asy
                             "The order verification produced the following messages: ",
                         )
                         if messages["ORDER CONFIRMATION"] == "No order confirmation page found. Order Failed.":
-                            print_and_discord(
+                            print(
                                 "Market order failed placing limit order.",
-                                loop,
                             )
                             price_type = order.PriceType.LIMIT
                             price = vg_order.get_quote(s)
                             if not price:
-                                print_and_discord(f"{key} account {print_account}: Error getting quote for {s}", loop)
+                                print(f"{key} account {print_account}: Error getting quote for {s}")
+                                error = f"Error getting quote for {s}"
                                 continue
                             price += 0.01
                             messages = vg_order.place_order(
@@ -217,36 +224,37 @@ def vanguard_transaction(vanguard_o: Brokerage, order_obj: StockOrder, loop: asy
                         if order_obj.get_dry():
                             if messages["ORDER PREVIEW"]:
                                 pprint.pprint(messages["ORDER PREVIEW"])  # noqa: T203
-                            print_and_discord(
+                            if messages["ORDER PREVIEW"] in {"", "No order preview page found."}:
+                                error = "Order preview failed"
+                            print(
                                 (f"{key} account {print_account}: The order verification was " + ("successful" if messages["ORDER PREVIEW"] not in {"", "No order preview page found."} else "unsuccessful")),
-                                loop,
                             )
                             if messages["ORDER INVALID"] != "No invalid order message found.":
-                                print_and_discord(
+                                print(
                                     f"{key} account {print_account}: The order verification produced the following messages: {messages['ORDER INVALID']}",
-                                    loop,
                                 )
                         else:
                             if messages["ORDER CONFIRMATION"]:
                                 pprint.pprint(messages["ORDER CONFIRMATION"])  # noqa: T203
-                            print_and_discord(
+                            if messages["ORDER CONFIRMATION"] in {"", "No order confirmation page found. Order Failed."}:
+                                error = "Order confirmation failed"
+                            print(
                                 (f"{key} account {print_account}: The order verification was " + ("successful" if messages["ORDER CONFIRMATION"] not in {"", "No order confirmation page found. Order Failed."} else "unsuccessful")),
-                                loop,
                             )
                             if messages["ORDER INVALID"] != "No invalid order message found.":
-                                print_and_discord(
+                                print(
                                     f"{key} account {print_account}: The order verification produced the following messages: {messages['ORDER INVALID']}",
-                                    loop,
                                 )
+                    results.append(order_result(vanguard_o, order_obj, key, account, s, started, error=error))
             except Exception as e:
-                print_and_discord(
+                print(
                     f"{key} {print_account}: Error submitting order: {e}",
-                    loop,
                 )
                 print(traceback.format_exc())
+                results.append(order_result(vanguard_o, order_obj, key, account, s, started, error=e))
                 continue
     obj.close_browser()
-    print_and_discord(
+    print(
         "All Vanguard transactions complete",
-        loop,
     )
+    return results
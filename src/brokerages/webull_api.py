@@ -4,27 +4,27 @@
 import os
 import traceback
 from asyncio import AbstractEventLoop
-from time import sleep
+from time import perf_counter, sleep
 from typing import cast
 
 from dotenv import load_dotenv
 
-from src.helper_api import Brokerage, StockOrder, mask_string, print_all_holdings, print_and_discord
+from src.helper_api import Brokerage, OrderResult, StockOrder, mask_string, order_result, print_all_holdings, print_and_discord, quote_cache, skip_sell
 from src.vendors.webull.webull import webull
 
 MAX_WB_RETRIES = 3  # Number of times to retry logging in if not successful
 MAX_WB_ACCOUNTS = 11  # Different account types
 
 
-def place_order(obj: webull, account: str, order_obj: StockOrder, s: str) -> bool:
-    """Place an order on Webull."""
+def place_order(obj: webull, account: str, order_obj: StockOrder, s: str, *, action: str | None = None, amount: float | None = None) -> bool:
+    """Place an order on Webull. Action and amount default to the order object's."""
     obj.set_account_id(account)
     order_type = "MKT" if order_obj.get_price() == "market" else "LMT"
     order = obj.place_order(
         stock=s,
-        action=order_obj.get_action().upper(),
+        action=(action or order_obj.get_action()).upper(),
         orderType=order_type,
-        quant=int(order_obj.get_amount()),
+        quant=int(order_obj.get_amount() if amount is None else amount),
         enforce=order_obj.get_time().upper(),
     )
     if order.get("success") is not None and not order["success"]:
@@ -94,6 +94,15 @@ def webull_init() -> Brokerage | None:
     return wb_obj
 
 
+def webull_alive(wbo: Brokerage) -> bool:
+    """Check that every Webull login can still read its accounts."""
+    for key in wbo.get_account_numbers():
+        obj = cast("webull", wbo.get_logged_in_objects(key, "wb"))
+        if obj.get_account_id(0) is None:
+            return False
+    return True
+
+
 def webull_holdings(wbo: Brokerage, loop: AbstractEventLoop | None = None) -> None:
     """Retrieve and display all Webull account holdings."""
     for key in wbo.get_account_numbers():
@@ -103,22 +112,25 @@ def webull_holdings(wbo: Brokerage, loop: AbstractEventLoop | None = None) -> No
             try:
                 # Get account holdings
                 obj.set_account_id(internal_account)
+                # Refresh the total too, a reused session still has the one from when it logged in
+                wbo.set_account_totals(key, account, obj.get_account(v2=True)["accountSummaryVO"]["netLiquidationValue"])
                 positions = obj.get_positions()
                 if positions is None:
                     positions = obj.get_positions(v2=True)
+                if positions is not None:
+                    wbo.set_holdings_loaded(key, account)
                 # List of holdings dictionaries
-                if positions is not None and positions != []:
-                    for item in positions:
-                        if item.get("items") is not None:
-                            item = item["items"][0]  # noqa: PLW2901
-                        sym = item["ticker"]["symbol"]
-                        if not sym:
-                            sym = "Unknown"
-                        qty = item["quantity"] if item.get("quantity") is not None else item["position"]
-                        if float(qty) == 0:
-                            continue
-                        mv = round(float(item["marketValue"]) / float(qty), 2)
-                        wbo.set_holdings(key, account, sym, qty, mv)
+                for item in positions or []:
+                    if item.get("items") is not None:
+                        item = item["items"][0]  # noqa: PLW2901
+                    sym = item["ticker"]["symbol"]
+                    if not sym:
+                        sym = "Unknown"
+                    qty = item["quantity"] if item.get("quantity") is not None else item["position"]
+                    if float(qty) == 0:
+                        continue
+                    mv = round(float(item["marketValue"]) / float(qty), 2)
+                    wbo.set_holdings(key, account, sym, qty, mv)
             except Exception as e:
                 print_and_discord(f"{key}: Error getting holdings: {e}", loop)
                 traceback.print_exc()
@@ -126,35 +138,37 @@ def webull_holdings(wbo: Brokerage, loop: AbstractEventLoop | None = None) -> No
     print_all_holdings(wbo, loop=loop)
 
 
-def webull_transaction(wbo: Brokerage, order_obj: StockOrder, loop: AbstractEventLoop | None = None) -> None:  # noqa: C901, PLR0912, PLR0914, PLR0915
+def webull_transaction(wbo: Brokerage, order_obj: StockOrder, loop: AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: ARG001, C901, PLR0912, PLR0914, PLR0915
     """Handle Webull stock transactions."""
     print()
     print("==============================")
     print("Webull")
     print("==============================")
     print()
+    results: list[OrderResult] = []
     for s in order_obj.get_stocks():
         for key in wbo.get_account_numbers():
-            print_and_discord(
+            print(
                 f"{key}: {order_obj.get_action()}ing {order_obj.get_amount()} of {s}",
-                loop,
             )
             for account in wbo.get_account_numbers(key):
                 print_account = mask_string(account)
+                started = perf_counter()
+                if skip_sell(wbo, order_obj, key, account, s):
+                    results.append(order_result(wbo, order_obj, key, account, s, started, skipped=True))
+                    continue
                 obj = cast("webull", wbo.get_logged_in_objects(key, "wb"))
                 internal_account = cast("str", wbo.get_logged_in_objects(key, account))
                 if not order_obj.get_dry():
-                    old_amount = order_obj.get_amount()
-                    original_action = order_obj.get_action()
                     try:
                         # If buy stock price < $1 or $0.10,
                         # buy 100/1000 shares and sell 100/1000 - amount
-                        quote = obj.get_quote(s)
+                        quote = quote_cache.get("webull", s, obj.get_quote)
                         ask_list = quote.get("askList", [])
                         bid_list = quote.get("bidList", [])
                         if ask_list == [] and bid_list == []:
                             msg = f"{key}: {s} is not available for trading"
-                            print_and_discord(msg, loop)
+                            print(msg)
                             raise Exception(msg)
                         ask_price = float(ask_list[0]["price"]) if ask_list != [] else 0
                         bid_price = float(bid_list[0]["price"]) if bid_list != [] else 0
@@ -167,45 +181,43 @@ def webull_transaction(wbo: Brokerage, order_obj: StockOrder, loop: AbstractEven
                         dime_dance_amount = 1000
                         if ((ask_price < 1 or bid_price < 1) and order_obj.get_amount() < dollar_dance_amount) or ((ask_price < dime_amount or bid_price < dime_amount) and order_obj.get_amount() < dime_dance_amount):  # noqa: PLR0916
                             should_dance = True
+                        action = order_obj.get_action()
+                        amount = order_obj.get_amount()
                         if should_dance and order_obj.get_action() == "buy":
                             # 100 shares if < $1, 1000 shares if < $0.10
                             big_amount = dime_dance_amount if (ask_price < dime_amount or bid_price < dime_amount) else dollar_dance_amount
                             print(
                                 f"Buying {big_amount} then selling {big_amount - order_obj.get_amount()} of {s}",
                             )
-                            order_obj.set_amount(big_amount)
-                            buy_success = place_order(obj, internal_account, order_obj, s)
+                            buy_success = place_order(obj, internal_account, order_obj, s, action="buy", amount=big_amount)
                             if not buy_success:
                                 msg = f"Error buying {big_amount} of {s}"
                                 raise Exception(msg)
-                            order_obj.set_amount(big_amount - old_amount)
-                            order_obj.set_action("sell")
+                            action = "sell"
+                            amount = big_amount - order_obj.get_amount()
                             sleep(1)
-                            order = place_order(obj, internal_account, order_obj, s)
+                            order = place_order(obj, internal_account, order_obj, s, action=action, amount=amount)
                             if not order:
-                                msg = f"Error selling {big_amount - old_amount} of {s}"
+                                msg = f"Error selling {amount} of {s}"
                                 raise Exception(msg)
                         else:
                             # Place normal order
                             order = place_order(obj, internal_account, order_obj, s)
                         if order:
-                            print_and_discord(
-                                f"{key}: {order_obj.get_action()} {order_obj.get_amount()} of {s} in {print_account}: Success",
-                                loop,
+                            print(
+                                f"{key}: {action} {amount} of {s} in {print_account}: Success",
                             )
+                        results.append(order_result(wbo, order_obj, key, account, s, started, error=None if order else "Order was not placed"))
                     except Exception as e:
-                        print_and_discord(
+                        print(
                             f"{key} {print_account}: Error placing order: {e}",
-                            loop,
                         )
                         print(traceback.format_exc())
+                        results.append(order_result(wbo, order_obj, key, account, s, started, error=e))
                         continue
-                    finally:
-                        # Restore orderObj
-                        order_obj.set_amount(old_amount)
-                        order_obj.set_action("buy" if original_action.lower() == "buy" else "sell")
                 else:
-                    print_and_discord(
+                    print(
                         f"{key} {print_account}: Running in DRY mode. Transaction would've been: {order_obj.get_action()} {order_obj.get_amount()} of {s}",
-                        loop,
                     )
+                    results.append(order_result(wbo, order_obj, key, account, s, started))
+    return results
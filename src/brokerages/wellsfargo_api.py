@@ -4,7 +4,7 @@ import datetime
 import os
 import re
 import traceback
-from time import sleep
+from time import perf_counter, sleep
 from typing import cast
 
 from discord.ext.commands import Bot
@@ -19,7 +19,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as ec
 from selenium.webdriver.support.wait import WebDriverWait
 
-from src.helper_api import Brokerage, StockOrder, check_if_page_loaded, get_local_timezone, get_otp_from_discord, get_selenium_driver, kill_all_selenium_drivers, print_all_holdings, print_and_discord, type_slowly
+from src.helper_api import Brokerage, OrderResult, StockOrder, check_cancelled, check_if_page_loaded, get_local_timezone, get_otp_from_discord, get_selenium_driver, kill_all_selenium_drivers, order_result, print_all_holdings, print_and_discord, type_slowly, wait_for_discord, wait_timeout
 
 
 def _wellsfargo_error(driver: Chrome, error: str) -> None:
@@ -48,7 +48,7 @@ def wellsfargo_init(bot_obj: Bot | None, *, docker_mode: bool = False, loop: asy
                 msg = "Driver not found."
                 raise Exception(msg)
             driver.get("https://connect.secure.wellsfargo.com/auth/login/present")
-            WebDriverWait(driver, 20).until(check_if_page_loaded)
+            WebDriverWait(driver, wait_timeout(20)).until(check_if_page_loaded)
             # Login
             try:
                 username_field = driver.find_element(By.XPATH, "//*[@id='j_username']")
@@ -57,20 +57,20 @@ def wellsfargo_init(bot_obj: Bot | None, *, docker_mode: bool = False, loop: asy
                 password_field = driver.find_element(By.XPATH, "//*[@id='j_password']")
                 type_slowly(password_field, account[1])
 
-                login_button = WebDriverWait(driver, 20).until(
+                login_button = WebDriverWait(driver, wait_timeout(20)).until(
                     ec.element_to_be_clickable(
                         (By.CSS_SELECTOR, ".Button__modern___cqCp7"),
                     ),
                 )
                 login_button.click()
-                WebDriverWait(driver, 20).until(check_if_page_loaded)
+                WebDriverWait(driver, wait_timeout(20)).until(check_if_page_loaded)
                 print("=====================================================\n")
             except TimeoutException:
                 print("TimeoutException: Login failed.")
                 return None
             wf_obj.set_logged_in_object(name, driver)
             try:
-                auth_popup = WebDriverWait(driver, 10).until(
+                auth_popup = WebDriverWait(driver, wait_timeout(10)).until(
                     ec.presence_of_element_located(
                         (
                             By.CSS_SELECTOR,
@@ -90,24 +90,24 @@ def wellsfargo_init(bot_obj: Bot | None, *, docker_mode: bool = False, loop: asy
                 print("Clicked on phone number")
                 # Get the OTP code from the user
                 if bot_obj is not None and loop is not None:  # noqa: SIM108
-                    code = asyncio.run_coroutine_threadsafe(
+                    code = wait_for_discord(
                         get_otp_from_discord(bot_obj, name, timeout=300, loop=loop),
                         loop,
-                    ).result()
+                    )
                 else:
                     code = input("Enter security code: ")
-                code_input = WebDriverWait(driver, 20).until(
+                code_input = WebDriverWait(driver, wait_timeout(20)).until(
                     ec.presence_of_element_located((By.ID, "otp")),
                 )
                 if code:
                     code_input.send_keys(code)
-                WebDriverWait(driver, 10).until(
+                WebDriverWait(driver, wait_timeout(10)).until(
                     ec.element_to_be_clickable((By.XPATH, "//button[@type='submit']")),
                 ).click()
             except TimeoutException:
                 pass
 
-            WebDriverWait(driver, 20).until(
+            WebDriverWait(driver, wait_timeout(20)).until(
                 ec.presence_of_element_located((By.LINK_TEXT, "Locations")),
             )
 
@@ -141,19 +141,20 @@ def wellsfargo_init(bot_obj: Bot | None, *, docker_mode: bool = False, loop: asy
 def wellsfargo_holdings(wf_obj: Brokerage, loop: asyncio.AbstractEventLoop | None = None) -> None:  # noqa: C901, PLR0912, PLR0914, PLR0915
     """Retrieve and display all Wells Fargo account holdings."""
     for key in wf_obj.get_account_numbers():
+        check_cancelled()
         driver = cast("Chrome", wf_obj.get_logged_in_objects(key))
         try:
-            brokerage = WebDriverWait(driver, 20).until(
+            brokerage = WebDriverWait(driver, wait_timeout(20)).until(
                 ec.element_to_be_clickable((By.XPATH, "//*[@id='BROKERAGE_LINK7P']")),
             )
             brokerage.click()
 
             try:
-                more = WebDriverWait(driver, 20).until(
+                more = WebDriverWait(driver, wait_timeout(20)).until(
                     ec.element_to_be_clickable((By.LINK_TEXT, "Holdings Snapshot")),
                 )
                 more.click()
-                position = WebDriverWait(driver, 10).until(
+                position = WebDriverWait(driver, wait_timeout(10)).until(
                     ec.element_to_be_clickable((By.ID, "btnpositions")),
                 )
                 position.click()
@@ -164,7 +165,7 @@ def wellsfargo_holdings(wf_obj: Brokerage, loop: asyncio.AbstractEventLoop | Non
 
             # Check if multi-account dropdown exists
             try:
-                WebDriverWait(driver, 5).until(
+                WebDriverWait(driver, wait_timeout(5)).until(
                     ec.presence_of_element_located((By.XPATH, "//*[@id='dropdown1']")),
                 )
                 is_multi_account = True
@@ -179,7 +180,7 @@ def wellsfargo_holdings(wf_obj: Brokerage, loop: asyncio.AbstractEventLoop | Non
 
             if is_multi_account:
                 # Original multi-account logic
-                open_dropdown = WebDriverWait(driver, 20).until(
+                open_dropdown = WebDriverWait(driver, wait_timeout(20)).until(
                     ec.element_to_be_clickable((By.XPATH, "//*[@id='dropdown1']")),
                 )
                 open_dropdown.click()
@@ -190,10 +191,11 @@ def wellsfargo_holdings(wf_obj: Brokerage, loop: asyncio.AbstractEventLoop | Non
                 accounts = int(accounts - 3)  # Adjust based on actual implementation
 
                 for account in range(accounts):
+                    check_cancelled()
                     if account >= len(account_masks):
                         continue
                     try:
-                        open_dropdown = WebDriverWait(driver, 20).until(
+                        open_dropdown = WebDriverWait(driver, wait_timeout(20)).until(
                             ec.element_to_be_clickable(
                                 (By.XPATH, "//*[@id='dropdown1']"),
                             ),
@@ -287,7 +289,7 @@ def wellsfargo_holdings(wf_obj: Brokerage, loop: asyncio.AbstractEventLoop | Non
         kill_all_selenium_drivers(wf_obj)
 
 
-def wellsfargo_transaction(wf_obj: Brokerage, order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None = None) -> None:  # noqa: C901, PLR0912, PLR0914, PLR0915
+def wellsfargo_transaction(wf_obj: Brokerage, order_obj: StockOrder, loop: asyncio.AbstractEventLoop | None = None) -> list[OrderResult]:  # noqa: ARG001, C901, PLR0912, PLR0914, PLR0915
     """Handle Wells Fargo stock transactions."""
     print()
     print("==============================")
@@ -295,28 +297,29 @@ def wellsfargo_transaction(wf_obj: Brokerage, order_obj: StockOrder, loop: async
     print("==============================")
     print()
 
+    results: list[OrderResult] = []
     for key in wf_obj.get_account_numbers():
         driver = cast("Chrome", wf_obj.get_logged_in_objects(key))
 
         # Navigate to Trade
         try:
-            brokerage = WebDriverWait(driver, 20).until(
+            brokerage = WebDriverWait(driver, wait_timeout(20)).until(
                 ec.element_to_be_clickable((By.XPATH, "//*[@id='BROKERAGE_LINK7P']")),
             )
             brokerage.click()
 
-            trade = WebDriverWait(driver, 20).until(
+            trade = WebDriverWait(driver, wait_timeout(20)).until(
                 ec.element_to_be_clickable((By.XPATH, "//*[@id='trademenu']/span[1]")),
             )
             trade.click()
 
-            trade_stock = WebDriverWait(driver, 20).until(
+            trade_stock = WebDriverWait(driver, wait_timeout(20)).until(
                 ec.element_to_be_clickable((By.XPATH, "//*[@id='linktradestocks']")),
             )
             trade_stock.click()
 
             # Find accounts
-            open_dropdown = WebDriverWait(driver, 20).until(
+            open_dropdown = WebDriverWait(driver, wait_timeout(20)).until(
                 ec.element_to_be_clickable((By.XPATH, "//*[@id='dropdown2']")),
             )
             open_dropdown.click()
@@ -333,29 +336,30 @@ def wellsfargo_transaction(wf_obj: Brokerage, order_obj: StockOrder, loop: async
         # Use to keep track of an order to know whether to reset the trading screen
         order_failed = False
         for account in range(accounts):
-            WebDriverWait(driver, 20).until(check_if_page_loaded)
+            check_cancelled()
+            WebDriverWait(driver, wait_timeout(20)).until(check_if_page_loaded)
             if account >= len(account_masks):
                 continue
             try:
                 if order_failed and order_obj.get_dry():
-                    trade = WebDriverWait(driver, 20).until(
+                    trade = WebDriverWait(driver, wait_timeout(20)).until(
                         ec.element_to_be_clickable(
                             (By.XPATH, "//*[@id='trademenu']/span[1]"),
                         ),
                     )
                     trade.click()
-                    trade_stock = WebDriverWait(driver, 20).until(
+                    trade_stock = WebDriverWait(driver, wait_timeout(20)).until(
                         ec.element_to_be_clickable(
                             (By.XPATH, "//*[@id='linktradestocks']"),
                         ),
                     )
                     trade_stock.click()
-                    dismiss_prompt = WebDriverWait(driver, 20).until(
+                    dismiss_prompt = WebDriverWait(driver, wait_timeout(20)).until(
                         ec.element_to_be_clickable((By.ID, "btn-continue")),
                     )
                     dismiss_prompt.click()
                 # choose account
-                open_dropdown = WebDriverWait(driver, 20).until(
+                open_dropdown = WebDriverWait(driver, wait_timeout(20)).until(
                     ec.element_to_be_clickable((By.XPATH, "//*[@id='dropdown2']")),
                 )
                 open_dropdown.click()
@@ -385,22 +389,23 @@ def wellsfargo_transaction(wf_obj: Brokerage, order_obj: StockOrder, loop: async
                 print("Could not change account")
                 kill_all_selenium_drivers(wf_obj)
             for s in order_obj.get_stocks():
-                WebDriverWait(driver, 20).until(check_if_page_loaded)
+                started = perf_counter()
+                WebDriverWait(driver, wait_timeout(20)).until(check_if_page_loaded)
                 # If an order fails need to sort of reset the tradings screen. Refresh does not work
                 if order_failed:
-                    trade = WebDriverWait(driver, 20).until(
+                    trade = WebDriverWait(driver, wait_timeout(20)).until(
                         ec.element_to_be_clickable(
                             (By.XPATH, "//*[@id='trademenu']/span[1]"),
                         ),
                     )
                     trade.click()
-                    trade_stock = WebDriverWait(driver, 20).until(
+                    trade_stock = WebDriverWait(driver, wait_timeout(20)).until(
                         ec.element_to_be_clickable(
                             (By.XPATH, "//*[@id='linktradestocks']"),
                         ),
                     )
                     trade_stock.click()
-                    dismiss_prompt = WebDriverWait(driver, 20).until(
+                    dismiss_prompt = WebDriverWait(driver, wait_timeout(20)).until(
                         ec.element_to_be_clickable((By.ID, "btn-continue")),
                     )
                     dismiss_prompt.click()
@@ -409,23 +414,23 @@ def wellsfargo_transaction(wf_obj: Brokerage, order_obj: StockOrder, loop: async
                 driver.execute_script('document.getElementById("BuySellBtn").click()')
                 # Buy or Sell
                 if order_obj.get_action().lower() == "buy":
-                    action = WebDriverWait(driver, 20).until(
+                    action = WebDriverWait(driver, wait_timeout(20)).until(
                         ec.element_to_be_clickable((By.LINK_TEXT, "Buy")),
                     )
                 elif order_obj.get_action().lower() == "sell":
-                    action = WebDriverWait(driver, 20).until(
+                    action = WebDriverWait(driver, wait_timeout(20)).until(
                         ec.element_to_be_clickable((By.LINK_TEXT, "Sell")),
                     )
                 else:
                     print("no buy or sell set")
                 action.click()
 
-                review = WebDriverWait(driver, 20).until(
+                review = WebDriverWait(driver, wait_timeout(20)).until(
                     ec.element_to_be_clickable((By.ID, "actionbtnContinue")),
                 )
                 driver.execute_script("arguments[0].scrollIntoView(true);", review)
                 sleep(2)
-                ticker_box = WebDriverWait(driver, 20).until(
+                ticker_box = WebDriverWait(driver, wait_timeout(20)).until(
                     ec.element_to_be_clickable((By.ID, "Symbol")),
                 )
 
@@ -438,7 +443,7 @@ def wellsfargo_transaction(wf_obj: Brokerage, order_obj: StockOrder, loop: async
                 )
 
                 # get price
-                WebDriverWait(driver, 20).until(
+                WebDriverWait(driver, wait_timeout(20)).until(
                     ec.presence_of_element_located((By.CLASS_NAME, "qeval")),
                 )
 
@@ -477,7 +482,7 @@ def wellsfargo_transaction(wf_obj: Brokerage, order_obj: StockOrder, loop: async
                 try:
                     if not order_obj.get_dry():
                         # submit
-                        submit = WebDriverWait(driver, 10).until(
+                        submit = WebDriverWait(driver, wait_timeout(10)).until(
                             ec.element_to_be_clickable(
                                 (By.CSS_SELECTOR, ".btn-wfa-submit"),
                             ),
@@ -487,10 +492,8 @@ def wellsfargo_transaction(wf_obj: Brokerage, order_obj: StockOrder, loop: async
                             submit,
                         )  # Was getting visibility issues even though scrolling to it
                         # Send confirmation
-                        print_and_discord(
-                            f"{key} {wf_obj.get_account_numbers(key)[account]}: {order_obj.get_action()} {order_obj.get_amount()} shares of {s}",
-                            loop,
-                        )
+                        print(f"{key} {wf_obj.get_account_numbers(key)[account]}: {order_obj.get_action()} {order_obj.get_amount()} shares of {s}")
+                        results.append(order_result(wf_obj, order_obj, key, account_masks[account].replace("*", ""), s, started))
                         # buy next
                         buy_next = driver.find_element(
                             By.CSS_SELECTOR,
@@ -499,10 +502,8 @@ def wellsfargo_transaction(wf_obj: Brokerage, order_obj: StockOrder, loop: async
                         driver.execute_script("arguments[0].click();", buy_next)
                         order_failed = False
                     elif order_obj.get_dry():
-                        print_and_discord(
-                            f"DRY: {key} account {wf_obj.get_account_numbers(key)[account]}: {order_obj.get_action()} {order_obj.get_amount()} shares of {s}",
-                            loop,
-                        )
+                        print(f"DRY: {key} account {wf_obj.get_account_numbers(key)[account]}: {order_obj.get_action()} {order_obj.get_amount()} shares of {s}")
+                        results.append(order_result(wf_obj, order_obj, key, account_masks[account].replace("*", ""), s, started))
                         order_failed = True
                 except TimeoutException:
                     error_text = driver.find_element(
@@ -510,12 +511,10 @@ def wellsfargo_transaction(wf_obj: Brokerage, order_obj: StockOrder, loop: async
                         "//div[@class='alert-msg-summary']//p[1]",
                     ).text
                     order_failed = True
-                    print_and_discord(
-                        f"{key} {wf_obj.get_account_numbers(key)[account]}: {order_obj.get_action()} {order_obj.get_amount()} shares of {s}. FAILED! \n{error_text}",
-                        loop,
-                    )
+                    print(f"{key} {wf_obj.get_account_numbers(key)[account]}: {order_obj.get_action()} {order_obj.get_amount()} shares of {s}. FAILED! \n{error_text}")
+                    results.append(order_result(wf_obj, order_obj, key, account_masks[account].replace("*", ""), s, started, error=error_text))
                     # Cancel the trade
-                    cancel_button = WebDriverWait(driver, 3).until(
+                    cancel_button = WebDriverWait(driver, wait_timeout(3)).until(
                         ec.element_to_be_clickable(
                             (By.CSS_SELECTOR, "#actionbtnCancel"),
                         ),
@@ -524,7 +523,8 @@ def wellsfargo_transaction(wf_obj: Brokerage, order_obj: StockOrder, loop: async
                         "arguments[0].click();",
                         cancel_button,
                     )  # Must be clicked with js since it's out of view
-                    WebDriverWait(driver, 3).until(
+                    WebDriverWait(driver, wait_timeout(3)).until(
                         ec.element_to_be_clickable((By.CSS_SELECTOR, "#btn-continue")),
                     ).click()
         kill_all_selenium_drivers(wf_obj)
+    return results
@@ -1,7 +1,10 @@
 """Contains Info For All Brokerages."""
 
+from collections.abc import Callable
 from dataclasses import dataclass, field
 from enum import StrEnum
+from importlib import import_module
+from typing import Any, Literal
 
 
 class BrokerName(StrEnum):
@@ -33,6 +36,22 @@ class BrokerInfo:
     nicknames: tuple[str, ...]
     day1: bool
     fast: bool
+    # Entry points as "module:function" import paths, only imported when the broker is used
+    init: str | None = None  # Returns a logged in Brokerage
+    holdings: str | None = None  # (brokerage, loop)
+    transaction: str | None = None  # (brokerage, order_obj, loop)
+    run: str | None = None  # (order_obj, bot_obj, loop), for brokers that do everything in one call
+    alive: str | None = None  # (brokerage) -> bool, cheap check that a login can be reused
+    init_args: tuple[str, ...] = ()  # Which of bot_obj, loop and docker_mode init takes
+    max_concurrency: int = 1  # Most orders that are safe to place at once
+
+    def entry_point(self, kind: Literal["init", "holdings", "transaction", "run", "alive"]) -> Callable[..., Any] | None:
+        """Import and return one of the broker's entry points, or None if it doesn't have one."""
+        path = getattr(self, kind)
+        if path is None:
+            return None
+        module_name, _, function_name = path.partition(":")
+        return getattr(import_module(module_name), function_name)
 
 
 @dataclass(frozen=True, slots=True)
@@ -43,6 +62,10 @@ class BbaeInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=lambda: ("bb",))
     day1: bool = True
     fast: bool = True
+    init: str | None = "src.brokerages.bbae_api:bbae_init"
+    holdings: str | None = "src.brokerages.bbae_api:bbae_holdings"
+    transaction: str | None = "src.brokerages.bbae_api:bbae_transaction"
+    init_args: tuple[str, ...] = field(default_factory=lambda: ("bot_obj", "loop"))
 
 
 @dataclass(frozen=True, slots=True)
@@ -53,6 +76,7 @@ class ChaseInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=tuple[str, ...])
     day1: bool = True
     fast: bool = False
+    run: str | None = "src.brokerages.chase_api:chase_run"
 
 
 @dataclass(frozen=True, slots=True)
@@ -63,6 +87,10 @@ class DspacInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=lambda: ("ds",))
     day1: bool = True
     fast: bool = True
+    init: str | None = "src.brokerages.dspac_api:dspac_init"
+    holdings: str | None = "src.brokerages.dspac_api:dspac_holdings"
+    transaction: str | None = "src.brokerages.dspac_api:dspac_transaction"
+    init_args: tuple[str, ...] = field(default_factory=lambda: ("bot_obj", "loop"))
 
 
 @dataclass(frozen=True, slots=True)
@@ -73,6 +101,11 @@ class FennelInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=tuple[str, ...])
     day1: bool = True
     fast: bool = False
+    init: str | None = "src.brokerages.fennel_api:fennel_init"
+    holdings: str | None = "src.brokerages.fennel_api:fennel_holdings"
+    transaction: str | None = "src.brokerages.fennel_api:fennel_transaction"
+    init_args: tuple[str, ...] = field(default_factory=lambda: ("loop",))
+    max_concurrency: int = 4
 
 
 @dataclass(frozen=True, slots=True)
@@ -83,6 +116,7 @@ class FidelityInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=lambda: ("fid", "fido"))
     day1: bool = False
     fast: bool = False
+    run: str | None = "src.brokerages.fidelity_api:fidelity_run"
 
 
 @dataclass(frozen=True, slots=True)
@@ -93,6 +127,11 @@ class FirstradeInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=lambda: ("ft",))
     day1: bool = True
     fast: bool = True
+    init: str | None = "src.brokerages.firstrade_api:firstrade_init"
+    holdings: str | None = "src.brokerages.firstrade_api:firstrade_holdings"
+    transaction: str | None = "src.brokerages.firstrade_api:firstrade_transaction"
+    alive: str | None = "src.brokerages.firstrade_api:firstrade_alive"
+    init_args: tuple[str, ...] = field(default_factory=lambda: ("bot_obj", "loop"))
 
 
 @dataclass(frozen=True, slots=True)
@@ -103,6 +142,11 @@ class PublicInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=tuple[str, ...])
     day1: bool = True
     fast: bool = True
+    init: str | None = "src.brokerages.public_api:public_init"
+    holdings: str | None = "src.brokerages.public_api:public_holdings"
+    transaction: str | None = "src.brokerages.public_api:public_transaction"
+    init_args: tuple[str, ...] = field(default_factory=lambda: ("loop",))
+    max_concurrency: int = 4
 
 
 @dataclass(frozen=True, slots=True)
@@ -113,6 +157,11 @@ class RobinhoodInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=lambda: ("rh",))
     day1: bool = False
     fast: bool = True
+    init: str | None = "src.brokerages.robinhood_api:robinhood_init"
+    holdings: str | None = "src.brokerages.robinhood_api:robinhood_holdings"
+    transaction: str | None = "src.brokerages.robinhood_api:robinhood_transaction"
+    alive: str | None = "src.brokerages.robinhood_api:robinhood_alive"
+    init_args: tuple[str, ...] = field(default_factory=lambda: ("loop",))
 
 
 @dataclass(frozen=True, slots=True)
@@ -123,6 +172,9 @@ class SchwabInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=tuple[str, ...])
     day1: bool = True
     fast: bool = True
+    init: str | None = "src.brokerages.schwab_api:schwab_init"
+    holdings: str | None = "src.brokerages.schwab_api:schwab_holdings"
+    transaction: str | None = "src.brokerages.schwab_api:schwab_transaction"
 
 
 @dataclass(frozen=True, slots=True)
@@ -133,6 +185,7 @@ class SofiInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=tuple[str, ...])
     day1: bool = True
     fast: bool = False
+    run: str | None = "src.brokerages.sofi_api:sofi_run"
 
 
 @dataclass(frozen=True, slots=True)
@@ -143,6 +196,9 @@ class TastytradeInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=lambda: ("tt", "tasty"))
     day1: bool = True
     fast: bool = True
+    init: str | None = "src.brokerages.tasty_api:tastytrade_init"
+    holdings: str | None = "src.brokerages.tasty_api:tastytrade_holdings"
+    transaction: str | None = "src.brokerages.tasty_api:tastytrade_transaction"
 
 
 @dataclass(frozen=True, slots=True)
@@ -153,6 +209,10 @@ class TornadoInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=tuple[str, ...])
     day1: bool = False
     fast: bool = True
+    init: str | None = "src.brokerages.tornado_api:tornado_init"
+    holdings: str | None = "src.brokerages.tornado_api:tornado_holdings"
+    transaction: str | None = "src.brokerages.tornado_api:tornado_transaction"
+    init_args: tuple[str, ...] = field(default_factory=lambda: ("docker_mode", "loop"))
 
 
 @dataclass(frozen=True, slots=True)
@@ -163,6 +223,11 @@ class TradierInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=tuple[str, ...])
     day1: bool = True
     fast: bool = True
+    init: str | None = "src.brokerages.tradier_api:tradier_init"
+    holdings: str | None = "src.brokerages.tradier_api:tradier_holdings"
+    transaction: str | None = "src.brokerages.tradier_api:tradier_transaction"
+    alive: str | None = "src.brokerages.tradier_api:tradier_alive"
+    max_concurrency: int = 4
 
 
 @dataclass(frozen=True, slots=True)
@@ -173,6 +238,7 @@ class VanguardInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=lambda: ("vg",))
     day1: bool = False
     fast: bool = False
+    run: str | None = "src.brokerages.vanguard_api:vanguard_run"
 
 
 @dataclass(frozen=True, slots=True)
@@ -183,6 +249,10 @@ class WebullInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=lambda: ("wb",))
     day1: bool = True
     fast: bool = True
+    init: str | None = "src.brokerages.webull_api:webull_init"
+    holdings: str | None = "src.brokerages.webull_api:webull_holdings"
+    transaction: str | None = "src.brokerages.webull_api:webull_transaction"
+    alive: str | None = "src.brokerages.webull_api:webull_alive"
 
 
 @dataclass(frozen=True, slots=True)
@@ -193,6 +263,10 @@ class WellsFargoInfo(BrokerInfo):
     nicknames: tuple[str, ...] = field(default_factory=lambda: ("wf",))
     day1: bool = False
     fast: bool = False
+    init: str | None = "src.brokerages.wellsfargo_api:wellsfargo_init"
+    holdings: str | None = "src.brokerages.wellsfargo_api:wellsfargo_holdings"
+    transaction: str | None = "src.brokerages.wellsfargo_api:wellsfargo_transaction"
+    init_args: tuple[str, ...] = field(default_factory=lambda: ("bot_obj", "docker_mode", "loop"))
 
 
 class AllBrokersInfo:
@@ -3,36 +3,76 @@
 # to share between scripts
 
 import asyncio
+import contextvars
+import csv
 import datetime
-import operator
+import gzip
+import json
 import os
+import random
+import sqlite3
+import string
 import textwrap
 import traceback
-from collections.abc import Callable
+from collections.abc import Awaitable, Callable, Coroutine, Generator, Iterable, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass, replace
+from functools import partial
 from importlib.metadata import version
-from io import BytesIO
+from io import BytesIO, StringIO
+from pathlib import Path
 from queue import Queue
-from threading import Thread
-from time import sleep
-from typing import Any, Literal, TypedDict, TypeVar, cast
+from threading import Condition, Event, Lock, Thread
+from time import monotonic, perf_counter, sleep, time
+from typing import TYPE_CHECKING, Any, Literal, TypedDict, TypeVar, cast
+from urllib.parse import urlsplit
 
 import requests
-from discord.ext import commands
 from dotenv import load_dotenv
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromiumService
-from selenium.webdriver.remote.webelement import WebElement
-from selenium_stealth import stealth
+from requests.adapters import HTTPAdapter
 
-from src.brokers import BrokerInfo
+from src.brokers import AllBrokersInfo, BrokerInfo
+
+# Heavy libraries are only imported by the brokers that use them
+if TYPE_CHECKING:
+    import aiohttp
+    from discord.ext import commands
+    from selenium import webdriver
+    from selenium.webdriver.remote.webelement import WebElement
 
 load_dotenv()
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN", "")
 DISCORD_CHANNEL = os.getenv("DISCORD_CHANNEL", "")
 DISCORD_MESSAGES_URL = f"https://discord.com/api/v10/channels/{DISCORD_CHANNEL}/messages"
+DISCORD_TIMEOUT = float(os.getenv("DISCORD_TIMEOUT", "10"))  # Seconds before a Discord request gives up
+DISCORD_MAX_CONNECTIONS = int(os.getenv("DISCORD_MAX_CONNECTIONS", "4"))  # Kept-alive connections to Discord
+DISCORD_COALESCE_WINDOW = float(os.getenv("DISCORD_COALESCE_WINDOW", "1"))  # Seconds to gather status lines into one message
+DISCORD_MESSAGE_LIMIT = 2000  # Max characters in a Discord message
+DISCORD_GLOBAL_RATE = 50  # Requests per second Discord allows a bot across all routes
+DISCORD_QUEUE_SIZE = int(os.getenv("DISCORD_QUEUE_SIZE", "500"))  # Messages waiting to send before brokers are slowed down
+DISCORD_PUT_TIMEOUT = 60  # Seconds to wait on a full or stuck Discord queue
+DISCORD_DIGEST = os.getenv("DISCORD_DIGEST", "false").lower() == "true"  # One summary embed and a CSV file per run
 HEADLESS = os.getenv("HEADLESS", "true").lower() != "false"
 SORT_BROKERS = os.getenv("SORT_BROKERS", "true").lower() != "false"
+MAX_ORDER_WORKERS = int(os.getenv("MAX_ORDER_WORKERS", "0"))  # 0 means use each broker's own limit
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))  # Seconds an unused login is kept between commands
+SESSION_KEEPALIVE = float(os.getenv("SESSION_KEEPALIVE", "300"))  # Seconds between keep-alive checks (0 to disable)
+SELENIUM_TIMEOUT_SCALE = float(os.getenv("SELENIUM_TIMEOUT_SCALE", "1"))  # Multiplier for browser wait timeouts
+JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", "1")))  # Discord commands that can run at once (never on the same broker)
 CURRENT_RSA_VERSION = version("auto_rsa_bot")
+VERSION_CACHE_FILE = Path("./creds/pypi_version.json")
+LEDGER_DB = os.getenv("LEDGER_DB", "")  # SQLite file to keep the position ledger in, empty for memory only
+HOLDINGS_SNAPSHOT_DIR = Path("./creds/holdings")
+HOLDINGS_SNAPSHOTS = int(os.getenv("HOLDINGS_SNAPSHOTS", "10"))  # Snapshots kept per broker
+QUOTE_TTL = float(os.getenv("QUOTE_TTL", "5"))  # Seconds a quote is reused across accounts and brokers
+SELL_HOLDINGS_MAX_AGE = float(os.getenv("SELL_HOLDINGS_MAX_AGE", "300"))  # Seconds holdings can be trusted to skip sells (0 never skips)
+VERSION_CACHE_TTL = 24 * 60 * 60  # Seconds before asking PyPI for the latest version again
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))  # Seconds before a broker API request gives up
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))  # Extra attempts after a broker API request fails
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "10"))  # Kept-alive connections per API host
+HTTP_BACKOFF = 0.5  # Seconds before the first retry, doubled for each one after
+HTTP_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
 
 
 class EmbedFieldType(TypedDict):
@@ -57,8 +97,7 @@ class NonEmbedType(TypedDict):
     content: str
 
 
-# Create task queue
-task_queue: Queue[tuple[str | EmbedType, bool]] = Queue()
+HoldingsMode = Literal["live", "cached", "diff"]
 
 
 class StockOrder:  # noqa: PLR0904
@@ -75,10 +114,15 @@ class StockOrder:  # noqa: PLR0904
         self.__notbrokers: list[BrokerInfo] = []  # List of brokerages to not use
         self.__dry: bool = True  # Dry run mode
         self.__holdings: bool = False  # Get holdings from enabled brokerages
+        self.__holdings_mode: HoldingsMode = "live"  # Log in for holdings, use the last snapshot, or show changes
         self.__logged_in: dict[
             str,
             Brokerage,
         ] = {}  # Dict of logged in brokerage objects
+        self.__results: list[OrderResult] = []  # Outcome of every order placed
+        self.__results_lock = Lock()
+        self.__progress: dict[str, BrokerProgress] = {}  # Live Discord progress message per broker
+        self.__frozen = False  # Lists are cleaned up and no longer change, see freeze
 
     def set_action(self, action: Literal["buy", "sell"]) -> None:
         """Set the action to be performed (buy/sell)."""
@@ -128,6 +172,17 @@ class StockOrder:  # noqa: PLR0904
         """Set the logged in brokerage object for a specific broker."""
         self.__logged_in[broker] = logged_in
 
+    def add_results(self, results: "list[OrderResult]") -> None:
+        """Add the outcomes of a broker's orders."""
+        with self.__results_lock:
+            self.__results.extend(results)
+
+    def track_progress(self, broker: str, loop: asyncio.AbstractEventLoop) -> "BrokerProgress":
+        """Start a live progress message for a broker's orders."""
+        progress = BrokerProgress(broker, self.__stock, loop)
+        self.__progress[broker.lower()] = progress
+        return progress
+
     def get_action(self) -> str:
         """Get the action to be performed (buy/sell)."""
         return self.__action
@@ -160,14 +215,31 @@ class StockOrder:  # noqa: PLR0904
         """Get the dry run flag."""
         return self.__dry
 
+    def set_holdings_mode(self, mode: "HoldingsMode") -> None:
+        """Set how holdings are fetched (live, cached or diff)."""
+        self.__holdings_mode = mode
+
     def get_holdings(self) -> bool:
         """Get the holdings flag."""
         return self.__holdings
 
+    def get_holdings_mode(self) -> "HoldingsMode":
+        """Get how holdings are fetched (live, cached or diff)."""
+        return self.__holdings_mode
+
     def get_logged_in(self, broker: str) -> "Brokerage":
         """Get the logged in brokerage object for a specific broker."""
         return self.__logged_in[broker]
 
+    def get_progress(self, broker: str) -> "BrokerProgress | None":
+        """Get a broker's live progress message, if it has one."""
+        return self.__progress.get(broker.lower())
+
+    def get_results(self) -> "list[OrderResult]":
+        """Get the outcomes of every order placed so far."""
+        with self.__results_lock:
+            return list(self.__results)
+
     def de_dupe(self) -> None:
         """Remove duplicate entries from lists."""
         self.__stock = list(dict.fromkeys(self.__stock))
@@ -200,6 +272,9 @@ class StockOrder:  # noqa: PLR0904
         if len(self.__logged_in) == 0 and not pre_login:
             msg = "Logged In must be set"
             raise ValueError(msg)
+        # Broker threads share a frozen order, so its lists must not be rebuilt or sorted under them
+        if self.__frozen:
+            return None
         # Clean up lists
         self.de_dupe()
         self.alphabetize()
@@ -209,6 +284,11 @@ class StockOrder:  # noqa: PLR0904
                 self.__brokers.remove(b)
         return None
 
+    def freeze(self) -> None:
+        """Clean up the lists one last time before brokers run in parallel. After this, order_validate only checks the order."""
+        self.order_validate(pre_login=True)
+        self.__frozen = True
+
     def __str__(self) -> str:
         """Return a string representation of the order."""
         return f"Self: \n \
@@ -227,8 +307,222 @@ class StockOrder:  # noqa: PLR0904
 T = TypeVar("T")
 
 
+@dataclass(frozen=True, slots=True)
+class Position:
+    """One holding in an account."""
+
+    quantity: float
+    price: float
+    total: float
+
+    def as_dict(self) -> dict[str, float]:
+        """Get the position in the dict form print_all_holdings and the brokers use."""
+        return {"quantity": self.quantity, "price": self.price, "total": self.total}
+
+
+@dataclass(frozen=True, slots=True)
+class LedgerEntry:
+    """A position in the cross-broker ledger."""
+
+    broker: str
+    login: str
+    account: str
+    ticker: str
+    quantity: float
+    price: float
+    total: float
+    updated: float  # Unix time
+
+
+LedgerKey = tuple[str, str, str, str]  # (broker, login, account, ticker)
+
+
+class PositionLedger:
+    """Every position seen across all brokers, indexed by ticker, broker and account.
+
+    Each holdings run reports the brokerage here once it finishes, replacing the broker's old
+    positions. Orders placed since then are applied as they go through. With a database path
+    the ledger is also kept in SQLite, so it survives restarts and can be queried directly.
+    """
+
+    def __init__(self, db_path: str = LEDGER_DB) -> None:
+        """Initialize the ledger, loading it from db_path if given."""
+        self.__entries: dict[LedgerKey, LedgerEntry] = {}
+        self.__by_ticker: dict[str, set[LedgerKey]] = {}
+        self.__by_broker: dict[str, set[LedgerKey]] = {}
+        self.__by_account: dict[tuple[str, str], set[LedgerKey]] = {}
+        self.__reported: dict[str, float] = {}  # When each broker last reported holdings
+        self.__accounts: dict[str, set[tuple[str, str]]] = {}  # (login, account) pairs whose holdings loaded in each broker's last report
+        self.__lock = Lock()
+        self.__db: sqlite3.Connection | None = None
+        if db_path:
+            self._open(db_path)
+
+    def _open(self, db_path: str) -> None:
+        try:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit (reports open their own transaction), with WAL so writes don't wait on the disk
+            self.__db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self.__db.executescript(
+                """
+                PRAGMA journal_mode = WAL;
+                PRAGMA synchronous = NORMAL;
+                CREATE TABLE IF NOT EXISTS positions (
+                    broker TEXT, login TEXT, account TEXT, ticker TEXT,
+                    quantity REAL, price REAL, total REAL, updated REAL,
+                    PRIMARY KEY (broker, login, account, ticker)
+                );
+                CREATE INDEX IF NOT EXISTS positions_ticker ON positions (ticker);
+                CREATE INDEX IF NOT EXISTS positions_account ON positions (broker, account);
+                """,
+            )
+            for row in self.__db.execute("SELECT broker, login, account, ticker, quantity, price, total, updated FROM positions"):
+                entry = LedgerEntry(*row)
+                self._add(entry)
+                self.__accounts.setdefault(entry.broker, set()).add((entry.login, entry.account))
+                self.__reported[entry.broker] = max(self.__reported.get(entry.broker, 0.0), entry.updated)
+        except sqlite3.Error as e:
+            print(f"Error opening position ledger {db_path}, keeping it in memory only: {e}")
+            self.__db = None
+
+    def _add(self, entry: LedgerEntry) -> LedgerKey:
+        key = (entry.broker, entry.login, entry.account, entry.ticker)
+        self.__entries[key] = entry
+        self.__by_ticker.setdefault(entry.ticker, set()).add(key)
+        self.__by_broker.setdefault(entry.broker, set()).add(key)
+        self.__by_account.setdefault((entry.broker, entry.account), set()).add(key)
+        return key
+
+    @staticmethod
+    def _unindex(index: dict[Any, set[LedgerKey]], index_key: object, key: LedgerKey) -> None:
+        keys = index[index_key]
+        keys.discard(key)
+        if not keys:
+            del index[index_key]
+
+    def _remove(self, key: LedgerKey) -> None:
+        entry = self.__entries.pop(key)
+        self._unindex(self.__by_ticker, entry.ticker, key)
+        self._unindex(self.__by_broker, entry.broker, key)
+        self._unindex(self.__by_account, (entry.broker, entry.account), key)
+
+    def report(self, broker_obj: "Brokerage", taken: float | None = None) -> None:
+        """Replace everything a broker reported before with its current holdings, in one transaction.
+
+        Pass taken (Unix time) when the holdings are older than now, like a saved snapshot. A
+        report older than the one the ledger already has is ignored.
+        """
+        broker = broker_obj.get_name().lower()
+        taken = time() if taken is None else taken
+        accounts = {(key, account) for key in broker_obj.get_account_numbers() for account in broker_obj.get_account_numbers(key) if broker_obj.get_holdings_loaded(key, account)}
+        entries = [LedgerEntry(broker, key, account, stock.upper(), position.quantity, position.price, position.total, taken) for key, account in accounts for stock, position in broker_obj.get_positions(key, account).items()]
+        with self.__lock:
+            if taken < self.__reported.get(broker, 0.0):
+                return
+            self.__reported[broker] = taken
+            self.__accounts[broker] = accounts
+            for key in list(self.__by_broker.get(broker, ())):
+                self._remove(key)
+            for entry in entries:
+                self._add(entry)
+            if self.__db is not None:
+                try:
+                    with self.__db:
+                        self.__db.execute("BEGIN")
+                        self.__db.execute("DELETE FROM positions WHERE broker = ?", (broker,))
+                        self.__db.executemany("INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [self._row(entry) for entry in entries])
+                except sqlite3.Error as e:
+                    print(f"Error saving {broker_obj.get_name()} positions to the ledger: {e}")
+
+    @staticmethod
+    def _row(entry: LedgerEntry) -> tuple[str, str, str, str, float, float, float, float]:
+        return (entry.broker, entry.login, entry.account, entry.ticker, entry.quantity, entry.price, entry.total, entry.updated)
+
+    def _write(self, entry: LedgerEntry) -> None:
+        if self.__db is not None:
+            self.__db.execute("INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._row(entry))
+
+    def adjust(self, broker: str, login: str, account: str, ticker: str, shares: float) -> None:
+        """Apply an order placed since the broker last reported holdings, so its positions stay current."""
+        broker = broker.lower()
+        key = (broker, login, account, ticker.upper())
+        with self.__lock:
+            if broker not in self.__reported:
+                return
+            old = self.__entries.get(key)
+            if old is not None:
+                self._remove(key)
+                if self.__db is not None:
+                    self.__db.execute("DELETE FROM positions WHERE broker = ? AND login = ? AND account = ? AND ticker = ?", key)
+            quantity = (old.quantity if old is not None else 0.0) + shares
+            if quantity > 0:
+                price = old.price if old is not None else 0.0
+                self._write(self.__entries[self._add(LedgerEntry(broker, login, account, key[3], quantity, price, round(quantity * price, 2), time()))])
+
+    def reported_at(self, broker: str) -> float | None:
+        """When a broker last reported holdings (Unix time), or None if it never has."""
+        return self.__reported.get(broker.lower())
+
+    def holds(self, broker: str, login: str, account: str, ticker: str, max_age: float) -> bool | None:
+        """Whether an account holds ticker, or None if that isn't known.
+
+        Unknown means the broker hasn't reported holdings within max_age seconds, or the
+        account's holdings didn't load in its last report (or it was added since). An account
+        that loaded with no positions is known to be empty.
+        """
+        broker = broker.lower()
+        with self.__lock:
+            reported = self.__reported.get(broker)
+            if max_age <= 0 or reported is None or time() - reported > max_age or (login, account) not in self.__accounts.get(broker, ()):
+                return None
+        return any(entry.quantity > 0 for entry in self.positions(ticker=ticker, broker=broker, account=account) if entry.login == login)
+
+    def positions(self, ticker: str | None = None, broker: str | None = None, account: str | None = None) -> list[LedgerEntry]:
+        """Get positions matching every filter given, using the narrowest index."""
+        with self.__lock:
+            candidates: list[set[LedgerKey]] = []
+            if ticker is not None:
+                candidates.append(self.__by_ticker.get(ticker.upper(), set()))
+            if broker is not None:
+                if account is not None:
+                    candidates.append(self.__by_account.get((broker.lower(), account), set()))
+                candidates.append(self.__by_broker.get(broker.lower(), set()))
+            keys = min(candidates, key=len) if candidates else self.__entries.keys()
+            entries = [self.__entries[key] for key in keys]
+        return sorted(
+            (entry for entry in entries if (ticker is None or entry.ticker == ticker.upper()) and (broker is None or entry.broker == broker.lower()) and (account is None or entry.account == account)),
+            key=lambda entry: (entry.ticker, entry.broker, entry.login, entry.account),
+        )
+
+    def total_shares(self, ticker: str) -> float:
+        """Total shares of ticker held across every broker."""
+        return sum(entry.quantity for entry in self.positions(ticker=ticker))
+
+    def totals_by_ticker(self) -> dict[str, tuple[float, float]]:
+        """Shares and value of every ticker held, summed across all brokers."""
+        totals: dict[str, tuple[float, float]] = {}
+        for entry in self.positions():
+            quantity, value = totals.get(entry.ticker, (0.0, 0.0))
+            totals[entry.ticker] = (quantity + entry.quantity, value + entry.total)
+        return totals
+
+    def totals_by_broker(self) -> dict[str, float]:
+        """Value of every position held at each broker."""
+        totals: dict[str, float] = {}
+        for entry in self.positions():
+            totals[entry.broker] = totals.get(entry.broker, 0.0) + entry.total
+        return totals
+
+
+position_ledger = PositionLedger()
+
+
 class Brokerage:
-    """Object representing all logins and accounts at a brokerage."""
+    """Object representing all logins and accounts at a brokerage.
+
+    Positions and account totals are stored as they arrive; sorting and summing is left
+    to the getters, so filling an account with many positions stays linear.
+    """
 
     def __init__(self, name: str) -> None:
         """Initialize a brokerage."""
@@ -241,8 +535,9 @@ class Brokerage:
             str,
             Any,
         ] = {}  # Dictionary of logged in objects under parent
-        self.__holdings: dict = {}  # Dictionary of holdings under parent
-        self.__account_totals: dict = {}  # Dictionary of account totals
+        self.__holdings: dict[str, dict[str, dict[str, Position]]] = {}  # Positions by parent, then account, then stock
+        self.__holdings_loaded: set[tuple[str, str]] = set()  # (parent, account) pairs whose holdings loaded, even if empty
+        self.__account_totals: dict[str, dict[str, float]] = {}  # Account totals by parent
         self.__account_types: dict = {}  # Dictionary of account types
 
     def set_name(self, name: str) -> None:
@@ -282,22 +577,16 @@ class Brokerage:
             quantity = 0
         if isinstance(price, str) and price.lower() == "n/a":
             price = 0
-        if parent_name not in self.__holdings:
-            self.__holdings[parent_name] = {}
-        if account_name not in self.__holdings[parent_name]:
-            self.__holdings[parent_name][account_name] = {}
-        self.__holdings[parent_name][account_name][stock] = {
-            "quantity": float(quantity),
-            "price": round(float(price), 2),
-            "total": round(float(quantity) * float(price), 2),
-        }
-        # Alphabetize by stock
-        self.__holdings[parent_name][account_name] = dict(
-            sorted(
-                self.__holdings[parent_name][account_name].items(),
-                key=operator.itemgetter(0),
-            ),
+        position = Position(
+            quantity=float(quantity),
+            price=round(float(price), 2),
+            total=round(float(quantity) * float(price), 2),
         )
+        self.__holdings.setdefault(parent_name, {}).setdefault(account_name, {})[stock] = position
+
+    def set_holdings_loaded(self, parent_name: str, account_name: str) -> None:
+        """Mark an account's holdings as loaded, so having no positions means it is empty."""
+        self.__holdings_loaded.add((parent_name, account_name))
 
     def set_account_totals(
         self,
@@ -308,10 +597,7 @@ class Brokerage:
         """Set the account totals for a specific account."""
         if isinstance(total, str):
             total = total.replace(",", "").replace("$", "").strip()
-        if parent_name not in self.__account_totals:
-            self.__account_totals[parent_name] = {}
-        self.__account_totals[parent_name][account_name] = round(float(total), 2)
-        self.__account_totals[parent_name]["total"] = sum(value for key, value in self.__account_totals[parent_name].items() if key != "total")
+        self.__account_totals.setdefault(parent_name, {})[account_name] = round(float(total), 2)
 
     def set_account_type(
         self,
@@ -324,6 +610,11 @@ class Brokerage:
             self.__account_types[parent_name] = {}
         self.__account_types[parent_name][account_name] = account_type
 
+    def clear_holdings(self) -> None:
+        """Clear the holdings so a reused brokerage starts fresh."""
+        self.__holdings = {}
+        self.__holdings_loaded = set()
+
     def get_name(self) -> str:
         """Get the name of the brokerage."""
         return self.__name
@@ -346,28 +637,36 @@ class Brokerage:
             return self.__logged_in_objects.get(parent_name, {})
         return self.__logged_in_objects.get(parent_name, {}).get(account_name, {})
 
+    def get_positions(self, parent_name: str, account_name: str) -> dict[str, Position]:
+        """Get the positions in an account as stored, in the order they were set."""
+        return self.__holdings.get(parent_name, {}).get(account_name, {})
+
+    def get_holdings_loaded(self, parent_name: str, account_name: str) -> bool:
+        """Whether an account's holdings are known, because they loaded or it has positions."""
+        return (parent_name, account_name) in self.__holdings_loaded or account_name in self.__holdings.get(parent_name, {})
+
     def get_holdings(
         self,
         parent_name: str | None = None,
         account_name: str | None = None,
     ) -> dict:
-        """Get the holdings for a specific account."""
+        """Get the holdings for a specific account, alphabetized by stock."""
         if parent_name is None:
-            return self.__holdings
+            return {parent: self.get_holdings(parent) for parent in self.__holdings}
         if account_name is None:
-            return self.__holdings.get(parent_name, {})
-        return self.__holdings.get(parent_name, {}).get(account_name, {})
+            return {account: self.get_holdings(parent_name, account) for account in self.__holdings.get(parent_name, {})}
+        positions = self.get_positions(parent_name, account_name)
+        return {stock: positions[stock].as_dict() for stock in sorted(positions)}
 
-    def get_account_totals(
-        self,
-        parent_name: str | None = None,
-        account_name: str | None = None,
-    ) -> dict:
-        """Get the account totals for a specific account."""
+    def get_account_totals(self, parent_name: str | None = None) -> dict:
+        """Get the account totals for a parent. Totals for a parent include the sum of its accounts under "total"."""
         if parent_name is None:
-            return self.__account_totals
-        if account_name is None:
-            return self.__account_totals.get(parent_name, {})
+            return {parent: self.get_account_totals(parent) for parent in self.__account_totals}
+        totals = self.__account_totals.get(parent_name, {})
+        return {**totals, "total": sum(totals.values())} if totals else {}
+
+    def get_account_total(self, parent_name: str, account_name: str) -> float:
+        """Get the total for a single account."""
         return self.__account_totals.get(parent_name, {}).get(account_name, 0)
 
     def get_account_types(
@@ -402,13 +701,18 @@ class ThreadHandler:
         self.func = func
         self.args = args
         self.kwargs = kwargs
-        self.queue: Queue[tuple[Any | None, str | None]] = Queue()
-        self.thread = Thread(target=self._run)
+        self.queue: Queue[tuple[Any | None, str | BrokerCancelled | None]] = Queue()
+        # Run in a copy of the caller's context so the broker's worker slot goes with it
+        self.context = contextvars.copy_context()
+        self.thread = Thread(target=self._run, daemon=True)
 
     def _run(self) -> None:
         try:
-            result = self.func(*self.args, **self.kwargs)
+            result = self.context.run(self.func, *self.args, **self.kwargs)
             self.queue.put((result, None))
+        except BrokerCancelled as e:
+            # Kept as is so the caller stops the broker like any other cancel
+            self.queue.put((None, e))
         except Exception as e:
             traceback.print_exc()
             self.queue.put((None, str(e)))
@@ -417,31 +721,735 @@ class ThreadHandler:
         """Start the thread."""
         self.thread.start()
 
-    def join(self) -> None:
-        """Wait for the thread to finish."""
-        self.thread.join()
+    def join(self, timeout: float | None = None) -> bool:
+        """Wait for the thread to finish, returning False if it is still running after timeout."""
+        self.thread.join(timeout)
+        return not self.thread.is_alive()
 
     def get_result(self) -> tuple[Any | None, str | None]:
-        """Get the result from the thread."""
-        return self.queue.get()
+        """Get the result from the thread, raising BrokerCancelled if that is what stopped it."""
+        result, err = self.queue.get()
+        if isinstance(err, BrokerCancelled):
+            raise err
+        return result, err
+
+
+class BrokerSlots:
+    """Limits how many brokers work at once.
+
+    Brokers start in ticket order. A broker waiting on a human (OTP code,
+    captcha) parks and gives its slot to the next broker. Once its input
+    arrives it takes a slot back straight away, going over the limit until
+    enough brokers finish, so the code doesn't expire while it waits its turn.
+    """
+
+    def __init__(self, size: int) -> None:
+        """Initialize the broker slots."""
+        self.__free = max(1, size)
+        self.__next_ticket = 0
+        self.__condition = Condition()
+
+    def acquire(self, ticket: int) -> None:
+        """Wait for a free slot and this broker's turn to start."""
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__free > 0 and self.__next_ticket == ticket)
+            self.__next_ticket += 1
+            self.__free -= 1
+            self.__condition.notify_all()
+
+    def reclaim(self) -> None:
+        """Take a slot back for a parked broker without waiting, even if none are free."""
+        with self.__condition:
+            self.__free -= 1
+
+    def release(self) -> None:
+        """Give a slot back."""
+        with self.__condition:
+            self.__free += 1
+            self.__condition.notify_all()
+
+    @contextmanager
+    def held(self, ticket: int) -> Generator[None]:
+        """Hold a slot for the current broker."""
+        self.acquire(ticket)
+        token = broker_slots.set(self)
+        try:
+            yield
+        finally:
+            broker_slots.reset(token)
+            self.release()
+
+    @contextmanager
+    def parked(self) -> Generator[None]:
+        """Give up the slot while waiting, then take it back."""
+        self.release()
+        try:
+            yield
+        finally:
+            self.reclaim()
+
+
+# Slots of the broker running in the current thread, if any
+broker_slots: contextvars.ContextVar[BrokerSlots | None] = contextvars.ContextVar("broker_slots", default=None)
+# Monotonic time the broker running in the current thread has to be done by, if any
+broker_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("broker_deadline", default=None)
+# Set when the command the current thread is working for is cancelled with !cancel
+job_cancel: contextvars.ContextVar[Event | None] = contextvars.ContextVar("job_cancel", default=None)
+
+
+class BrokerCancelled(BaseException):
+    """Raised when a broker runs past its time budget or its command is cancelled.
+
+    A BaseException so the broad except Exception blocks in broker code don't swallow it.
+    """
+
+
+def time_left() -> float | None:
+    """Seconds left in the current broker's budget, or None if it has no deadline."""
+    deadline = broker_deadline.get()
+    return None if deadline is None else deadline - monotonic()
+
+
+def check_cancelled() -> None:
+    """Stop the current broker if it is out of time or cancelled. Call between accounts."""
+    cancel = job_cancel.get()
+    if cancel is not None and cancel.is_set():
+        msg = "Stopped by !cancel"
+        raise BrokerCancelled(msg)
+    remaining = time_left()
+    if remaining is not None and remaining <= 0:
+        msg = "Ran out of time"
+        raise BrokerCancelled(msg)
+
+
+@contextmanager
+def close_on_cancel(broker_obj: Brokerage, close: Callable[[Any], object]) -> Generator[None]:
+    """Call close on every login's session if the broker is stopped partway, so no browser is left running."""
+    try:
+        yield
+    except BrokerCancelled:
+        for key in broker_obj.get_account_numbers():
+            with suppress(Exception):
+                close(broker_obj.get_logged_in_objects(key))
+        raise
+
+
+def wait_timeout(seconds: float) -> float:
+    """Get a browser wait timeout, scaled by SELENIUM_TIMEOUT_SCALE and capped by the broker's remaining time."""
+    seconds *= SELENIUM_TIMEOUT_SCALE
+    remaining = time_left()
+    if remaining is not None:
+        seconds = min(seconds, remaining)
+    return max(1.0, seconds)
+
+
+def wait_for_discord[T](coro: Coroutine[Any, Any, T], loop: asyncio.AbstractEventLoop) -> T:
+    """Run a Discord prompt (OTP code, captcha) on the bot's loop and wait for the answer.
+
+    The broker's worker slot is parked while it waits, so other brokers keep going.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    slots = broker_slots.get()
+    if slots is None:
+        return future.result()
+    with slots.parked():
+        return future.result()
+
+
+@dataclass(slots=True)
+class PooledSession:
+    """A logged in brokerage waiting in the session pool."""
+
+    brokerage: Brokerage
+    check: Callable[[Brokerage], bool]
+    last_used: float
+
+
+class QuoteCache:
+    """Quotes shared by every broker thread for QUOTE_TTL seconds.
+
+    Keyed by (source, symbol), since each broker fetches quotes its own way. While one
+    thread is fetching a quote, others asking for the same one wait for its answer
+    instead of fetching it again. Failed fetches (errors or None) aren't kept.
+    """
+
+    def __init__(self, ttl: float = QUOTE_TTL) -> None:
+        """Initialize an empty cache."""
+        self.ttl = ttl
+        self.__quotes: dict[tuple[str, str], tuple[float, Any]] = {}
+        self.__fetching: dict[tuple[str, str], Future[Any]] = {}
+        self.__lock = Lock()
+        # Counters
+        self.hits = 0
+        self.fetches = 0
+
+    def _claim(self, key: tuple[str, str]) -> tuple[bool, Future[Any]]:
+        """Return whether the caller has to fetch the quote, and the future that has (or will have) it."""
+        with self.__lock:
+            cached = self.__quotes.get(key)
+            if cached is not None and monotonic() - cached[0] < self.ttl:
+                self.hits += 1
+                done: Future[Any] = Future()
+                done.set_result(cached[1])
+                return False, done
+            future = self.__fetching.get(key)
+            if future is not None:
+                self.hits += 1
+                return False, future
+            self.fetches += 1
+            future = self.__fetching[key] = Future()
+            return True, future
+
+    def _settle(self, key: tuple[str, str], future: Future[Any], value: Any = None, error: BaseException | None = None) -> None:  # noqa: ANN401
+        with self.__lock:
+            if error is None and value is not None:
+                self.__quotes[key] = (monotonic(), value)
+            del self.__fetching[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+
+    def get(self, source: str, symbol: str, fetch: Callable[[str], T]) -> T:
+        """Get a quote for symbol from source, calling fetch(symbol) if it isn't cached."""
+        key = (source, symbol.upper())
+        leader, future = self._claim(key)
+        if not leader:
+            return future.result()
+        try:
+            value = fetch(symbol)
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, value)
+        return value
+
+    async def aget(self, source: str, symbol: str, fetch: Callable[[str], Awaitable[T]]) -> T:
+        """Get a quote like get, for brokers whose fetch is a coroutine."""
+        key = (source, symbol.upper())
+        leader, future = self._claim(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            value = await fetch(symbol)
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, value)
+        return value
+
+
+quote_cache = QuoteCache()
+
+
+@dataclass(slots=True)
+class HttpStats:
+    """Request counters for one broker."""
+
+    requests: int = 0
+    retries: int = 0
+    errors: int = 0
+    latency: float = 0.0  # Seconds spent waiting on responses
+    sent: int = 0  # Request body bytes
+    received: int = 0  # Response body bytes
+
+
+class HttpTransport:
+    """Keep-alive HTTP sessions shared by every broker thread, one per host, with retries and per-broker stats.
+
+    Only idempotent requests are retried after a timeout or server error. Anything else is
+    only retried when the server said it was rate limited, so an order can't be placed twice.
+    """
+
+    def __init__(self, timeout: float = HTTP_TIMEOUT, retries: int = HTTP_RETRIES, max_connections: int = HTTP_MAX_CONNECTIONS) -> None:
+        """Initialize with no open sessions."""
+        self.timeout = timeout
+        self.retries = retries
+        self.__max_connections = max_connections
+        self.__sessions: dict[str, requests.Session] = {}
+        self.__stats: dict[str, HttpStats] = {}
+        self.__lock = Lock()
+
+    def _session(self, host: str) -> requests.Session:
+        with self.__lock:
+            session = self.__sessions.get(host)
+            if session is None:
+                session = self.__sessions[host] = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.__max_connections)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+            return session
+
+    def _record(self, broker: str, *, latency: float, response: requests.Response | None = None, retry: bool = False) -> None:
+        with self.__lock:
+            stats = self.__stats.setdefault(broker, HttpStats())
+            stats.requests += 1
+            stats.latency += latency
+            stats.retries += retry
+            if response is None or not response.ok:
+                stats.errors += 1
+            if response is not None:
+                body = response.request.body
+                stats.sent += len(body) if body is not None else 0
+                stats.received += len(response.content)
+
+    @staticmethod
+    def _backoff(attempt: int, response: requests.Response | None = None) -> None:
+        """Wait before retrying, using the server's Retry-After when it gives one."""
+        try:
+            delay = float(response.headers["Retry-After"]) if response is not None else None
+        except (KeyError, ValueError):
+            delay = None
+        if delay is None:
+            # Full jitter, so threads that failed together don't retry together
+            delay = random.uniform(0, HTTP_BACKOFF * 2**attempt)  # noqa: S311
+        remaining = time_left()
+        if remaining is not None:
+            delay = min(delay, max(remaining, 0))
+        sleep(delay)
+
+    def request(self, method: str, url: str, *, broker: str, **kwargs: Any) -> requests.Response:  # noqa: ANN401
+        """Send a request for broker, retrying failures. Raises the last error if every attempt fails."""
+        session = self._session(urlsplit(url).netloc)
+        idempotent = method.upper() in {"GET", "HEAD", "OPTIONS"}
+        timeout = kwargs.pop("timeout", self.timeout)
+        attempt = 0
+        while True:
+            check_cancelled()
+            remaining = time_left()
+            started = perf_counter()
+            try:
+                response = session.request(method, url, timeout=timeout if remaining is None else max(1.0, min(timeout, remaining)), **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(broker, latency=perf_counter() - started, retry=attempt > 0)
+                if not idempotent or attempt >= self.retries:
+                    raise
+                self._backoff(attempt)
+            else:
+                self._record(broker, latency=perf_counter() - started, response=response, retry=attempt > 0)
+                retryable = response.status_code == 429 or (idempotent and response.status_code in HTTP_RETRY_STATUSES)  # noqa: PLR2004
+                if not retryable or attempt >= self.retries:
+                    return response
+                self._backoff(attempt, response)
+            attempt += 1
+
+    def get(self, url: str, *, broker: str, **kwargs: Any) -> requests.Response:  # noqa: ANN401
+        """Send a GET request for broker."""
+        return self.request("GET", url, broker=broker, **kwargs)
+
+    def post(self, url: str, *, broker: str, **kwargs: Any) -> requests.Response:  # noqa: ANN401
+        """Send a POST request for broker."""
+        return self.request("POST", url, broker=broker, **kwargs)
+
+    def stats(self) -> dict[str, HttpStats]:
+        """Get a copy of each broker's counters."""
+        with self.__lock:
+            return {broker: replace(stats) for broker, stats in self.__stats.items()}
+
+    def summary(self) -> list[str]:
+        """Summarize each broker's requests, one line per broker."""
+        return [f"{broker}: {stats.requests} requests ({stats.retries} retries, {stats.errors} errors), avg {stats.latency / stats.requests * 1000:.0f}ms, {stats.sent / 1024:.1f}KB sent, {stats.received / 1024:.1f}KB received" for broker, stats in sorted(self.stats().items()) if stats.requests]
+
+    def close(self) -> None:
+        """Close every pooled session."""
+        with self.__lock:
+            sessions = list(self.__sessions.values())
+            self.__sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+http_transport = HttpTransport()
+
+
+class SessionPool:
+    """Logged in brokerages kept warm between Discord commands.
+
+    A session is checked out for the length of a command, so two commands never share a login.
+    The keep-alive thread leaves a broker alone while a command is using it, even with a fresh
+    login, since some broker libraries (robin_stocks) keep a single global session.
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL, keepalive: float = SESSION_KEEPALIVE) -> None:
+        """Initialize the session pool."""
+        self.ttl = ttl
+        self.keepalive = keepalive
+        self.__sessions: dict[str, PooledSession] = {}
+        self.__in_use: set[str] = set()  # Brokers a command has checked out, until it checks them back in
+        self.__checking: set[str] = set()  # Brokers the keep-alive thread is checking right now
+        self.__lock = Lock()
+        self.__checked = Condition(self.__lock)
+        self.__stop = Event()
+        self.__thread: Thread | None = None
+
+    @staticmethod
+    def _is_alive(broker: str, session: PooledSession) -> bool:
+        try:
+            return session.check(session.brokerage)
+        except Exception as e:
+            print(f"{broker}: Session check failed: {e}")
+            return False
+
+    def checkout(self, broker: str) -> Brokerage | None:
+        """Take a live session out of the pool, or None if the broker needs to log in again."""
+        with self.__checked:
+            # Don't log in again while the keep-alive thread is still using the old session
+            self.__checked.wait_for(lambda: broker not in self.__checking)
+            self.__in_use.add(broker)
+            session = self.__sessions.pop(broker, None)
+        if session is None:
+            return None
+        # Checked after taking it out, so a slow broker doesn't hold up the rest of the pool
+        if monotonic() - session.last_used > self.ttl or not self._is_alive(broker, session):
+            print(f"{broker}: Session expired, logging in again...")
+            return None
+        print(f"{broker}: Reusing logged in session")
+        session.brokerage.clear_holdings()
+        return session.brokerage
+
+    def checkin(self, broker: str, brokerage: Brokerage, check: Callable[[Brokerage], bool]) -> None:
+        """Return a session to the pool once a command is done with it."""
+        with self.__lock:
+            self.__in_use.discard(broker)
+            self.__sessions[broker] = PooledSession(brokerage, check, monotonic())
+        if self.__thread is None and self.keepalive > 0:
+            self.__thread = Thread(target=self._keepalive, name="session-keepalive", daemon=True)
+            self.__thread.start()
+
+    def _keepalive(self) -> None:
+        """Ping idle sessions so they stay logged in, dropping any that expire."""
+        while not self.__stop.wait(self.keepalive):
+            with self.__lock:
+                brokers = list(self.__sessions)
+            for broker in brokers:
+                # Take each session out while it is checked, so a command can't use it at the same time
+                with self.__lock:
+                    if broker in self.__in_use:
+                        continue
+                    session = self.__sessions.pop(broker, None)
+                    if session is None:
+                        continue
+                    self.__checking.add(broker)
+                alive = False
+                try:
+                    if monotonic() - session.last_used > self.ttl:
+                        print(f"{broker}: Session unused for {int(self.ttl)} seconds, dropping")
+                    else:
+                        alive = self._is_alive(broker, session)
+                        if not alive:
+                            print(f"{broker}: Session no longer valid, dropping")
+                finally:
+                    with self.__checked:
+                        self.__checking.discard(broker)
+                        if alive and not self.__stop.is_set():
+                            self.__sessions.setdefault(broker, session)
+                        self.__checked.notify_all()
+
+    def close(self) -> None:
+        """Stop the keep-alive thread and forget all sessions."""
+        self.__stop.set()
+        with self.__lock:
+            self.__sessions.clear()
+
+
+JobState = Literal["queued", "running", "done", "failed", "cancelled"]
+
+
+@dataclass(slots=True)
+class CommandJob:
+    """A Discord command waiting for or running in the job scheduler."""
+
+    id: int
+    description: str
+    brokers: frozenset[str]
+    run: Callable[[Event], Mapping[str, Future[Any]] | None]  # Returns the brokers still running when it gave up on them
+    priority: int
+    cancel: Event
+    future: Future[None]
+    state: JobState = "queued"
+    queued_at: float = 0.0
+    started_at: float | None = None
+
+
+class JobScheduler:
+    """Runs Discord commands one after another on its own threads.
+
+    Jobs start in priority order, then in the order they were sent. Up to max_workers can
+    run at once, but never two on the same broker: a job waits until every broker it
+    uses is free, and later jobs can't jump ahead of it on those brokers. A broker a job
+    left still running stays busy until it has really stopped.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS) -> None:
+        """Initialize the scheduler."""
+        self.max_workers = max_workers
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.__lock = Lock()
+        self.__next_id = 1
+        self.__waiting: list[CommandJob] = []
+        self.__running: dict[int, CommandJob] = {}
+        self.__busy: set[str] = set()
+        self.__lingering: set[str] = set()  # Brokers still running after their job finished
+
+    def submit(self, description: str, brokers: list[str], run: Callable[[Event], Mapping[str, Future[Any]] | None], priority: int = 0) -> CommandJob:
+        """Queue run(cancel_event) to use brokers. Lower priorities run first.
+
+        run can return futures for brokers it left running, which are held until they finish.
+        """
+        with self.__lock:
+            job = CommandJob(self.__next_id, description, frozenset(brokers), run, priority, Event(), Future(), queued_at=monotonic())
+            self.__next_id += 1
+            self.__waiting.append(job)
+            self.__waiting.sort(key=lambda waiting: (waiting.priority, waiting.id))
+        self._start_ready()
+        return job
+
+    def _start_ready(self) -> None:
+        with self.__lock:
+            blocked: set[str] = set()
+            for job in list(self.__waiting):
+                if len(self.__running) >= self.max_workers:
+                    break
+                if job.brokers & (self.__busy | blocked):
+                    # Hold its brokers for it so later jobs don't starve it
+                    blocked |= job.brokers
+                    continue
+                self.__waiting.remove(job)
+                self.__running[job.id] = job
+                self.__busy |= job.brokers
+                job.state = "running"
+                job.started_at = monotonic()
+                self.__executor.submit(self._run, job)
+
+    def _run(self, job: CommandJob) -> None:
+        still_running: Mapping[str, Future[Any]] = {}
+        try:
+            still_running = job.run(job.cancel) or {}
+        except BaseException as e:
+            job.state = "failed"
+            job.future.set_exception(e)
+        else:
+            job.state = "cancelled" if job.cancel.is_set() else "done"
+            job.future.set_result(None)
+        finally:
+            with self.__lock:
+                del self.__running[job.id]
+                self.__busy -= job.brokers - still_running.keys()
+                self.__lingering |= still_running.keys()
+            for broker, future in still_running.items():
+                future.add_done_callback(partial(self._release, broker))
+            self._start_ready()
+
+    def _release(self, broker: str, _future: Future[Any]) -> None:
+        """Free a broker left running by a finished job once it has stopped."""
+        with self.__lock:
+            self.__busy.discard(broker)
+            self.__lingering.discard(broker)
+        self._start_ready()
+
+    def cancel(self, job_id: int | None = None) -> list[CommandJob]:
+        """Cancel one job (or all of them if job_id is None), returning the jobs cancelled.
+
+        Queued jobs are dropped. Running jobs stop each broker at its next check between accounts.
+        """
+        with self.__lock:
+            jobs = [job for job in [*self.__running.values(), *self.__waiting] if job_id is None or job.id == job_id]
+            for job in jobs:
+                job.cancel.set()
+                if job.state == "queued":
+                    self.__waiting.remove(job)
+                    job.state = "cancelled"
+                    job.future.set_result(None)
+        return jobs
+
+    def status(self) -> list[str]:
+        """Describe every running and queued job."""
+        with self.__lock:
+            lines = [f"#{job.id} running for {int(monotonic() - (job.started_at or job.queued_at))}s: {job.description}" + (" (cancelling)" if job.cancel.is_set() else "") for job in self.__running.values()]
+            lines.extend(f"#{job.id} queued for {int(monotonic() - job.queued_at)}s: {job.description}" for job in self.__waiting)
+            lines.extend(f"{broker.capitalize()} still stopping from an earlier job" for broker in sorted(self.__lingering))
+        return lines
+
+    def shutdown(self) -> None:
+        """Cancel every job and stop taking new ones."""
+        self.cancel()
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+
+@dataclass(frozen=True, slots=True)
+class OrderJob:
+    """A single order to place for one ticker in one account."""
+
+    ticker: str
+    login: str
+    account: str
+
+
+OrderStatus = Literal["placed", "dry", "failed", "skipped"]
+
+
+@dataclass(frozen=True, slots=True)
+class OrderResult:
+    """Outcome of a single order in one account."""
+
+    broker: str
+    login: str
+    account: str  # Masked
+    ticker: str
+    side: str
+    quantity: float
+    status: OrderStatus
+    latency: float  # Seconds
+    error: str | None = None
+
+
+def order_result(  # noqa: PLR0913, PLR0917
+    broker_obj: Brokerage,
+    order_obj: StockOrder,
+    login: str,
+    account: str,
+    ticker: str,
+    started: float,
+    *,
+    error: str | Exception | None = None,
+    skipped: bool = False,
+    quantity: float | None = None,
+) -> OrderResult:
+    """Record how an order went, timed from started (a perf_counter() reading), and update the broker's progress message."""
+    status: OrderStatus
+    if error is not None:
+        status = "failed"
+    elif skipped:
+        status = "skipped"
+    else:
+        status = "dry" if order_obj.get_dry() else "placed"
+    result = OrderResult(
+        broker=broker_obj.get_name(),
+        login=login,
+        account=mask_string(account),
+        ticker=ticker.upper(),
+        side=order_obj.get_action(),
+        quantity=order_obj.get_amount() if quantity is None else quantity,
+        status=status,
+        latency=perf_counter() - started,
+        error=None if error is None else str(error),
+    )
+    progress = order_obj.get_progress(result.broker)
+    if progress is not None:
+        progress.report(result)
+    if status == "placed":
+        position_ledger.adjust(result.broker, login, account, ticker, result.quantity if result.side == "buy" else -result.quantity)
+    return result
+
+
+def skip_sell(broker_obj: Brokerage, order_obj: StockOrder, login: str, account: str, ticker: str) -> bool:
+    """Whether a sell can be skipped because recent holdings show the account doesn't hold ticker.
+
+    Only skips when the holdings are certain (see PositionLedger.holds) and newer than SELL_HOLDINGS_MAX_AGE.
+    """
+    if order_obj.get_action() != "sell" or position_ledger.holds(broker_obj.get_name(), login, account, ticker, SELL_HOLDINGS_MAX_AGE) is not False:
+        return False
+    reported = position_ledger.reported_at(broker_obj.get_name()) or 0.0
+    print(f"{login} {mask_string(account)}: No {ticker.upper()} in holdings from {format_age(time() - reported)} ago, skipping sell")
+    return True
+
+
+def build_order_jobs(broker_obj: Brokerage, order_obj: StockOrder) -> tuple[list[OrderJob], list[OrderResult]]:
+    """Expand an order into one job per (ticker, login, account) for a brokerage, ticker first.
+
+    Sells in accounts that don't hold the ticker are left out, and get a skipped result instead.
+    """
+    jobs: list[OrderJob] = []
+    skipped: list[OrderResult] = []
+    for ticker in order_obj.get_stocks():
+        for key in broker_obj.get_account_numbers():
+            for account in broker_obj.get_account_numbers(key):
+                if skip_sell(broker_obj, order_obj, key, account, ticker):
+                    skipped.append(order_result(broker_obj, order_obj, key, account, ticker, perf_counter(), skipped=True))
+                else:
+                    jobs.append(OrderJob(ticker, key, account))
+    return jobs, skipped
 
 
-def is_up_to_date() -> None:
-    """Check if the current version is up to date."""
-    response = requests.get("https://pypi.org/pypi/auto_rsa_bot/json", timeout=10)
+def dispatch_orders(
+    broker_obj: Brokerage,
+    order_obj: StockOrder,
+    jobs: list[OrderJob],
+    handler: Callable[[OrderJob], OrderResult],
+    max_workers: int = 1,
+) -> list[OrderResult]:
+    """Run handler for each job with at most max_workers at once, returning results in job order.
+
+    A job that raises is logged and given a failed result so one bad account doesn't stop the rest.
+    """
+    if MAX_ORDER_WORKERS > 0:
+        max_workers = min(max_workers, MAX_ORDER_WORKERS)
+    max_workers = max(1, min(max_workers, len(jobs)))
+
+    deadline = broker_deadline.get()
+    cancel = job_cancel.get()
+
+    def _run_job(job: OrderJob) -> OrderResult:
+        # Pool threads don't inherit the broker's context, so carry its deadline over
+        broker_deadline.set(deadline)
+        job_cancel.set(cancel)
+        check_cancelled()
+        started = perf_counter()
+        try:
+            return handler(job)
+        except Exception as e:
+            print(f"{job.login} {mask_string(job.account)}: Error placing order for {job.ticker}: {e}")
+            print(traceback.format_exc())
+            return order_result(broker_obj, order_obj, job.login, job.account, job.ticker, started, error=e)
+
+    # Don't bother with threads if only one job can run at a time
+    if max_workers == 1:
+        return [_run_job(job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{broker_obj.get_name()}-orders") as executor:
+        return list(executor.map(_run_job, jobs))
+
+
+def _latest_pypi_version() -> str | None:
+    """Get the latest version on PyPI, using the cached answer if it is recent enough."""
+    try:
+        cached = json.loads(VERSION_CACHE_FILE.read_text(encoding="utf-8"))
+        if time() - cached["checked"] < VERSION_CACHE_TTL:
+            return cached["version"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    response = http_transport.get("https://pypi.org/pypi/auto_rsa_bot/json", broker="PyPI")
     if not response.ok:
         print(f"Error checking for update: {response.status_code}")
+        return None
+    latest: str = response.json()["info"]["version"]
+    VERSION_CACHE_FILE.parent.mkdir(exist_ok=True)
+    VERSION_CACHE_FILE.write_text(json.dumps({"checked": time(), "version": latest}), encoding="utf-8")
+    return latest
+
+
+def _check_for_update() -> None:
+    try:
+        latest = _latest_pypi_version()
+    except Exception as e:
+        print(f"Error checking for update: {e}")
+        return
+    if latest is None:
         return
-    version: str = response.json()["info"]["version"]
-    parts = version.split(".")
+    parts = latest.split(".")
     if (int(parts[0]), int(parts[1]), int(parts[2])) > tuple(
         map(int, CURRENT_RSA_VERSION.split(".")),
     ):
-        print(f"Error: A new version of auto_rsa_bot is available ({version}). Please update to the latest version.")
-        return
+        print(f"Error: A new version of auto_rsa_bot is available ({latest}). Please update to the latest version.")
+
 
+def is_up_to_date() -> Thread:
+    """Check if the current version is up to date in the background, so startup doesn't wait on PyPI."""
+    thread = Thread(target=_check_for_update, name="version-check", daemon=True)
+    thread.start()
+    return thread
 
-def type_slowly(element: WebElement, string: str, delay: float = 0.3) -> None:
+
+def type_slowly(element: "WebElement", string: str, delay: float = 0.3) -> None:
     """Type text into a web element slowly."""
     # Type slower
     for character in string:
@@ -449,14 +1457,18 @@ def type_slowly(element: WebElement, string: str, delay: float = 0.3) -> None:
         sleep(delay)
 
 
-def check_if_page_loaded(driver: webdriver.Chrome) -> bool:
+def check_if_page_loaded(driver: "webdriver.Chrome") -> bool:
     """Check if the page is fully loaded."""
     readystate = str(driver.execute_script("return document.readyState;"))
     return readystate == "complete"
 
 
-def get_selenium_driver(*, docker_mode: bool = False) -> webdriver.Chrome | None:
+def get_selenium_driver(*, docker_mode: bool = False) -> "webdriver.Chrome | None":
     """Initialize a Selenium WebDriver."""
+    from selenium import webdriver  # noqa: PLC0415
+    from selenium.webdriver.chrome.service import Service as ChromiumService  # noqa: PLC0415
+    from selenium_stealth import stealth  # noqa: PLC0415
+
     # Init webdriver options
     try:
         options = webdriver.ChromeOptions()
@@ -492,6 +1504,8 @@ def get_selenium_driver(*, docker_mode: bool = False) -> webdriver.Chrome | None
 
 def kill_all_selenium_drivers(broker_obj: Brokerage) -> None:
     """Kill all selenium drivers on the given brokerage object."""
+    from selenium import webdriver  # noqa: PLC0415
+
     count = 0
     if broker_obj is not None:
         for key in broker_obj.get_account_numbers():
@@ -541,17 +1555,181 @@ def split_embed(embed: EmbedType) -> list[EmbedType]:
     return chunks
 
 
+@dataclass(slots=True)
+class RateLimitBucket:
+    """What Discord last said about one rate limit bucket."""
+
+    remaining: int = 1
+    reset_at: float = 0.0  # monotonic() time the bucket refills
+
+
+class DiscordRateLimiter:
+    """Schedules Discord requests from the X-RateLimit-* headers, per route bucket and globally.
+
+    Only used from the bot's loop, and acquire() takes its slot without awaiting in between,
+    so no lock is needed.
+    """
+
+    def __init__(self, global_rate: int = DISCORD_GLOBAL_RATE) -> None:
+        """Initialize with no known buckets."""
+        self.__global_rate = global_rate
+        self.__routes: dict[str, str] = {}  # Route -> bucket hash from Discord
+        self.__buckets: dict[str, RateLimitBucket] = {}  # Bucket hash (or route until known) -> bucket
+        self.__global_reset = 0.0
+        self.__window_start = 0.0
+        self.__window_count = 0
+
+    def _bucket(self, route: str) -> RateLimitBucket:
+        key = self.__routes.get(route, route)
+        return self.__buckets.setdefault(key, RateLimitBucket())
+
+    async def acquire(self, route: str) -> None:
+        """Wait until a request on route is allowed, then take its slot."""
+        while True:
+            now = monotonic()
+            bucket = self._bucket(route)
+            if bucket.reset_at <= now:
+                # Bucket refilled; the next response tells us the real numbers
+                bucket.remaining = max(bucket.remaining, 1)
+            if now - self.__window_start >= 1:
+                self.__window_start = now
+                self.__window_count = 0
+            wait = max(
+                self.__global_reset - now,
+                bucket.reset_at - now if bucket.remaining <= 0 else 0,
+                self.__window_start + 1 - now if self.__window_count >= self.__global_rate else 0,
+            )
+            if wait <= 0:
+                bucket.remaining -= 1
+                self.__window_count += 1
+                return
+            await asyncio.sleep(wait)
+
+    def update(self, route: str, status: int, headers: "Mapping[str, str]", retry_after: float | None = None) -> None:
+        """Record the limits from a response to a request on route."""
+        now = monotonic()
+        bucket_hash = headers.get("X-RateLimit-Bucket")
+        if bucket_hash is not None and self.__routes.get(route) != bucket_hash:
+            # Carry what we knew about the route over to its real bucket
+            provisional = self.__buckets.pop(route, None)
+            self.__buckets.setdefault(bucket_hash, provisional or RateLimitBucket())
+            self.__routes[route] = bucket_hash
+        bucket = self._bucket(route)
+        if "X-RateLimit-Remaining" in headers:
+            bucket.remaining = int(headers["X-RateLimit-Remaining"])
+        if "X-RateLimit-Reset-After" in headers:
+            bucket.reset_at = now + float(headers["X-RateLimit-Reset-After"])
+        if status == 429 and retry_after is not None:  # noqa: PLR2004
+            if headers.get("X-RateLimit-Global", "").lower() == "true":
+                self.__global_reset = now + retry_after
+            else:
+                bucket.remaining = 0
+                bucket.reset_at = max(bucket.reset_at, now + retry_after)
+
+
+class DiscordSender:
+    """Sends to the Discord channel over one pooled, keep-alive HTTP session on the bot's loop."""
+
+    def __init__(self, url: str = DISCORD_MESSAGES_URL, token: str = DISCORD_TOKEN) -> None:
+        """Initialize the sender. The session is opened on first use so it belongs to the running loop."""
+        self.__url = url
+        self.__token = token
+        self.__session: aiohttp.ClientSession | None = None
+        self.limiter = DiscordRateLimiter()
+        # Throughput counters
+        self.messages = 0
+        self.requests = 0
+        self.send_time = 0.0
+
+    def _session(self) -> "aiohttp.ClientSession":
+        # aiohttp comes with discord.py, so only load it once the bot is sending
+        import aiohttp  # noqa: PLC0415
+
+        if self.__session is None or self.__session.closed:
+            self.__session = aiohttp.ClientSession(
+                headers={"Authorization": f"Bot {self.__token}"},
+                timeout=aiohttp.ClientTimeout(total=DISCORD_TIMEOUT),
+                connector=aiohttp.TCPConnector(limit=DISCORD_MAX_CONNECTIONS, keepalive_timeout=60),
+            )
+        return self.__session
+
+    async def post(self, payload: dict[str, Any] | None = None, file: tuple[str, bytes, str] | None = None) -> bool:
+        """Post a JSON payload and/or a (filename, data, content type) file, retrying on rate limits."""
+        return await self.send("POST", self.__url, payload, file) is not None
+
+    async def create(self, payload: dict[str, Any]) -> str | None:
+        """Post a message and return its ID so it can be edited later."""
+        message = await self.send("POST", self.__url, payload)
+        return None if message is None else str(message["id"])
+
+    async def edit(self, message_id: str, payload: dict[str, Any]) -> bool:
+        """Edit a message this bot posted."""
+        return await self.send("PATCH", f"{self.__url}/{message_id}", payload, route=f"PATCH {self.__url}/{{message_id}}") is not None
+
+    async def send(
+        self,
+        method: Literal["POST", "PATCH"],
+        url: str,
+        payload: dict[str, Any] | None = None,
+        file: tuple[str, bytes, str] | None = None,
+        *,
+        route: str | None = None,
+    ) -> dict[str, Any] | None:
+        """Send a request, retrying on rate limits, and return the message Discord sends back (None on failure)."""
+        import aiohttp  # noqa: PLC0415
+
+        session = self._session()
+        route = route or f"{method} {url}"
+        while True:
+            # Form data can only be sent once, so build it fresh for every attempt
+            data: aiohttp.FormData | None = None
+            if file is not None:
+                data = aiohttp.FormData()
+                if payload is not None:
+                    data.add_field("payload_json", json.dumps(payload), content_type="application/json")
+                data.add_field("files[0]", file[1], filename=file[0], content_type=file[2])
+            await self.limiter.acquire(route)
+            started = perf_counter()
+            try:
+                async with session.request(method, url, json=payload if data is None else None, data=data) as response:
+                    self.requests += 1
+                    if response.status == 429:  # noqa: PLR2004
+                        # Try again once the limiter says the bucket has refilled
+                        self.limiter.update(route, response.status, response.headers, (await response.json())["retry_after"])
+                        continue
+                    self.limiter.update(route, response.status, response.headers)
+                    if response.ok:
+                        self.messages += 1
+                        return await response.json()
+                    print(f"Error: {response.status}: {await response.text()}")
+                    return None
+            except (aiohttp.ClientError, TimeoutError) as e:
+                print(f"Error Sending Message: {e}")
+                return None
+            finally:
+                self.send_time += perf_counter() - started
+
+    def throughput(self) -> str:
+        """Summarize how fast messages have been going out."""
+        rate = self.messages / self.send_time if self.send_time else 0.0
+        return f"Discord: {self.messages} messages in {self.requests} requests, {self.send_time:.1f}s sending ({rate:.1f} messages/s)"
+
+    async def close(self) -> None:
+        """Close the pooled session."""
+        if self.__session is not None and not self.__session.closed:
+            await self.__session.close()
+        self.__session = None
+
+
+discord_sender = DiscordSender()
+
+
 async def process_discord_messages(
     message: EmbedType | str,
     *,
     embed: bool = False,
 ) -> None:
     """Send messages to Discord."""
-    # Send message to discord via request post
-    headers = {
-        "Authorization": f"Bot {DISCORD_TOKEN}",
-        "Content-Type": "application/json",
-    }
     # Split into chunks if needed
     full_embed = split_embed(cast("EmbedType", message)) if embed else cast("NonEmbedType", [{"content": message, "embeds": []}])
     for embed_chunk in full_embed:
@@ -559,29 +1737,266 @@ async def process_discord_messages(
             "content": "" if embed else message,
             "embeds": [embed_chunk] if embed else [],
         }
-        # Keep trying until success
-        success = False
-        while success is False:
+        await discord_sender.post(payload)
+
+
+@dataclass(frozen=True, slots=True)
+class DiscordFile:
+    """An embed sent with a file attached, in one request."""
+
+    embed: EmbedType
+    filename: str
+    data: bytes
+    content_type: str = "application/gzip"
+
+
+async def process_discord_file(message: DiscordFile) -> None:
+    """Send an embed with its file, attaching the file to the last chunk if the embed has to be split."""
+    chunks = split_embed(message.embed)
+    for embed_chunk in chunks[:-1]:
+        await discord_sender.post({"content": "", "embeds": [embed_chunk]})
+    await discord_sender.post({"content": "", "embeds": chunks[-1:]}, file=(message.filename, message.data, message.content_type))
+
+
+class LineCoalescer:
+    """Packs status lines into as few Discord messages as fit under the length limit."""
+
+    def __init__(self, limit: int = DISCORD_MESSAGE_LIMIT) -> None:
+        """Initialize an empty buffer."""
+        self.__limit = limit
+        self.__lines: list[str] = []
+        self.__length = 0
+        self.__started = 0.0
+
+    def add(self, line: str) -> list[str]:
+        """Buffer a line, returning any messages that are now full."""
+        full: list[str] = []
+        # A line that is too long on its own is split across messages
+        for piece in [line[i : i + self.__limit] for i in range(0, len(line), self.__limit)] or [""]:
+            if self.__lines and self.__length + 1 + len(piece) > self.__limit:
+                full.extend(self.flush())
+            if not self.__lines:
+                self.__started = monotonic()
+                self.__length = len(piece)
+            else:
+                self.__length += 1 + len(piece)
+            self.__lines.append(piece)
+        return full
+
+    def flush(self) -> list[str]:
+        """Return whatever is buffered as one message and empty the buffer."""
+        if not self.__lines:
+            return []
+        message = "\n".join(self.__lines)
+        self.__lines = []
+        self.__length = 0
+        return [message]
+
+    def waiting(self) -> float | None:
+        """Seconds the oldest buffered line has waited, or None if nothing is buffered."""
+        return monotonic() - self.__started if self.__lines else None
+
+
+def is_urgent(message: str) -> bool:
+    """Whether a status line should go out without waiting for more lines."""
+    return "error" in message.lower()
+
+
+class BrokerProgress:
+    """One Discord message per broker, edited in place as its accounts finish their orders."""
+
+    def __init__(self, broker: str, tickers: list[str], loop: asyncio.AbstractEventLoop) -> None:
+        """Initialize progress for a broker placing an order for each of tickers."""
+        self.broker = broker
+        self.loop = loop
+        self.__tickers = len(tickers)
+        self.__rows: dict[tuple[str, str], list[OrderResult]] = {}
+        self.__finished = False
+        self.__message_id: str | None = None
+        self.__queued = False
+        self.__lock = Lock()
+
+    def start(self, accounts: dict[str, list[str]]) -> None:
+        """List every account that will be ordered in, before any orders go out."""
+        with self.__lock:
+            for login, login_accounts in accounts.items():
+                for account in login_accounts:
+                    self.__rows.setdefault((login, mask_string(account)), [])
+        self._changed()
+
+    def report(self, result: OrderResult) -> None:
+        """Record an order outcome against its account."""
+        with self.__lock:
+            self.__rows.setdefault((result.login, result.account), []).append(result)
+        self._changed()
+
+    def finish(self) -> None:
+        """Mark the broker as done."""
+        with self.__lock:
+            self.__finished = True
+        self._changed()
+
+    def _changed(self) -> None:
+        # Only one edit waits in the queue at a time, later changes are folded into it
+        with self.__lock:
+            if self.__queued:
+                return
+            self.__queued = True
+        get_discord_consumer(self.loop).put(self, embed=True, flush=False)
+
+    def render(self) -> EmbedType:
+        """Build the progress embed, one field of account rows per login."""
+        with self.__lock:
+            self.__queued = False
+            rows = {key: list(results) for key, results in self.__rows.items()}
+            finished = self.__finished
+        done_accounts = sum(1 for results in rows.values() if len(results) >= self.__tickers)
+        status = f"{done_accounts}/{len(rows)} accounts done" + ("" if finished else "...") if rows else ("no orders placed" if finished else "logging in...")
+        title = f"{self.broker.capitalize()}: {status}"
+        embed: EmbedType = {
+            "title": title,
+            "color": 3066993 if finished else 16776960,
+            "fields": [],
+        }
+        by_login: dict[str, list[str]] = {}
+        for (login, account), results in rows.items():
+            failed = sum(1 for result in results if result.status == "failed")
+            if failed:
+                state = f"{failed} failed"
+            elif len(results) >= self.__tickers:
+                state = "done"
+            else:
+                state = "stopped" if finished else "working"
+            by_login.setdefault(login, []).append(f"{account:<8} {len(results)}/{self.__tickers} {state}")
+        # An edit can't be split across messages, so keep inside one embed's limits
+        for login, lines in list(by_login.items())[:25]:
+            table = ""
+            for index, line in enumerate(lines):
+                if len(table) + len(line) > 990:  # noqa: PLR2004
+                    table += f"...and {len(lines) - index} more\n"
+                    break
+                table += line + "\n"
+            if total_embed_length(embed) + len(login) + len(table) > 5900:  # noqa: PLR2004
+                break
+            embed["fields"].append({"name": login, "inline": True, "value": f"```\n{table}```"})
+        return embed
+
+    async def sync(self) -> None:
+        """Post the progress message the first time, then edit it."""
+        payload = {"content": "", "embeds": [self.render()]}
+        if self.__message_id is None:
+            self.__message_id = await discord_sender.create(payload)
+        elif not await discord_sender.edit(self.__message_id, payload):
+            # Message was deleted or can't be edited, start a new one
+            self.__message_id = await discord_sender.create(payload)
+
+
+class DiscordConsumer:
+    """The one task that sends everything print_and_discord queues on a bot loop.
+
+    The queue is bounded: threads that get ahead of Discord wait for room, which slows a
+    chatty broker down instead of letting output pile up. Code already on the loop can't
+    wait (it would block the consumer too), so it queues through a task instead.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int = DISCORD_QUEUE_SIZE) -> None:
+        """Start the consumer on loop."""
+        self.loop = loop
+        self.queue: asyncio.Queue[tuple[str | EmbedType | BrokerProgress | DiscordFile, bool, bool]] = asyncio.Queue(maxsize)
+        self.__pending = 0  # Queue items sitting in the coalescer, not yet marked done
+        self.task = asyncio.run_coroutine_threadsafe(self._run(), loop)
+
+    def put(self, message: str | EmbedType | BrokerProgress | DiscordFile, *, embed: bool, flush: bool) -> None:
+        """Queue a message from any thread."""
+        item = (message, embed, flush)
+        try:
+            on_loop = asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
             try:
-                response = requests.post(  # noqa: ASYNC210
-                    DISCORD_MESSAGES_URL,
-                    headers=headers,
-                    json=payload,
-                    timeout=10,
-                )
-                # Process response
-                if response.ok:
-                    success = True
-                elif response.status_code == 429:  # noqa: PLR2004
-                    rate_limit = response.json()["retry_after"] * 2
-                    await asyncio.sleep(rate_limit)
+                self.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                # Waiting puts are served in order, so this still lands behind earlier messages
+                self.loop.create_task(self.queue.put(item))
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop).result(DISCORD_PUT_TIMEOUT)
+        except TimeoutError:
+            print("Discord queue is stuck, message only printed to console")
+
+    async def _send(self, coalescer: LineCoalescer) -> None:
+        try:
+            for text in coalescer.flush():
+                await process_discord_messages(text)
+        finally:
+            for _ in range(self.__pending):
+                self.queue.task_done()
+            self.__pending = 0
+
+    async def _run(self) -> None:
+        coalescer = LineCoalescer()
+        while True:
+            waiting = coalescer.waiting()
+            try:
+                if waiting is None:
+                    message, embed, flush = await self.queue.get()
                 else:
-                    print(f"Error: {response.status_code}: {response.text}")
-                    break
+                    message, embed, flush = await asyncio.wait_for(self.queue.get(), max(0, DISCORD_COALESCE_WINDOW - waiting))
+            except TimeoutError:
+                await self._send(coalescer)
+                continue
+            try:
+                if embed:
+                    # Keep order: anything buffered goes out before the embed
+                    await self._send(coalescer)
+                    try:
+                        if isinstance(message, BrokerProgress):
+                            await message.sync()
+                        elif isinstance(message, DiscordFile):
+                            await process_discord_file(message)
+                        else:
+                            await process_discord_messages(message, embed=True)
+                    finally:
+                        self.queue.task_done()
+                    continue
+                message = str(message)
+                self.__pending += 1
+                for text in coalescer.add(message):
+                    await process_discord_messages(text)
+                if flush or is_urgent(message):
+                    await self._send(coalescer)
             except Exception as e:
+                # Never let one bad message stop the consumer
                 print(f"Error Sending Message: {e}")
-                break
-        await asyncio.sleep(0.5)
+                print(traceback.format_exc())
+
+    async def drain(self) -> None:
+        """Wait until everything queued so far has been sent, for up to DISCORD_PUT_TIMEOUT seconds."""
+        try:
+            await asyncio.wait_for(self.queue.join(), DISCORD_PUT_TIMEOUT)
+        except TimeoutError:
+            print(f"Gave up waiting for {self.queue.qsize()} Discord messages to send")
+
+
+discord_consumers: dict[asyncio.AbstractEventLoop, DiscordConsumer] = {}
+discord_consumers_lock = Lock()
+
+
+def get_discord_consumer(loop: asyncio.AbstractEventLoop) -> DiscordConsumer:
+    """Get the consumer for a bot loop, starting it the first time."""
+    with discord_consumers_lock:
+        consumer = discord_consumers.get(loop)
+        if consumer is None:
+            consumer = discord_consumers[loop] = DiscordConsumer(loop)
+        return consumer
+
+
+async def drain_discord() -> None:
+    """Send everything still queued for the running bot loop (call before restarting or exiting)."""
+    consumer = discord_consumers.get(asyncio.get_running_loop())
+    if consumer is not None:
+        await consumer.drain()
 
 
 def print_and_discord(
@@ -589,121 +2004,171 @@ def print_and_discord(
     loop: asyncio.AbstractEventLoop | None = None,
     *,
     embed: bool = False,
+    flush: bool = False,
 ) -> None:
-    """Print message to console and send over Discord."""
+    """Print message to console and send over Discord.
+
+    Lines are gathered for DISCORD_COALESCE_WINDOW seconds and sent together; flush sends
+    straight away (along with anything already waiting), as do errors and embeds.
+    """
     # Print message
     if not embed:
         print(message)
     # Add message to discord queue
     if loop is not None:
-        task_queue.put((message, embed))
-        if task_queue.qsize() == 1:
-            asyncio.run_coroutine_threadsafe(process_queue(), loop)
+        get_discord_consumer(loop).put(message, embed=embed, flush=flush)
+
+
+class PendingInput:
+    """A login waiting on a reply from Discord."""
+
+    def __init__(self, name: str) -> None:
+        """Initialize a waiter for name (e.g. "Fidelity 1")."""
+        self.name = name
+        letters = name.rstrip(string.digits).strip()
+        self.index = name[len(letters) :].strip()
+        self.letters = "".join(c for c in letters.lower() if c.isalnum())
+        broker = AllBrokersInfo().parse_input(self.letters)
+        self.nicknames = broker.nicknames if broker is not None else ()
+        self.key = f"{self.nicknames[0] if self.nicknames else self.letters}{self.index}"
+        self.prompt_id: str | None = None
+        self.replies: asyncio.Queue[str] = asyncio.Queue()
+
+    def matches(self, token: str) -> bool:
+        """Whether a reply starting with token (like fid1, fidelity1 or fide1) is meant for this login."""
+        token = token.lower()
+        letters = token.rstrip(string.digits)
+        if token[len(letters) :] != self.index or not letters:
+            return False
+        return letters == self.letters or letters in self.nicknames or (len(letters) >= 3 and self.letters.startswith(letters))  # noqa: PLR2004
+
+
+class DiscordInputRouter:
+    """Hands replies in the channel to the login that asked for them, so several can wait at once.
+
+    A reply goes to the login whose prompt it replies to, or whose name it starts with
+    ("fid1 123456"). Anything else goes to the only waiting login, if there is just one.
+    Only touched from the bot's loop, so it needs no locking.
+    """
+
+    def __init__(self) -> None:
+        """Initialize with nothing waiting."""
+        self.__pending: list[PendingInput] = []
+
+    @contextmanager
+    def expect(self, name: str) -> Generator[PendingInput]:
+        """Wait for replies for name while inside the block.
 
+        Yields:
+            The waiting login, whose replies queue gets the answers meant for it.
 
-async def process_queue() -> None:
-    """Process the discord queue."""
-    while not task_queue.empty():
-        message, embed = task_queue.get()
-        await process_discord_messages(message, embed=embed)
-        task_queue.task_done()
+        """
+        pending = PendingInput(name)
+        self.__pending.append(pending)
+        try:
+            yield pending
+        finally:
+            self.__pending.remove(pending)
+
+    async def prompt(self, pending: PendingInput, text: str) -> None:
+        """Ask for input, after anything already queued, remembering the message so it can be replied to."""
+        print(text)
+        await drain_discord()
+        if len(self.__pending) > 1:
+            text += f"\nOther logins are waiting too: reply to this message or start with `{pending.key}`"
+        pending.prompt_id = await discord_sender.create({"content": text, "embeds": []})
+
+    def route(self, content: str, reply_to: int | None = None) -> bool:
+        """Pass a message to the login it's meant for, returning False if it isn't for any of them."""
+        if not self.__pending or content.startswith("!"):
+            return False
+        target = next((pending for pending in self.__pending if reply_to is not None and pending.prompt_id == str(reply_to)), None)
+        answer = content.strip()
+        if target is None:
+            first, _, rest = answer.partition(" ")
+            matches = [pending for pending in self.__pending if pending.matches(first)]
+            if len(matches) == 1 and rest.strip():
+                target, answer = matches[0], rest.strip()
+        if target is None:
+            if len(self.__pending) > 1:
+                keys = ", ".join(f"`{pending.key}` ({pending.name})" for pending in self.__pending)
+                print_and_discord(f"Several logins are waiting, start your reply with one of {keys} or reply to its prompt", asyncio.get_running_loop(), flush=True)
+                return True
+            target = self.__pending[0]
+        target.replies.put_nowait(answer)
+        return True
+
+
+input_router = DiscordInputRouter()
 
 
 async def get_otp_from_discord(
-    bot_obj: commands.Bot,
+    bot_obj: "commands.Bot",  # noqa: ARG001
     broker_name: str,
     code_len: int = 6,
     timeout: int = 60,  # noqa: ASYNC109
     loop: asyncio.AbstractEventLoop | None = None,
 ) -> str | None:
-    """Wait for a user-input OTP code from Discord."""
+    """Wait for a user-input OTP code from Discord, routed by input_router."""
     print_and_discord(f"{broker_name} requires OTP code", loop)
-    print_and_discord(
-        f"Please enter OTP code or type cancel within {timeout} seconds",
-        loop,
-    )
-    # Get OTP code from Discord
-    while True:
-        try:
-            code = await bot_obj.wait_for(
-                "message",
-                # Ignore bot messages and messages not in the correct channel
-                check=lambda m: m.author != bot_obj.user and m.channel.id == int(os.environ["DISCORD_CHANNEL"]),
-                timeout=timeout,
-            )
-        except TimeoutError:
-            print_and_discord(
-                f"Timed out waiting for OTP code input for {broker_name}",
-                loop,
-            )
-            return None
-        if code.content.lower() == "cancel":
-            print_and_discord(f"Cancelling OTP code for {broker_name}", loop)
-            return None
-        try:
-            # Check if code is numbers only
-            int(code.content)
-        except ValueError:
-            print_and_discord("OTP code must be numbers only", loop)
-            continue
-        # Check if code is correct length
-        if len(code.content) != code_len:
-            print_and_discord(f"OTP code must be {code_len} digits", loop)
-            continue
-        return str(code.content)
+    with input_router.expect(broker_name) as pending:
+        await input_router.prompt(pending, f"Please enter OTP code for {broker_name} or type cancel within {timeout} seconds")
+        # Get OTP code from Discord
+        while True:
+            try:
+                code = await asyncio.wait_for(pending.replies.get(), timeout)
+            except TimeoutError:
+                print_and_discord(
+                    f"Timed out waiting for OTP code input for {broker_name}",
+                    loop,
+                )
+                return None
+            if code.lower() == "cancel":
+                print_and_discord(f"Cancelling OTP code for {broker_name}", loop)
+                return None
+            try:
+                # Check if code is numbers only
+                int(code)
+            except ValueError:
+                print_and_discord(f"{broker_name}: OTP code must be numbers only", loop)
+                continue
+            # Check if code is correct length
+            if len(code) != code_len:
+                print_and_discord(f"{broker_name}: OTP code must be {code_len} digits", loop)
+                continue
+            return code
 
 
 async def get_input_from_discord(
-    bot_obj: commands.Bot,
+    bot_obj: "commands.Bot",  # noqa: ARG001
     prompt: str,
     timeout: int = 60,  # noqa: ASYNC109
     loop: asyncio.AbstractEventLoop | None = None,
+    name: str | None = None,
 ) -> str | None:
-    """Wait for user input from Discord."""
+    """Wait for user input from Discord, routed by input_router to the login called name."""
     print_and_discord(prompt, loop)
-    print_and_discord(
-        f"Please enter the input or type cancel within {timeout} seconds",
-        loop,
-    )
-    try:
-        code = await bot_obj.wait_for(
-            "message",
-            check=lambda m: m.author != bot_obj.user and m.channel.id == int(DISCORD_CHANNEL),
-            timeout=timeout,
-        )
-    except TimeoutError:
-        print_and_discord("Timed out waiting for input", loop)
-        return None
-    if code.content.lower() == "cancel":
+    with input_router.expect(name or prompt) as pending:
+        await input_router.prompt(pending, f"Please enter the input{f' for {name}' if name else ''} or type cancel within {timeout} seconds")
+        try:
+            code = await asyncio.wait_for(pending.replies.get(), timeout)
+        except TimeoutError:
+            print_and_discord("Timed out waiting for input", loop)
+            return None
+    if code.lower() == "cancel":
         print_and_discord("Input canceled by user", loop)
         return None
-    return str(code.content)
+    return code
 
 
-async def send_captcha_to_discord(file: BytesIO) -> None:
-    """Send CAPTCHA image to Discord."""
-    headers = {
-        "Authorization": f"Bot {DISCORD_TOKEN}",
+def send_captcha_to_discord(file: BytesIO, name: str, loop: asyncio.AbstractEventLoop) -> None:
+    """Queue a login's CAPTCHA image, captioned with the key to reply with, so it goes out just before its input prompt."""
+    embed: EmbedType = {
+        "title": f"{name} CAPTCHA",
+        "color": 3447003,
+        "fields": [{"name": "Reply", "value": f"Start your answer with `{PendingInput(name).key}` or reply to the prompt below", "inline": False}],
     }
-    files = {"file": ("captcha.png", file, "image/png")}
-    success = False
-    while not success:
-        response = requests.post(  # noqa: ASYNC210
-            DISCORD_MESSAGES_URL,
-            headers=headers,
-            files=files,
-            timeout=10,
-        )
-        if response.ok:
-            success = True
-        elif response.status_code == 429:  # noqa: PLR2004
-            rate_limit = response.json()["retry_after"] * 2
-            await asyncio.sleep(rate_limit)
-        else:
-            print(
-                f"Error sending CAPTCHA image: {response.status_code}: {response.text}",
-            )
-            break
+    get_discord_consumer(loop).put(DiscordFile(embed, "captcha.png", file.getvalue(), "image/png"), embed=True, flush=False)
 
 
 def mask_string(string: str, num_visible: int = 4) -> str:
@@ -719,15 +2184,17 @@ def print_all_holdings(
     loop: asyncio.AbstractEventLoop | None = None,
     *,
     mask_account_number: bool = True,
+    taken: float | None = None,
 ) -> None:
-    """Format and display holdings information."""
+    """Format and display holdings information. Pass taken (Unix time) when showing a saved snapshot."""
+    title = f"{broker_obj.get_name()} Holdings" + ("" if taken is None else f" (saved {format_age(time() - taken)} ago)")
     embed: EmbedType = {
-        "title": f"{broker_obj.get_name()} Holdings",
+        "title": title,
         "color": 3447003,
         "fields": [],
     }
     print(
-        f"\n==============================\n{broker_obj.get_name()} Holdings\n==============================",
+        f"\n==============================\n{title}\n==============================",
     )
     for key in broker_obj.get_account_numbers():
         for account in broker_obj.get_account_numbers(key):
@@ -748,7 +2215,7 @@ def print_all_holdings(
                     price = holdings[stock]["price"]
                     total = holdings[stock]["total"]
                     print_string += f"{stock}: {quantity} @ ${format(price, '0.2f')} = ${format(total, '0.2f')}\n"
-            print_string += f"Total: ${format(broker_obj.get_account_totals(key, account), '0.2f')}\n"
+            print_string += f"Total: ${format(broker_obj.get_account_total(key, account), '0.2f')}\n"
             print(print_string)
             # If somehow longer than 1024, chop and add ...
             max_length = 1024
@@ -756,10 +2223,286 @@ def print_all_holdings(
                 print_string[:1020] + "..." if len(print_string) > max_length else print_string,
             )
             embed["fields"].append(field)
+    # Digest mode sends every holding in one file at the end of the run instead, and diff mode only sends changes
+    if not DISCORD_DIGEST and holdings_report.get():
+        print_and_discord(embed, loop, embed=True)
+    print("==============================")
+
+
+def format_age(seconds: float) -> str:
+    """Format a number of seconds like 2d 3h, 3h 12m or 45s."""
+    seconds = int(max(0, seconds))
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m {seconds}s" if minutes else f"{seconds}s"
+
+
+# False while a broker's holdings are only being compared with the last snapshot (diff mode)
+holdings_report: contextvars.ContextVar[bool] = contextvars.ContextVar("holdings_report", default=True)
+
+
+@dataclass(frozen=True, slots=True)
+class HoldingsSnapshot:
+    """A broker's holdings as they were at the end of one holdings run."""
+
+    broker: str
+    taken: float  # Unix time
+    # Login -> account -> {"total": account total, "positions": {stock: [quantity, price]}}
+    accounts: dict[str, dict[str, dict[str, Any]]]
+
+    @classmethod
+    def of(cls, broker_obj: Brokerage) -> "HoldingsSnapshot":
+        """Take a snapshot of a brokerage's current holdings."""
+        accounts: dict[str, dict[str, dict[str, Any]]] = {}
+        for key in broker_obj.get_account_numbers():
+            for account in broker_obj.get_account_numbers(key):
+                positions = broker_obj.get_positions(key, account)
+                accounts.setdefault(key, {})[account] = {
+                    "total": broker_obj.get_account_total(key, account),
+                    "positions": {stock: [position.quantity, position.price] for stock, position in positions.items()},
+                }
+        return cls(broker_obj.get_name(), time(), accounts)
+
+    def to_brokerage(self) -> Brokerage:
+        """Rebuild a (not logged in) brokerage holding the snapshot's positions."""
+        broker_obj = Brokerage(self.broker)
+        for key, accounts in self.accounts.items():
+            for account, data in accounts.items():
+                broker_obj.set_account_number(key, account)
+                broker_obj.set_account_totals(key, account, data["total"])
+                for stock, (quantity, price) in data["positions"].items():
+                    broker_obj.set_holdings(key, account, stock, quantity, price)
+        return broker_obj
+
+    def quantities(self) -> dict[tuple[str, str, str], float]:
+        """Shares of every (login, account, stock)."""
+        return {(key, account, stock): position[0] for key, accounts in self.accounts.items() for account, data in accounts.items() for stock, position in data["positions"].items()}
+
+
+class HoldingsSnapshots:
+    """Timestamped holdings snapshots saved as JSON under creds, the newest few kept per broker."""
+
+    def __init__(self, directory: Path = HOLDINGS_SNAPSHOT_DIR, keep: int = HOLDINGS_SNAPSHOTS) -> None:
+        """Initialize the snapshot store."""
+        self.directory = directory
+        self.keep = max(1, keep)
+
+    def _files(self, broker: str) -> list[Path]:
+        # Oldest first, the names sort by time
+        return sorted(self.directory.glob(f"{broker.lower()}-*.json"))
+
+    def save(self, broker_obj: Brokerage) -> None:
+        """Save a brokerage's holdings, dropping the oldest snapshots past the limit."""
+        snapshot = HoldingsSnapshot.of(broker_obj)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{snapshot.broker.lower()}-{int(snapshot.taken * 1000)}.json"
+            path.write_text(json.dumps({"broker": snapshot.broker, "taken": snapshot.taken, "accounts": snapshot.accounts}))
+            for old in self._files(snapshot.broker)[: -self.keep]:
+                old.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"Error saving {snapshot.broker} holdings snapshot: {e}")
+
+    def latest(self, broker: str) -> HoldingsSnapshot | None:
+        """Load the newest snapshot for a broker, or None if there isn't one."""
+        for path in reversed(self._files(broker)):
+            try:
+                data = json.loads(path.read_text())
+                return HoldingsSnapshot(data["broker"], data["taken"], data["accounts"])
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Skipping unreadable holdings snapshot {path.name}: {e}")
+        return None
+
+
+holdings_snapshots = HoldingsSnapshots()
+
+
+def print_holdings_diff(
+    previous: HoldingsSnapshot | None,
+    broker_obj: Brokerage,
+    loop: asyncio.AbstractEventLoop | None = None,
+) -> None:
+    """Show only the positions that changed since the previous snapshot."""
+    name = broker_obj.get_name()
+    if previous is None:
+        print_and_discord(f"{name}: No earlier holdings to compare with, showing everything", loop)
+        token = holdings_report.set(True)
+        try:
+            print_all_holdings(broker_obj, loop)
+        finally:
+            holdings_report.reset(token)
+        return
+    before = previous.quantities()
+    after = HoldingsSnapshot.of(broker_obj).quantities()
+    embed: EmbedType = {
+        "title": f"{name} Holdings Changes (since {format_age(time() - previous.taken)} ago)",
+        "color": 3447003,
+        "fields": [],
+    }
+    by_account: dict[tuple[str, str], str] = {}
+    for key, account, stock in sorted(before.keys() | after.keys()):
+        old = before.get((key, account, stock), 0.0)
+        new = after.get((key, account, stock), 0.0)
+        if old == new:
+            continue
+        if not old:
+            line = f"+ {stock}: {new:g}\n"
+        elif not new:
+            line = f"- {stock}: sold {old:g}\n"
+        else:
+            line = f"{stock}: {old:g} -> {new:g}\n"
+        by_account[key, account] = by_account.get((key, account), "") + line
+    print(f"\n==============================\n{embed['title']}\n==============================")
+    for (key, account), print_string in by_account.items():
+        acc_name = f"{key} ({mask_string(account)})"
+        print(acc_name)
+        print(print_string)
+        max_length = 1024
+        embed["fields"].append({"name": acc_name, "inline": False, "value": print_string[:1020] + "..." if len(print_string) > max_length else print_string})
+    if not embed["fields"]:
+        print("No changes")
+        embed["fields"].append({"name": "No changes", "inline": False, "value": "Every position is the same as last time"})
     print_and_discord(embed, loop, embed=True)
+
+
+def print_order_summary(
+    results: list[OrderResult],
+    loop: asyncio.AbstractEventLoop | None = None,
+) -> None:
+    """Summarize every order outcome in one embed, one field per broker."""
+    embed: EmbedType = {
+        "title": "Order Summary",
+        "color": 3447003,
+        "fields": [],
+    }
+    print("\n==============================\nOrder Summary\n==============================")
+    by_broker: dict[str, list[OrderResult]] = {}
+    for result in results:
+        by_broker.setdefault(result.broker, []).append(result)
+    for broker, broker_results in by_broker.items():
+        counts: dict[str, int] = {}
+        for result in broker_results:
+            counts[result.status] = counts.get(result.status, 0) + 1
+        avg_latency = sum(result.latency for result in broker_results) / len(broker_results)
+        name = f"{broker}: " + ", ".join(f"{count} {status}" for status, count in counts.items())
+        print_string = ""
+        # One line per ticker, then one line per failed order
+        tickers: dict[tuple[str, str, float], list[OrderResult]] = {}
+        for result in broker_results:
+            tickers.setdefault((result.side, result.ticker, result.quantity), []).append(result)
+        for (side, ticker, quantity), ticker_results in tickers.items():
+            done = sum(1 for result in ticker_results if result.status in {"placed", "dry"})
+            tried = sum(1 for result in ticker_results if result.status != "skipped")
+            print_string += f"{side} {quantity:g} {ticker}: {done}/{tried} ok\n"
+        for result in broker_results:
+            if result.status == "failed":
+                print_string += f"{result.login} {result.account} {result.ticker}: {result.error}\n"
+        print_string += f"Avg order time: {avg_latency:.1f}s\n"
+        print(name)
+        print(print_string)
+        # If somehow longer than 1024, chop and add ...
+        max_length = 1024
+        embed["fields"].append(
+            {
+                "name": name,
+                "inline": False,
+                "value": print_string[:1020] + "..." if len(print_string) > max_length else print_string,
+            },
+        )
+    if not embed["fields"]:
+        print("No orders were placed")
+        embed["fields"].append({"name": "No orders were placed", "inline": False, "value": "Check the logs above for errors"})
+    if DISCORD_DIGEST and results:
+        # Every order, including the failures cut off above, goes in the attached log
+        rows = [(result.broker, result.login, result.account, result.side, result.quantity, result.ticker, result.status, f"{result.latency:.2f}", result.error or "") for result in results]
+        header = ["broker", "login", "account", "side", "quantity", "ticker", "status", "seconds", "error"]
+        send_digest(embed, "orders", header, rows, loop)
+    else:
+        print_and_discord(embed, loop, embed=True)
     print("==============================")
 
 
+def gzip_csv(header: list[str], rows: Iterable[Iterable[object]]) -> bytes:
+    """Write rows to a gzip-compressed CSV file."""
+    text = StringIO()
+    writer = csv.writer(text)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return gzip.compress(text.getvalue().encode())
+
+
+def send_digest(
+    embed: EmbedType,
+    name: str,
+    header: list[str],
+    rows: Iterable[Iterable[object]],
+    loop: asyncio.AbstractEventLoop | None = None,
+) -> None:
+    """Send a summary embed with the full rows attached as a compressed CSV file."""
+    if loop is None:
+        return
+    stamp = datetime.datetime.now(get_local_timezone()).strftime("%Y%m%d-%H%M%S")
+    get_discord_consumer(loop).put(DiscordFile(embed, f"rsa-{name}-{stamp}.csv.gz", gzip_csv(header, rows)), embed=True, flush=False)
+
+
+def print_holdings_digest(
+    brokers: list[Brokerage],
+    loop: asyncio.AbstractEventLoop | None = None,
+) -> None:
+    """Send one embed of totals per broker, with every holding attached as a CSV file."""
+    embed: EmbedType = {
+        "title": "Holdings Summary",
+        "color": 3447003,
+        "fields": [],
+    }
+    rows: list[tuple[object, ...]] = []
+    combined = 0.0
+    for broker_obj in brokers:
+        broker_total = 0.0
+        positions = 0
+        accounts = 0
+        for key in broker_obj.get_account_numbers():
+            for account in broker_obj.get_account_numbers(key):
+                accounts += 1
+                broker_total += broker_obj.get_account_total(key, account)
+                for stock, holding in broker_obj.get_holdings(key, account).items():
+                    positions += 1
+                    rows.append((broker_obj.get_name(), key, mask_string(account), stock, holding["quantity"], holding["price"], holding["total"]))
+        combined += broker_total
+        embed["fields"].append({"name": broker_obj.get_name(), "inline": True, "value": f"{accounts} accounts, {positions} positions\nTotal: ${format(broker_total, '0.2f')}"})
+    embed["fields"].append({"name": "All brokers", "inline": False, "value": f"Total: ${format(combined, '0.2f')}"})
+    send_digest(embed, "holdings", ["broker", "login", "account", "symbol", "quantity", "price", "total"], rows, loop)
+
+
+def print_ticker_positions(ticker: str, loop: asyncio.AbstractEventLoop | None = None) -> None:
+    """Show every account across all brokers holding ticker, from the position ledger."""
+    entries = position_ledger.positions(ticker=ticker)
+    embed: EmbedType = {
+        "title": f"{ticker.upper()} Positions",
+        "color": 3447003,
+        "fields": [],
+    }
+    by_broker: dict[str, list[LedgerEntry]] = {}
+    for entry in entries:
+        by_broker.setdefault(entry.broker, []).append(entry)
+    for broker, broker_entries in by_broker.items():
+        print_string = "".join(f"{entry.login} {mask_string(entry.account)}: {entry.quantity:g} @ ${format(entry.price, '0.2f')}\n" for entry in broker_entries)
+        print_string += f"Total: {sum(entry.quantity for entry in broker_entries):g} shares\n"
+        max_length = 1024
+        embed["fields"].append({"name": broker.capitalize(), "inline": False, "value": print_string[:1020] + "..." if len(print_string) > max_length else print_string})
+    if entries:
+        embed["fields"].append({"name": "All brokers", "inline": False, "value": f"{position_ledger.total_shares(ticker):g} shares in {len(entries)} accounts"})
+    else:
+        embed["fields"].append({"name": "No positions", "inline": False, "value": f"No {ticker.upper()} in the holdings seen so far, run !rsa holdings first"})
+    print(f"{ticker.upper()}: {position_ledger.total_shares(ticker):g} shares in {len(entries)} accounts")
+    print_and_discord(embed, loop, embed=True)
+
+
 def get_local_timezone() -> datetime.tzinfo:
     """Return the local timezone."""
     return datetime.datetime.now().astimezone().tzinfo or datetime.UTC
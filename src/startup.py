@@ -0,0 +1,6 @@
+"""When AutoRSA started loading, to time startup from."""
+
+from time import perf_counter
+
+# The package imports this first, before any entry point (the CLI or autoRSA.py) loads the rest
+STARTUP_START = perf_counter()